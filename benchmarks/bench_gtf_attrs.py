@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark GTF attribute (column 9) parsing.  Compares GtfParser.parse_attrs()
+with the previous implementation, which split the column with a regular
+expression and matched each attribute individually.
+"""
+import sys
+import os.path as osp
+import re
+import timeit
+import argparse
+
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+from gxfgenie.gtf_parser import GtfParser, GtfAttrs
+from gxfgenie.gxf_record import gxf_attr_add
+
+_default_gtf = osp.join(osp.dirname(osp.abspath(__file__)), "../tests/input/gencode/set1.gtf")
+
+_split_attr_col_re = re.compile(r"; *")
+_split_attr_re = re.compile(r"^([a-zA-Z_]+) +((\"(.+)\")|([0-9]+))$")
+
+def regex_parse_attrs(attrs_str, attrs_cache):
+    "previous regular expression based implementation"
+    attrs = GtfAttrs()
+    for attr_str in _split_attr_col_re.split(attrs_str.strip()):
+        if len(attr_str) > 0:
+            match = _split_attr_re.match(attr_str)
+            value = match.group(5) if match.group(5) is not None else match.group(4)
+            gxf_attr_add(attrs, attrs_cache, match.group(1), value)
+    return attrs
+
+def load_attr_cols(gtf_file):
+    with open(gtf_file) as fh:
+        rows = [line.rstrip("\n").split("\t") for line in fh
+                if not line.startswith("#")]
+    return [row[8] for row in rows if len(row) == 9]
+
+def bench(name, func, attr_cols, repeat):
+    def run():
+        for col in attr_cols:
+            func(col)
+    secs = min(timeit.repeat(run, number=1, repeat=repeat))
+    usec = 1.0e6 * secs / len(attr_cols)
+    print(f"{name}\t{usec:.2f} usec/record\t{len(attr_cols) / secs:.0f} records/sec")
+    return secs
+
+def parse_args():
+    desc = """Benchmark GTF attribute parsing."""
+    parser = argparse.ArgumentParser(description=desc)
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="number of times to repeat, best time is reported")
+    parser.add_argument("gtf_file", nargs='?', default=_default_gtf,
+                        help="GTF file to use")
+    return parser.parse_args()
+
+def main(args):
+    attr_cols = load_attr_cols(args.gtf_file)
+    attrs_cache = {}
+    regex_secs = bench("regex", lambda col: regex_parse_attrs(col, attrs_cache), attr_cols, args.repeat)
+    parser = GtfParser(args.gtf_file)
+    parser.close()
+    tokenizer_secs = bench("tokenizer", parser.parse_attrs, attr_cols, args.repeat)
+    print(f"speedup\t{regex_secs / tokenizer_secs:.2f}x")
+
+
+if __name__ == "__main__":
+    main(parse_args())
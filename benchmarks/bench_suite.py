@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the parse, format, and query hot paths.  Benchmarks are
+run on the GENCODE files in tests/input/gencode and on synthetic files made
+by repeating them to a given number of lines.  Each benchmark is run in a
+separate process, so the peak RSS reported is for that benchmark alone.
+
+Results are written as JSON, including the git commit, so runs on different
+commits can be compared with --compare.
+"""
+import sys
+import os
+import os.path as osp
+import re
+import gzip
+import json
+import time
+import random
+import platform
+import resource
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+_root_dir = osp.normpath(osp.join(osp.dirname(osp.abspath(__file__)), ".."))
+sys.path.insert(0, _root_dir)
+from gxfgenie import gxf_parser_class, gxf_parser_factory, fileops
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.gxf_writer import GxfWriter
+from gxfgenie.range_index import RangeIndex
+
+RESULTS_FORMAT_VERSION = 1
+
+_input_dir = osp.join(_root_dir, "tests/input/gencode")
+_default_inputs = ["set1.gtf", "v19.gtf", "set1.gff3", "v42.gff3"]
+_default_synthetic = ["v19.gtf", "v42.gff3"]
+
+# number of random queries used for the range index benchmark
+_num_queries = 10000
+
+# numbers of worker processes used for the parallel parse benchmark
+_parallel_workers = (2, 4, 8)
+
+
+###
+# synthetic inputs
+###
+_id_re = re.compile(r"((ENS[A-Z]*|OTTHUM[A-Z])\d+(\.\d+)?)")
+
+def _synthetic_lines(lines, num_lines):
+    """Repeat the records, giving each copy distinct identifiers and moving
+    it past the previous copy, so ranges and attributes are not identical."""
+    span = max(int(line.split("\t")[4]) for line in lines) + 1000000
+    cnt = 0
+    copy = 0
+    while cnt < num_lines:
+        offset = copy * span
+        for line in lines:
+            row = line.split("\t")
+            row[3] = str(int(row[3]) + offset)
+            row[4] = str(int(row[4]) + offset)
+            row[8] = _id_re.sub(r"\1_c%d" % copy, row[8])
+            yield "\t".join(row)
+            cnt += 1
+            if cnt >= num_lines:
+                break
+        copy += 1
+
+def make_synthetic(in_gxf, num_lines, work_dir):
+    """Create a synthetic file of num_lines records from in_gxf, if it does not
+    already exist, along with a gzip compressed copy"""
+    base, ext = osp.splitext(osp.basename(in_gxf))
+    out_gxf = osp.join(work_dir, f"{base}.syn{num_lines}{ext}")
+    if not osp.exists(out_gxf):
+        with open(in_gxf) as fh:
+            lines = [line for line in fh if not (line.startswith("#") or line.isspace())]
+        tmp_gxf = out_gxf + ".tmp"
+        with open(tmp_gxf, "w") as fh:
+            fh.writelines(_synthetic_lines(lines, num_lines))
+        os.replace(tmp_gxf, out_gxf)
+    if not osp.exists(out_gxf + ".gz"):
+        _gzip_file(out_gxf, out_gxf + ".gz")
+    return out_gxf
+
+def _gzip_file(in_file, out_gz):
+    with open(in_file, "rb") as in_fh, gzip.open(out_gz + ".tmp", "wb", compresslevel=6) as out_fh:
+        while buf := in_fh.read(1024 * 1024):
+            out_fh.write(buf)
+    os.replace(out_gz + ".tmp", out_gz)
+
+
+###
+# benchmarks, each returns a dict of metrics
+###
+def _best_time(func, repeat):
+    "run func repeat times, returning the best time and the last result"
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        secs = time.perf_counter() - start
+        if (best is None) or (secs < best):
+            best = secs
+    return best, result
+
+def _parse_records(gxf_file):
+    parser = gxf_parser_class(gxf_file)(gxf_file)
+    try:
+        return [rec for rec in parser.parse() if isinstance(rec, GxfRecord)]
+    finally:
+        parser.close()
+
+def bench_parse(gxf_file, gxf_gz, repeat):
+    "records/sec and MB/sec for parsing the file"
+    secs, num_recs = _best_time(lambda: len(_parse_records(gxf_file)), repeat)
+    return {"secs": secs,
+            "records": num_recs,
+            "records_per_sec": num_recs / secs,
+            "mb_per_sec": osp.getsize(gxf_file) / (secs * 1024 * 1024)}
+
+def _parse_records_parallel(gxf_file, workers):
+    "parse with workers, returning the records and the CPU time of this process"
+    cpu_start = time.process_time()
+    recs = [rec for rec in gxf_parser_factory(gxf_file, workers=workers).parse() if isinstance(rec, GxfRecord)]
+    return recs, time.process_time() - cpu_start
+
+def bench_parallel(gxf_file, gxf_gz, repeat):
+    """Serial parsing compared to parsing with worker processes.  The CPU time
+    of the main process, which receives the records from the workers, is
+    not reduced by adding workers, so the speedup is limited to
+    serial_secs / main_cpu_secs.  Speedups are only meaningful with at
+    least as many CPUs as workers."""
+    serial_secs, num_recs = _best_time(lambda: len(_parse_records(gxf_file)), repeat)
+    metrics = {"records": num_recs,
+               "serial_secs": serial_secs}
+    for workers in _parallel_workers:
+        secs, (recs, main_cpu_secs) = _best_time(lambda: _parse_records_parallel(gxf_file, workers), repeat)
+        assert len(recs) == num_recs
+        metrics[f"workers{workers}_secs"] = secs
+        metrics[f"workers{workers}_speedup"] = serial_secs / secs
+        metrics[f"workers{workers}_main_cpu_secs"] = main_cpu_secs
+    metrics["max_speedup"] = serial_secs / min(metrics[f"workers{w}_main_cpu_secs"] for w in _parallel_workers)
+    return metrics
+
+def bench_attrs(gxf_file, gxf_gz, repeat):
+    "parsing of the attribute column alone"
+    with open(gxf_file) as fh:
+        rows = [line.rstrip("\n").split("\t") for line in fh if not line.startswith("#")]
+    attr_cols = [row[8] for row in rows if len(row) == 9]
+    parser = gxf_parser_class(gxf_file)(gxf_file, use_mmap=False)
+    parser.close()
+
+    def run():
+        parser.attrs_cache.clear_all()
+        for col in attr_cols:
+            parser.parse_attrs(col)
+    secs, _ = _best_time(run, repeat)
+    return {"secs": secs,
+            "records": len(attr_cols),
+            "usec_per_record": 1.0e6 * secs / len(attr_cols)}
+
+def bench_format(gxf_file, gxf_gz, repeat):
+    "formatting records with str() and with GxfWriter"
+    recs = _parse_records(gxf_file)
+    str_secs, _ = _best_time(lambda: [str(rec) for rec in recs], repeat)
+
+    def write():
+        with open(os.devnull, "w") as fh, GxfWriter(gxf_file, gxf_fh=fh) as writer:
+            writer.write_all(recs)
+    writer_secs, _ = _best_time(write, repeat)
+    return {"records": len(recs),
+            "str_usec_per_record": 1.0e6 * str_secs / len(recs),
+            "writer_usec_per_record": 1.0e6 * writer_secs / len(recs)}
+
+def _read_lines(gxf_file, inprocess=None):
+    num_lines = 0
+    with fileops.opengz(gxf_file, inprocess=inprocess) as fh:
+        for _ in fh:
+            num_lines += 1
+    return num_lines
+
+def bench_opengz(gxf_file, gxf_gz, repeat):
+    "reading the file uncompressed and through opengz() decompression"
+    size_mb = osp.getsize(gxf_file) / (1024 * 1024)
+    plain_secs, _ = _best_time(lambda: _read_lines(gxf_file), repeat)
+    inproc_secs, _ = _best_time(lambda: _read_lines(gxf_gz, inprocess=True), repeat)
+    pipe_secs, _ = _best_time(lambda: _read_lines(gxf_gz, inprocess=False), repeat)
+    return {"plain_mb_per_sec": size_mb / plain_secs,
+            "inprocess_mb_per_sec": size_mb / inproc_secs,
+            "pipe_mb_per_sec": size_mb / pipe_secs,
+            "inprocess_overhead": inproc_secs / plain_secs,
+            "pipe_overhead": pipe_secs / plain_secs}
+
+def _random_queries(recs, num_queries):
+    rand = random.Random(1)
+    queries = []
+    for _ in range(num_queries):
+        rec = rand.choice(recs)
+        start = max(1, rec.start + rand.randint(-10000, 10000))
+        queries.append((rec.seqname, start, start + rand.randint(0, 20000)))
+    return queries
+
+def bench_range_index(gxf_file, gxf_gz, repeat):
+    "RangeIndex build and query times"
+    recs = _parse_records(gxf_file)
+    queries = _random_queries(recs, _num_queries)
+
+    def build():
+        index = RangeIndex(recs)
+        index.overlapping_indices(*queries[0])  # index is built on first query
+        return index
+    build_secs, index = _best_time(build, repeat)
+
+    def query():
+        return sum(len(index.overlapping_indices(*q)) for q in queries)
+    query_secs, num_hits = _best_time(query, repeat)
+    metrics = {"records": len(recs),
+               "build_secs": build_secs,
+               "query_usec": 1.0e6 * query_secs / len(queries),
+               "hits_per_query": num_hits / len(queries)}
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return metrics
+    seqnames, starts, ends = zip(*queries)
+    index.overlap_join(seqnames[:1], starts[:1], ends[:1])  # build arrays
+    join_secs, _ = _best_time(lambda: index.overlap_join(seqnames, starts, ends), repeat)
+    metrics["join_usec_per_query"] = 1.0e6 * join_secs / len(queries)
+    return metrics
+
+
+_benchmarks = {
+    "parse": bench_parse,
+    "parallel": bench_parallel,
+    "attrs": bench_attrs,
+    "format": bench_format,
+    "opengz": bench_opengz,
+    "range_index": bench_range_index,
+}
+
+
+###
+# running and reporting
+###
+def _run_case(bench_name, gxf_file, gxf_gz, repeat):
+    "run in a child process so peak RSS is measured for this case"
+    metrics = _benchmarks[bench_name](gxf_file, gxf_gz, repeat)
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return metrics
+
+def run_case(bench_name, gxf_file, gxf_gz, repeat):
+    """run a benchmark on a file and its gzip compressed copy, returning a
+    dict of metrics"""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork")) as executor:
+        return executor.submit(_run_case, bench_name, gxf_file, gxf_gz, repeat).result()
+
+def _git_info():
+    def git(*args):
+        try:
+            return subprocess.run(["git", "-C", _root_dir] + list(args), check=True,
+                                  capture_output=True, text=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    commit = git("rev-parse", "HEAD")
+    return {"commit": commit,
+            "dirty": (git("status", "--porcelain", "--untracked-files=no") != "") if commit is not None else None}
+
+def _environment():
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count()}
+
+def _case_key(result):
+    return (result["benchmark"], result["input"])
+
+def compare_results(base_results, results, fh):
+    "print the ratio of each metric to the base results"
+    base_by_case = {_case_key(r): r["metrics"] for r in base_results["results"]}
+    print(f"# base commit: {base_results['git']['commit']}  this commit: {results['git']['commit']}", file=fh)
+    print("benchmark\tinput\tmetric\tbase\tthis\tratio", file=fh)
+    for result in results["results"]:
+        base_metrics = base_by_case.get(_case_key(result))
+        if base_metrics is None:
+            continue
+        for name, value in result["metrics"].items():
+            base_value = base_metrics.get(name)
+            if base_value:
+                print(f"{result['benchmark']}\t{result['input']}\t{name}\t{base_value:.4g}\t{value:.4g}\t{value / base_value:.3f}", file=fh)
+
+def parse_args():
+    desc = """Run benchmarks of parsing, formatting and querying, writing the
+    results as JSON."""
+    parser = argparse.ArgumentParser(description=desc)
+    parser.add_argument("--benchmarks", nargs="+", choices=sorted(_benchmarks), default=list(_benchmarks),
+                        help="benchmarks to run, default is all")
+    parser.add_argument("--inputs", nargs="+", default=_default_inputs,
+                        help="files in tests/input/gencode to use, or other paths to GTF or GFF3 files")
+    parser.add_argument("--synthetic", nargs="*", default=_default_synthetic,
+                        help="inputs to use for synthetic files")
+    parser.add_argument("--synthetic-lines", type=int, default=1000000,
+                        help="number of lines in synthetic files, 0 to not use synthetic files")
+    parser.add_argument("--work-dir", default=osp.join(_root_dir, "benchmarks/output"),
+                        help="directory for synthetic files")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of times to repeat each measurement, best time is reported")
+    parser.add_argument("--output", "-o",
+                        help="write JSON results to this file, default is stdout")
+    parser.add_argument("--compare",
+                        help="JSON results from a previous run to compare against")
+    return parser.parse_args()
+
+def _find_input(name):
+    return name if osp.exists(name) else osp.join(_input_dir, name)
+
+def main(args):
+    os.makedirs(args.work_dir, exist_ok=True)
+    inputs = []
+    for name in args.inputs:
+        gxf_file = _find_input(name)
+        gxf_gz = osp.join(args.work_dir, osp.basename(gxf_file) + ".gz")
+        if not osp.exists(gxf_gz):
+            _gzip_file(gxf_file, gxf_gz)
+        inputs.append((osp.basename(gxf_file), gxf_file, gxf_gz))
+    if args.synthetic_lines > 0:
+        for name in args.synthetic:
+            gxf_file = make_synthetic(_find_input(name), args.synthetic_lines, args.work_dir)
+            inputs.append((osp.basename(gxf_file), gxf_file, gxf_file + ".gz"))
+
+    results = {"version": RESULTS_FORMAT_VERSION,
+               "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+               "git": _git_info(),
+               "environment": _environment(),
+               "repeat": args.repeat,
+               "results": []}
+    for bench_name in args.benchmarks:
+        for input_name, gxf_file, gxf_gz in inputs:
+            metrics = run_case(bench_name, gxf_file, gxf_gz, args.repeat)
+            print(f"{bench_name}\t{input_name}\t" + " ".join(f"{k}={v:.4g}" for k, v in metrics.items()),
+                  file=sys.stderr)
+            results["results"].append({"benchmark": bench_name, "input": input_name, "metrics": metrics})
+
+    if args.output is not None:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+            fh.write("\n")
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            compare_results(json.load(fh), results, sys.stderr)
+
+
+if __name__ == "__main__":
+    main(parse_args())
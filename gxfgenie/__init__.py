@@ -1,6 +1,12 @@
 import os
+from gxfgenie import fileops
 from gxfgenie.gtf_parser import GtfParser
 from gxfgenie.gff3_parser import Gff3Parser
+from gxfgenie.gxf_parallel import GxfParallelParser
+from gxfgenie.gtf_dataset import GtfDataSet
+from gxfgenie.gff3_dataset import Gff3DataSet
+from gxfgenie.gtf_tree_stream import GtfTreeStream
+from gxfgenie.gff3_tree_stream import Gff3TreeStream
 from gxfgenie.errors import GxfGenieError
 
 
@@ -8,30 +14,75 @@ def _get_filetype_ext(gxf_file):
     """
     Get the primary file extension for the given GXF file, accounting for possible compression.
     """
-    from gxfgenie import fileops
     if fileops.is_compressed(gxf_file):
         return os.path.splitext(os.path.splitext(gxf_file)[0])[1]
     else:
         return os.path.splitext(gxf_file)[1]
 
-def gxf_parser_factory(gxf_file):
+def gxf_parser_class(gxf_file):
+    """
+    Get the parser class (GtfParser or Gff3Parser) for a file based on the
+    file extension.
+    """
+    ext = _get_filetype_ext(gxf_file)
+    if ext == ".gtf":
+        return GtfParser
+    elif ext == ".gff3":
+        return Gff3Parser
+    else:
+        raise GxfGenieError(f"Unsupported file extension in: {gxf_file}. Expected .gtf or .gff3 (with optional compression extension).")
+
+def gxf_parser_factory(gxf_file, *, workers=None, **parser_opts):
     """
     Factory function to return the appropriate parser (GtfParser or Gff3Parser)
     based on the file extension.
 
     Args:
         gxf_file (str): Path to the GXF file (.gtf or .gff3).
+        workers (int): If greater than one and the file is not compressed,
+            return a GxfParallelParser that parses the file in this many
+            worker processes.
+        parser_opts: Other keyword arguments are passed to the parser
+            constructor, such as lazy_attrs.
 
     Returns:
-        GtfParser or Gff3Parser: The appropriate parser instance.
+        GtfParser, Gff3Parser, or GxfParallelParser: The appropriate parser instance.
 
     Raises:
         GxfGenieError: If the file extension is not .gtf or .gff3.
     """
-    ext = _get_filetype_ext(gxf_file)
-    if ext == ".gtf":
-        return GtfParser(gxf_file)
-    elif ext == ".gff3":
-        return Gff3Parser(gxf_file)
-    else:
-        raise GxfGenieError(f"Unsupported file extension in: {gxf_file}. Expected .gtf or .gff3 (with optional compression extension).")
+    parser_class = gxf_parser_class(gxf_file)
+    if (workers is not None) and (workers > 1) and not fileops.is_compressed(gxf_file):
+        return GxfParallelParser(parser_class, gxf_file, workers=workers, parser_opts=parser_opts)
+    return parser_class(gxf_file, **parser_opts)
+
+def gxf_dataset_class(gxf_file):
+    """
+    Get the data set class (GtfDataSet or Gff3DataSet) for a file based on the
+    file extension.
+    """
+    return Gff3DataSet if issubclass(gxf_parser_class(gxf_file), Gff3Parser) else GtfDataSet
+
+def gxf_tree_stream_class(gxf_file):
+    """
+    Get the streaming tree assembly class (GtfTreeStream or Gff3TreeStream)
+    for a file based on the file extension.
+    """
+    return Gff3TreeStream if issubclass(gxf_parser_class(gxf_file), Gff3Parser) else GtfTreeStream
+
+def gxf_dataset_load(gxf_file, *, workers=None, parser_opts=None, **parse_args):
+    """
+    Load a GTF or GFF3 file into a GtfDataSet or Gff3DataSet, based on the
+    file extension.  The file is parsed in a single pass.
+
+    Args:
+        gxf_file (str): Path to the GXF file (.gtf or .gff3).
+        workers (int): Number of worker processes used to parse, see gxf_parser_factory().
+        parser_opts (dict): Keyword arguments passed to the parser constructor.
+        parse_args: Other keyword arguments are passed to parser.parse() to select records.
+
+    Returns:
+        GtfDataSet or Gff3DataSet: the loaded data set.
+    """
+    parser = gxf_parser_factory(gxf_file, workers=workers, **(parser_opts if parser_opts is not None else {}))
+    return gxf_dataset_class(gxf_file).load(parser, **parse_args)
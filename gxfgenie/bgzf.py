@@ -0,0 +1,183 @@
+"""
+Reading and writing of BGZF (blocked gzip) files, as produced by bgzip.
+BGZF files are valid gzip files, made of independently compressed blocks
+of up to 64kb, which allows random access using virtual offsets.  A virtual
+offset is the offset of the compressed block in the file shifted left 16
+bits, combined with the offset within the uncompressed block.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import io
+import struct
+import zlib
+from gxfgenie.errors import GxfGenieError
+
+_BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+_HEADER_SIZE = 18
+_header_struct = struct.Struct("<4BIBBHBBHH")
+_trailer_struct = struct.Struct("<II")
+
+# maximum uncompressed data in one block, chosen so that the compressed
+# block will fit in the 64kb limit
+MAX_BLOCK_DATA = 0xff00
+
+# standard empty block that marks the end of the file
+BGZF_EOF = (b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00\x42\x43"
+            b"\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00")
+
+
+def make_voffset(block_offset, data_offset):
+    "create a virtual offset"
+    return (block_offset << 16) | data_offset
+
+def split_voffset(voffset):
+    "split virtual offset into (block_offset, data_offset)"
+    return voffset >> 16, voffset & 0xffff
+
+def is_bgzf(path):
+    "check if a file starts with a BGZF block header"
+    with open(path, "rb") as fh:
+        header = fh.read(_HEADER_SIZE)
+    return (len(header) == _HEADER_SIZE) and header.startswith(_BGZF_MAGIC) and (header[12:14] == b"BC")
+
+
+class BgzfReader:
+    """Random access reader of a BGZF file.  Returns bytes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = open(path, "rb")
+        self._block_offset = 0  # offset of current block
+        self._next_block_offset = 0  # offset of next block
+        self._data = b""
+        self._data_offset = 0  # offset in current block data
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_block(self, block_offset):
+        """read block at the offset, return False on EOF"""
+        self.fh.seek(block_offset)
+        header = self.fh.read(_HEADER_SIZE)
+        if len(header) == 0:
+            self._block_offset = self._next_block_offset = block_offset
+            self._data = b""
+            return False
+        if (len(header) != _HEADER_SIZE) or not header.startswith(_BGZF_MAGIC) or (header[12:14] != b"BC"):
+            raise GxfGenieError(f"invalid BGZF block header at offset {block_offset} in `{self.path}'")
+        block_size = _header_struct.unpack(header)[-1] + 1
+        rest = self.fh.read(block_size - _HEADER_SIZE)
+        if len(rest) != block_size - _HEADER_SIZE:
+            raise GxfGenieError(f"truncated BGZF block at offset {block_offset} in `{self.path}'")
+        self._data = zlib.decompress(rest[:-_trailer_struct.size], wbits=-15)
+        self._block_offset = block_offset
+        self._next_block_offset = block_offset + block_size
+        return True
+
+    def _next_block(self):
+        """advance to the next non-empty block, return False on EOF"""
+        while self._read_block(self._next_block_offset):
+            if len(self._data) > 0:
+                self._data_offset = 0
+                return True
+        return False
+
+    def seek(self, voffset):
+        "seek to a virtual offset"
+        block_offset, data_offset = split_voffset(voffset)
+        if (block_offset != self._block_offset) or (len(self._data) == 0):
+            self._read_block(block_offset)
+        self._data_offset = data_offset
+
+    def tell(self):
+        "get virtual offset of the current position"
+        if self._data_offset >= len(self._data):
+            # at end of block, the position is the start of the next block
+            return make_voffset(self._next_block_offset, 0)
+        return make_voffset(self._block_offset, self._data_offset)
+
+    def iter_lines(self):
+        """Generator of (voffset, line) from the current position, with lines
+        including the newline."""
+        partial = b""
+        partial_voffset = None
+        while True:
+            if self._data_offset >= len(self._data):
+                if not self._next_block():
+                    break
+            data = self._data
+            pos = self._data_offset
+            while (nl := data.find(b"\n", pos)) >= 0:
+                voffset = make_voffset(self._block_offset, pos)
+                self._data_offset = nl + 1
+                if len(partial) > 0:
+                    yield partial_voffset, partial + data[pos:nl + 1]
+                    partial = b""
+                else:
+                    yield voffset, data[pos:nl + 1]
+                pos = self._data_offset
+            if pos < len(data):
+                if len(partial) == 0:
+                    partial_voffset = make_voffset(self._block_offset, pos)
+                partial += data[pos:]
+            self._data_offset = len(data)
+        if len(partial) > 0:
+            yield partial_voffset, partial
+
+
+class BgzfWriter(io.RawIOBase):
+    """Write a BGZF file.  This is a binary stream, use io.TextIOWrapper
+    to write text."""
+
+    def __init__(self, path, *, compresslevel=6):
+        self.path = path
+        self.compresslevel = compresslevel
+        self.fh = open(path, "wb")
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def _write_block(self, data):
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data) + compressor.flush()
+        block_size = _HEADER_SIZE + len(cdata) + _trailer_struct.size
+        self.fh.write(_header_struct.pack(0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, block_size - 1))
+        self.fh.write(cdata)
+        self.fh.write(_trailer_struct.pack(zlib.crc32(data), len(data)))
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= MAX_BLOCK_DATA:
+            self._write_block(bytes(self._buffer[0:MAX_BLOCK_DATA]))
+            del self._buffer[0:MAX_BLOCK_DATA]
+        return len(data)
+
+    def flush(self):
+        "write any buffered data as a block"
+        if (self.fh is not None) and (len(self._buffer) > 0):
+            self._write_block(bytes(self._buffer))
+            self._buffer.clear()
+
+    def close(self):
+        if self.fh is not None:
+            self.flush()
+            self.fh.write(BGZF_EOF)
+            self.fh.close()
+            self.fh = None
+        super().close()
+
+
+def open_bgzf_writer(path, mode="w", *, encoding=None, errors=None, compresslevel=6):
+    """Open a BGZF file for writing, in text ("w") or binary ("wb") mode."""
+    fh = io.BufferedWriter(BgzfWriter(path, compresslevel=compresslevel), buffer_size=MAX_BLOCK_DATA)
+    if "b" in mode:
+        return fh
+    return io.TextIOWrapper(fh, encoding=encoding, errors=errors)
@@ -0,0 +1,275 @@
+"""
+Command line interface, installed as the `gxfgenie' program.  Input files
+may be compressed, and output files ending in a compression extension are
+compressed.  Records are streamed, so files larger than memory can be
+processed.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import os
+import re
+import sys
+import argparse
+from collections import Counter
+from gxfgenie import gxf_parser_class, gxf_parser_factory, fileops
+from gxfgenie.defs import GENE_FEATURES, TRANSCRIPT_FEATURES
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.gxf_filter import GxfFilter
+from gxfgenie.gxf_writer import GxfWriter
+from gxfgenie.gff3_parser import Gff3Parser
+from gxfgenie.gxf_index import GxfIndex, GxfIndexedReader, gxf_index_build, gxf_index_path
+from gxfgenie.gxf_convert import gxf_convert, GFF3_TO_GTF_FEATURES
+
+# attributes checked for the biotype of genes and transcripts, in order
+GENE_BIOTYPE_ATTRS = ("gene_type", "gene_biotype", "biotype")
+TRANSCRIPT_BIOTYPE_ATTRS = ("transcript_type", "transcript_biotype", "biotype")
+
+# attribute values that can't be changed by GFF3 %-encoding, so they can be
+# searched for in the unparsed attribute column
+_plain_value_re = re.compile(r"^[-A-Za-z0-9_.:]+$")
+
+_region_re = re.compile(r"^([^:]+):([0-9,]+)-([0-9,]+)$")
+
+
+def _parse_region(region):
+    "parse seqname:start-end, with start and end one-based, closed"
+    match = _region_re.match(region)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"invalid region, expected seqname:start-end: `{region}'")
+    return (match.group(1), int(match.group(2).replace(",", "")), int(match.group(3).replace(",", "")))
+
+def _parse_name_value(name_value):
+    "parse NAME=VALUE"
+    name, sep, value = name_value.partition("=")
+    if (sep == "") or (name == ""):
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE: `{name_value}'")
+    return (name, value)
+
+def _parse_name_regex(name_value):
+    name, regex = _parse_name_value(name_value)
+    try:
+        return (name, re.compile(regex))
+    except re.error as ex:
+        raise argparse.ArgumentTypeError(f"invalid regular expression `{regex}': {ex}")
+
+
+class _AttrValueFilter(GxfFilter):
+    """GxfFilter that also rejects lines that don't contain all of a list of
+    attribute values, so most lines that can't match an attribute value are
+    skipped before parsing.  The values must not be changed by %-encoding."""
+    __slots__ = ("values", "_bvalues", "_accept_columns_line", "_accept_columns_bytes_line")
+
+    def __init__(self, values, **filter_args):
+        super().__init__(**filter_args)
+        self.values = tuple(values)
+        self._bvalues = tuple(value.encode() for value in self.values)
+        self._accept_columns_line = self.accept_line
+        self._accept_columns_bytes_line = self.accept_bytes_line
+        self.accept_line = self._accept_values_line
+        self.accept_bytes_line = self._accept_values_bytes_line
+
+    @property
+    def filters_lines(self):
+        return True
+
+    def _accept_values_line(self, line):
+        return all((value in line) for value in self.values) and self._accept_columns_line(line)
+
+    def _accept_values_bytes_line(self, line):
+        return all((value in line) for value in self._bvalues) and self._accept_columns_bytes_line(line)
+
+
+class _AttrMatcher:
+    """Test records against attribute values and regular expressions, all of
+    which must match one of the values of the attribute.  With lazy
+    attributes, the attributes are parsed for testing without replacing the
+    unparsed column, so records are written as read."""
+
+    def __init__(self, attr_values, attr_regexs):
+        self.tests = ([(name, value.__eq__) for name, value in attr_values]
+                      + [(name, regex.search) for name, regex in attr_regexs])
+
+    def accept_record(self, rec):
+        attrs = rec.peek_attrs()
+        for name, test in self.tests:
+            attr = attrs.find_attr(name)
+            if (attr is None) or not any(test(attr[i]) for i in range(len(attr))):
+                return False
+        return True
+
+
+def _open_writer(out_gxf, args):
+    "open output, with `-' for stdout"
+    if out_gxf == "-":
+        return GxfWriter("<stdout>", gxf_fh=sys.stdout)
+    # use a compression process when multiple threads are available
+    return GxfWriter(out_gxf, inprocess=(args.threads <= 1) or not fileops.is_compressed(out_gxf))
+
+def _is_indexed(gxf_file):
+    index_file = gxf_index_path(gxf_file)
+    return os.path.exists(index_file) and GxfIndex.load(index_file).is_current(gxf_file)
+
+def _filter_records(args):
+    "generator of selected records and metadata"
+    parse_args = {"features": args.feature, "seqnames": args.seqname}
+    if (args.region is not None) and _is_indexed(args.in_gxf):
+        # random access only reads the header and the lines near the region
+        with GxfIndexedReader(args.in_gxf, parser_opts={"lazy_attrs": True}) as reader:
+            if not args.no_metas:
+                yield from reader.read_header_metas()
+            yield from reader.fetch(*args.region, **parse_args)
+    else:
+        plain_values = [value for _, value in args.attr if _plain_value_re.match(value)]
+        if len(plain_values) > 0:
+            parse_args = {"gxf_filter": _AttrValueFilter(plain_values, region=args.region, **parse_args)}
+        else:
+            parse_args["region"] = args.region
+        parser = gxf_parser_factory(args.in_gxf, workers=args.threads, lazy_attrs=True)
+        yield from parser.parse(**parse_args)
+
+def cmd_filter(args):
+    matcher = None
+    if (len(args.attr) > 0) or (len(args.attr_regex) > 0):
+        matcher = _AttrMatcher(args.attr, args.attr_regex)
+    recs = _filter_records(args)
+    if matcher is not None:
+        recs = (rec for rec in recs if (not isinstance(rec, GxfRecord)) or matcher.accept_record(rec))
+    if args.no_metas:
+        recs = (rec for rec in recs if isinstance(rec, GxfRecord))
+    with _open_writer(args.out_gxf, args) as writer:
+        writer.write_all(recs)
+
+def _find_biotype(attrs, attr_names):
+    for name in attr_names:
+        value = attrs.find_attr_value(name)
+        if value is not None:
+            return value
+    return None
+
+def gxf_count(gxf_file, *, workers=None):
+    """Count the records of a file by feature, seqname, and gene and
+    transcript biotype.  Returns a dict of category to Counter."""
+    counts = {"feature": Counter(), "seqname": Counter(),
+              "gene_biotype": Counter(), "transcript_biotype": Counter()}
+    feature_counts, seqname_counts = counts["feature"], counts["seqname"]
+    parser = gxf_parser_factory(gxf_file, workers=workers)
+    for rec in parser.parse(attr_names=GENE_BIOTYPE_ATTRS + TRANSCRIPT_BIOTYPE_ATTRS):
+        if isinstance(rec, GxfRecord):
+            feature_counts[rec.feature] += 1
+            seqname_counts[rec.seqname] += 1
+            if rec.feature in GENE_FEATURES:
+                counts["gene_biotype"][_find_biotype(rec.attrs, GENE_BIOTYPE_ATTRS)] += 1
+            elif rec.feature in TRANSCRIPT_FEATURES:
+                counts["transcript_biotype"][_find_biotype(rec.attrs, TRANSCRIPT_BIOTYPE_ATTRS)] += 1
+    return counts
+
+def cmd_stats(args):
+    counts = gxf_count(args.in_gxf, workers=args.threads)
+    fh = fileops.opengz(args.output, "w") if args.output != "-" else sys.stdout
+    try:
+        print("category", "name", "count", sep="\t", file=fh)
+        for category, counter in counts.items():
+            for name, count in sorted(counter.items(), key=lambda c: (-c[1], str(c[0]))):
+                print(category, name if name is not None else ".", count, sep="\t", file=fh)
+    finally:
+        if fh is not sys.stdout:
+            fh.close()
+
+def cmd_index(args):
+    gxf_index_build(args.in_gxf, args.index_file)
+
+def cmd_convert(args):
+    feature_renames = dict(args.rename_feature)
+    if issubclass(gxf_parser_class(args.in_gxf), Gff3Parser):
+        feature_renames = {**GFF3_TO_GTF_FEATURES, **feature_renames}
+    gxf_convert(args.in_gxf, args.out_gxf, workers=args.threads, sorted_input=not args.unsorted,
+                spill_records=args.spill_records, tmp_dir=args.tmp_dir,
+                attr_renames=dict(args.rename_attr), feature_renames=feature_renames)
+
+
+def _add_threads_arg(parser):
+    parser.add_argument("--threads", type=int, default=1,
+                        help="number of processes used to parse uncompressed files and compress output")
+
+def _build_arg_parser():
+    parser = argparse.ArgumentParser(prog="gxfgenie",
+                                     description="Process GTF and GFF3 files.  Files may be compressed.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    filter_parser = subparsers.add_parser("filter", help="select records",
+                                          description="""Select records, writing them as read.  Records
+                                          must match all of the criteria.  If the file is indexed, a region is
+                                          read using the index, and only the `##' metadata lines at the start of the file are
+                                          written.""")
+    filter_parser.add_argument("--feature", action="append",
+                               help="keep records of this feature type, may be repeated")
+    filter_parser.add_argument("--seqname", action="append",
+                               help="keep records on this sequence, may be repeated")
+    filter_parser.add_argument("--region", type=_parse_region,
+                               help="keep records overlapping seqname:start-end, one-based, closed")
+    filter_parser.add_argument("--attr", type=_parse_name_value, action="append", default=[],
+                               help="keep records with attribute NAME=VALUE, may be repeated")
+    filter_parser.add_argument("--attr-regex", type=_parse_name_regex, action="append", default=[],
+                               help="keep records with an attribute NAME=REGEX value matching the regular expression, may be repeated")
+    filter_parser.add_argument("--no-metas", action="store_true",
+                               help="don't write `##' metadata lines")
+    _add_threads_arg(filter_parser)
+    filter_parser.add_argument("in_gxf", help="GTF or GFF3 file")
+    filter_parser.add_argument("out_gxf", nargs="?", default="-", help="output file, default is stdout")
+    filter_parser.set_defaults(func=cmd_filter)
+
+    stats_parser = subparsers.add_parser("stats", help="count records",
+                                         description="""Count records by feature, seqname and gene and transcript
+                                         biotype, writing a TSV of category, name and count.""")
+    _add_threads_arg(stats_parser)
+    stats_parser.add_argument("in_gxf", help="GTF or GFF3 file")
+    stats_parser.add_argument("output", nargs="?", default="-", help="output TSV, default is stdout")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    index_parser = subparsers.add_parser("index", help="index a sorted file for random access",
+                                         description="""Index a file sorted by seqname and start for random access.
+                                         The file must be uncompressed or BGZF compressed.""")
+    index_parser.add_argument("--index-file",
+                              help="index file to create, default is the input file with `.gxi' appended")
+    index_parser.add_argument("in_gxf", help="GTF or GFF3 file")
+    index_parser.set_defaults(func=cmd_index)
+
+    convert_parser = subparsers.add_parser("convert", help="convert between GTF and GFF3",
+                                           description="""Convert a GTF file to GFF3 or a GFF3 file to GTF, based
+                                           on the file extensions.""")
+    convert_parser.add_argument("--unsorted", action="store_true",
+                                help="input is not sorted or grouped by locus")
+    convert_parser.add_argument("--spill-records", type=int,
+                                help="with unsorted GTF input, write records to temporary files when more than this number are held")
+    convert_parser.add_argument("--tmp-dir", help="directory for temporary files")
+    convert_parser.add_argument("--rename-attr", type=_parse_name_value, action="append", default=[],
+                                help="rename attribute OLD=NEW, may be repeated")
+    convert_parser.add_argument("--rename-feature", type=_parse_name_value, action="append", default=[],
+                                help="rename feature type OLD=NEW, may be repeated")
+    _add_threads_arg(convert_parser)
+    convert_parser.add_argument("in_gxf", help="GTF or GFF3 file")
+    convert_parser.add_argument("out_gxf", help="GFF3 or GTF output file")
+    convert_parser.set_defaults(func=cmd_convert)
+    return parser
+
+def main(argv=None):
+    "entry point of the gxfgenie program, returns the exit code"
+    args = _build_arg_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except GxfGenieError as ex:
+        print(f"gxfgenie {args.command}: {ex}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # output closed early, such as when piped to head
+        sys.stderr.close()
+        return 1
+    except OSError as ex:
+        # missing input or unwritable output
+        print(f"gxfgenie {args.command}: {ex}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,10 +4,39 @@
 # Common attribute names
 ##
 ATTR_ID = "ID"
-ATTR_PARENT = "ID"
+ATTR_PARENT = "Parent"
 ATTR_GENE_ID = "gene_id"
 ATTR_TRANSCRIPT_ID = "transcript_id"
 
 ##
 # Common gene and transcript feature names
 ##
+FEATURE_GENE = "gene"
+FEATURE_TRANSCRIPT = "transcript"
+FEATURE_EXON = "exon"
+FEATURE_CDS = "CDS"
+
+# GFF3 feature types of gene records
+GENE_FEATURES = frozenset((
+    FEATURE_GENE,
+    "pseudogene",
+    "ncRNA_gene",
+))
+
+# GFF3 feature types of transcript records, used to identify transcripts
+# that don't have a gene parent.
+TRANSCRIPT_FEATURES = frozenset((
+    FEATURE_TRANSCRIPT,
+    "mRNA",
+    "ncRNA",
+    "lnc_RNA",
+    "miRNA",
+    "snRNA",
+    "snoRNA",
+    "scRNA",
+    "rRNA",
+    "tRNA",
+    "primary_transcript",
+    "pseudogenic_transcript",
+    "unconfirmed_transcript",
+))
@@ -20,3 +20,6 @@ class GxfGenieParseError(GxfGenieFormatError):
         if gxf_file is None:
             gxf_file = "<unknown>"
         super().__init__(f"Error: {gxf_file}:{line_number}: {msg}")
+        self.gxf_file = gxf_file
+        self.line_number = line_number
+        self.msg = msg
@@ -2,11 +2,27 @@
 Various file-related operations
 """
 # Copyright 2025-2025 Mark Diekhans
+import os
+import io
+import gzip
+import bz2
 import shutil
+import mmap
 from pathlib import Path
 import pipettor
 from gxfgenie.errors import GxfGenieError
 
+# Compressed files smaller than this are decompressed in-process rather than
+# with a subprocess.  Larger files use a subprocess, as a parallel
+# decompressor such as unpigz is faster.
+INPROCESS_MAX_SIZE = 256 * 1024 * 1024
+
+# buffer size used for in-process compression and decompression
+INPROCESS_BUFFER_SIZE = 1024 * 1024
+
+# compression level for in-process gzip, default of gzip program
+INPROCESS_GZIP_LEVEL = 6
+
 def is_compressed(path):
     """
     Determine if a file appears to be compressed by extension.
@@ -55,19 +71,79 @@ def decompress_cmd(path):
         return ["cat"]
 
 
-def opengz(file_name, mode="r", buffering=-1, encoding=None, errors=None):
+def _inprocess_supported(path):
+    return str(path).endswith((".gz", ".bz2"))
+
+def _use_inprocess(path, mode):
+    """decide if in-process compression or decompression should be used"""
+    if not _inprocess_supported(path):
+        return False
+    if mode.startswith("r"):
+        cmd = decompress_cmd(path)
+        return (shutil.which(cmd[0]) is None) or (os.path.getsize(path) < INPROCESS_MAX_SIZE)
+    else:
+        cmd = compress_cmd(path)
+        return shutil.which(cmd[0]) is None
+
+def _open_inprocess(file_name, mode, buffering, encoding, errors):
+    """open a gzip or bzip2 file with Python compression streams, the
+    compression streams are always buffered, so buffering of zero uses the
+    default size"""
+    buffer_size = INPROCESS_BUFFER_SIZE if buffering <= 0 else buffering
+    bin_mode = "rb" if mode.startswith("r") else "wb"
+    if str(file_name).endswith(".gz"):
+        if bin_mode == "wb":
+            fh = gzip.open(file_name, bin_mode, compresslevel=INPROCESS_GZIP_LEVEL)
+        else:
+            fh = gzip.open(file_name, bin_mode)
+    else:
+        fh = bz2.open(file_name, bin_mode)
+    if bin_mode == "rb":
+        fh = io.BufferedReader(fh, buffer_size=buffer_size)
+    else:
+        fh = io.BufferedWriter(fh, buffer_size=buffer_size)
+    if "b" in mode:
+        return fh
+    return io.TextIOWrapper(fh, encoding=encoding, errors=errors)
+
+def opengz(file_name, mode="r", buffering=-1, encoding=None, errors=None, *, inprocess=None):
     """
     Open a file. If it ends with a compression extension, open with
-    a compression/decompression pipe.
+    a compression/decompression pipe or with Python compression streams.
+
+    Args:
+        inprocess (bool): If True, gzip and bzip2 files are compressed or
+            decompressed in-process.  If False, a subprocess is used.  If None,
+            decompression is done in-process for files smaller than
+            INPROCESS_MAX_SIZE, and compression uses a subprocess.  The
+            in-process method is always used if the program is not
+            available. `.Z' files always use a subprocess.
     """
     if is_compressed(file_name):
-        if mode.startswith("r"):
+        if not (mode.startswith("r") or mode.startswith("w")):
+            raise GxfGenieError(f"Mode `{mode}' not supported with compression for `{file_name}'")
+        if inprocess is None:
+            inprocess = _use_inprocess(file_name, mode)
+        elif inprocess and not _inprocess_supported(file_name):
+            raise GxfGenieError(f"In-process compression is not supported for `{file_name}'")
+        if inprocess:
+            return _open_inprocess(file_name, mode, buffering, encoding, errors)
+        elif mode.startswith("r"):
             cmd = decompress_cmd(file_name)
             return pipettor.Popen(cmd + [file_name], mode=mode, buffering=buffering, encoding=encoding, errors=errors)
-        elif mode.startswith("w"):
+        else:
             cmd = compress_cmd(file_name)
             return pipettor.Popen(cmd, mode=mode, stdout=file_name, buffering=buffering, encoding=encoding, errors=errors)
-        else:
-            raise GxfGenieError(f"Mode `{mode}' not supported with compression for `{file_name}'")
     else:
         return open(file_name, mode, buffering=buffering, encoding=encoding, errors=errors)
+
+def open_mmap(file_name):
+    """
+    Map an uncompressed file into memory for reading as bytes.  Returns
+    an mmap object, or an empty bytes object if the file is empty, as empty
+    files can't be mapped.  Both support find() and slicing.
+    """
+    with open(file_name, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
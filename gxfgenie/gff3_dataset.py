@@ -1,21 +1,68 @@
 """
-Base class to store contents of a GxF file as collection of feature trees.
+Store contents of a GFF3 file as collection of feature trees.
 """
-from gxfgenie.defs import ATTR_ID
+from gxfgenie.defs import ATTR_ID, ATTR_PARENT, GENE_FEATURES, TRANSCRIPT_FEATURES
 from gxfgenie.gxf_dataset import GxfDataSet, GxfRecListDict
-from gxfgenie.errors import GxfGenieError, GxfGenieParseError
+from gxfgenie.errors import GxfGenieParseError
 
-class GffDataSet(GxfDataSet):
+class Gff3DataSet(GxfDataSet):
     """Container for contents of a GFF3 file.
+
+    Records are linked using the ID and Parent attributes.  A record with
+    multiple parents is added as a child of each of them, with its parent
+    field set to the first one linked.  Discontinuous features, which are
+    multiple records with the same ID, are all indexed by ID, with children
+    linked to the first record.  A record reusing an ID with a different
+    Parent is treated as a new feature, with following children linked to it.
+
+    Genes are records with a gene feature type, indexed by ID.  Transcripts
+    are the children of genes, or root records with a transcript feature
+    type, also indexed by ID.  A Parent that never appears in the file is
+    an error, reported by finish().
     """
 
     def __init__(self):
-        super(self).__init__(self)
+        super().__init__()
         # must be a list for ids due to discontinuous features
         self._records_by_id = GxfRecListDict()
 
-    def add_record(self, rec):
-        rec_id = rec.attrs.find_attr_value1(ATTR_ID)
+    def get_records_by_id(self, rec_id, default=None):
+        """
+        Get a list of records with an ID or default if not found.
+        """
+        return self._records_by_id.get(rec_id, default)
+
+    def _link_record(self, rec):
+        attrs = rec.attrs
+        rec_id = attrs.find_attr_value(ATTR_ID)
+        parent_attr = attrs.find_attr(ATTR_PARENT)
         if rec_id is not None:
-            self._records_by_id.append(rec_id, rec)
-        super(self).add_record(rec)
+            self._add_id(rec_id, rec, parent_attr)
+        if parent_attr is None:
+            self._add_root(rec)
+            if rec_id is not None:
+                if rec.feature in GENE_FEATURES:
+                    self._genes_by_id.append(rec_id, rec)
+                elif rec.feature in TRANSCRIPT_FEATURES:
+                    self._transcripts_by_id.append(rec_id, rec)
+        else:
+            for iparent in range(len(parent_attr)):
+                self._link_to_parent(parent_attr[iparent], rec)
+
+    def _add_id(self, rec_id, rec, parent_attr):
+        target = self._link_targets.get(rec_id)
+        if (target is None) or (target.attrs.find_attr(ATTR_PARENT) != parent_attr):
+            self._set_link_target(rec_id, rec)
+        self._records_by_id.append(rec_id, rec)
+
+    def _child_linked(self, parent, child):
+        if (child.parent is parent) and (parent.feature in GENE_FEATURES):
+            child_id = child.attrs.find_attr_value(ATTR_ID)
+            if child_id is not None:
+                self._transcripts_by_id.append(child_id, child)
+
+    def _unresolved_parents(self, pending):
+        for parent_id, children in pending.items():
+            child = children[0]
+            raise GxfGenieParseError(child.file_name, child.line_number,
+                                     f"Parent `{parent_id}' not found for {child.feature} record")
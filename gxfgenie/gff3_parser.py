@@ -6,18 +6,9 @@ GFF3 parser
 import re
 from urllib.parse import quote, unquote
 from gxfgenie.errors import GxfGenieFormatError
-from gxfgenie.gxf_record import GxfAttrs, GxfRecord, gxf_attr_add, str_or_dot
+from gxfgenie.gxf_record import GxfAttrs, GxfRecord, gxf_attr_add_parsed, str_or_dot
 from gxfgenie.gxf_parser import GxfParser
 
-# split attributes field
-_split_attr_col_re = re.compile(r"; *")
-
-# Parses `attr=val`
-_split_attr_re = re.compile(r"^([^=]+)=(.+)$")
-
-# splits multi-value attributes
-_split_multi_var_re = re.compile(",")
-
 # seqname characters that do not need to be escaped and safe for encoding
 _seqname_valid_re = re.compile(r'^[a-zA-Z0-9.:^*$@!+_?\-\|]+$')
 _seqname_safe = ':^*$@!+?|'
@@ -32,13 +23,19 @@ _other_safe = ':?#[]@!$&\'()*+,;=/'
 _col9_quote_re = re.compile(r'[;=&,]|' + _other_quote_re.pattern)
 _col9_safe = ':?#[]@!$\'()*+,/'
 
-def _quote_seqname(seqname):
+def _unquote(value):
+    "decode % escapes, checking for `%' first as very few values have escapes"
+    return unquote(value) if '%' in value else value
+
+def gff3_quote_seqname(seqname):
+    "%-encode a seqname if needed"
     if not _seqname_valid_re.fullmatch(seqname):
         return quote(seqname, safe=_seqname_safe)
     else:
         return seqname
 
-def _quote_other(value):
+def gff3_quote_other(value):
+    "%-encode a column other than seqname or attributes if needed"
     if _other_quote_re.search(value):
         return quote(value, safe=_other_safe)
     else:
@@ -50,6 +47,29 @@ def _quote_col9(value):
     else:
         return value
 
+def _parse_attr_val(value):
+    if ',' in value:
+        return tuple([_unquote(v) for v in value.split(',')])
+    else:
+        return _unquote(value)
+
+def gff3_parse_attrs(attrs_str, attrs_cache, attr_names=None):
+    """
+    Parse a GFF3 attribute column into a Gff3Attrs object.  The attrs_cache
+    GxfAttrPool is used to share GxfAttr objects, or None to not share them.  If attr_names is not None, only
+    attributes in this set are kept, others are not decoded.
+    """
+    attrs = Gff3Attrs()
+    for attr_str in attrs_str.strip().split(';'):
+        attr_str = attr_str.lstrip(' ')
+        if len(attr_str) > 0:
+            name, _, value = attr_str.partition('=')
+            if (len(name) == 0) or (len(value) == 0):
+                raise GxfGenieFormatError(f"Can't parse attribute=value: `{attr_str}'")
+            if (attr_names is None) or (name in attr_names):
+                gxf_attr_add_parsed(attrs, attrs_cache, name, _parse_attr_val(value))
+    return attrs
+
 class Gff3Attrs(GxfAttrs):
     """ GFF3 attributes of a record"""
 
@@ -58,60 +78,48 @@ class Gff3Attrs(GxfAttrs):
 
 class Gff3Record(GxfRecord):
     "A GFF3 record"
+    attrs_class = Gff3Attrs
+
+    @staticmethod
+    def parse_attrs_str(attrs_str):
+        "parse an attribute column into a Gff3Attrs object"
+        return gff3_parse_attrs(attrs_str, None)
 
     def __str__(self):
         """convert to tab-separate line"""
 
-        return '\t'.join([_quote_seqname(self.seqname),
-                          _quote_other(self.source),
-                          _quote_other(self.feature),
+        return '\t'.join([gff3_quote_seqname(self.seqname),
+                          gff3_quote_other(self.source),
+                          gff3_quote_other(self.feature),
                           str(self.start),
                           str(self.end),
                           str_or_dot(self.score),
                           str_or_dot(self.strand),
                           str_or_dot(self.phase),
-                          str(self.attrs)])
+                          str(self._attrs)])
 
 class Gff3Parser(GxfParser):
     """
     Parse a GTF file
     """
-
-    def _split_multi_val_attr(self, val_str):
-        return tuple([unquote(value)
-                      for value in _split_multi_var_re.split(val_str)])
-
-    def _parse_attr_val(self, attr_str, attrs):
-        match = _split_attr_re.match(attr_str)
-        if match is None:
-            raise GxfGenieFormatError(f"Can't parse attribute=value: `{attr_str}'")
-        name = match.group(1)
-        value = match.group(2)
-        if ',' in value:
-            value = self._split_multi_val_attr(value)
-        else:
-            value = unquote(value)
-        gxf_attr_add(attrs, self.attrs_cache, name, value)
+    record_class = Gff3Record
 
     def parse_attrs(self, attrs_str):
         """
         Parse the attributes and values.
         """
-        attrs = Gff3Attrs()
-        for attr_str in _split_attr_col_re.split(attrs_str.strip()):
-            if len(attr_str) > 0:
-                self._parse_attr_val(attr_str, attrs)
-        return attrs
+        return gff3_parse_attrs(attrs_str, self.attrs_cache, self.gxf_filter.attr_names)
 
     def create_record(self, seqname, source, feature, start, end, score, strand, phase, attrs, *,
                       file_name=None, line_number=None):
         "create a Gff3Record object"
-        return Gff3Record(unquote(seqname), unquote(source), unquote(feature),
+        return Gff3Record(_unquote(seqname), _unquote(source), _unquote(feature),
                           start, end, score, strand, phase, attrs,
                           file_name=file_name, line_number=line_number)
 
 
-def _format_attr(attr):
+def gff3_format_attr(attr):
+    "format one attribute as `name=value,...'"
     name = _quote_col9(attr.name)
     values = attr.value
     if isinstance(values, str):
@@ -125,5 +133,5 @@ def gff3_format_attrs(attrs):
     """
     attrs_strs = []
     for attr in attrs.values():
-        attrs_strs.append(_format_attr(attr))
+        attrs_strs.append(gff3_format_attr(attr))
     return ";".join(attrs_strs)
@@ -0,0 +1,59 @@
+"""
+Streaming assembly of GFF3 feature trees.
+"""
+# Copyright 2025-2025 Mark Diekhans
+from gxfgenie.defs import ATTR_ID, ATTR_PARENT
+from gxfgenie.gxf_tree_stream import GxfTreeStream
+from gxfgenie.errors import GxfGenieParseError
+
+# value of the GxfMeta for the `###' directive, indicating all forward
+# references have been resolved
+META_RESOLVED = "#"
+
+class Gff3TreeStream(GxfTreeStream):
+    """Assemble GFF3 feature trees from a stream of records, returning each
+    gene or other root record as soon as its tree is complete.  See
+    GxfTreeStream.
+
+    Records are linked using the ID and Parent attributes, as in Gff3DataSet.
+    A record with multiple parents is added as a child of each of them.
+    Discontinuous features, which are multiple records with the same ID,
+    are kept in the same tree, with children linked to the first record.
+    A record reusing an ID with a different Parent is treated as a new
+    feature.
+
+    All trees are complete at a `###' directive, which is not saved in metas.
+    A Parent that has not been added when trees are completed is an error.
+    """
+
+    def add_meta(self, meta):
+        if meta.value == META_RESOLVED:
+            self._finish_groups()
+        else:
+            super().add_meta(meta)
+
+    def _link_record(self, rec, group):
+        attrs = rec.attrs
+        rec_id = attrs.find_attr_value(ATTR_ID)
+        parent_attr = attrs.find_attr(ATTR_PARENT)
+        if rec_id is not None:
+            group = self._add_id(rec_id, rec, group, parent_attr)
+        if parent_attr is None:
+            self._add_root(rec, group)
+        else:
+            for iparent in range(len(parent_attr)):
+                group = self._link_to_parent(parent_attr[iparent], rec, group)
+        return group
+
+    def _add_id(self, rec_id, rec, group, parent_attr):
+        target = self._link_targets.get(rec_id)
+        if (target is None) or (target[0].attrs.find_attr(ATTR_PARENT) != parent_attr):
+            return self._set_link_target(rec_id, rec, group)
+        # another part of a discontinuous feature
+        return self._merge_groups(group, target[1])
+
+    def _unresolved_parents(self, pending):
+        for parent_id, children in pending.items():
+            child = children[0][0]
+            raise GxfGenieParseError(child.file_name, child.line_number,
+                                     f"Parent `{parent_id}' not found for {child.feature} record")
@@ -0,0 +1,41 @@
+"""
+Store contents of a GTF file as collection of feature trees.
+"""
+from gxfgenie.defs import ATTR_GENE_ID, ATTR_TRANSCRIPT_ID, FEATURE_GENE, FEATURE_TRANSCRIPT
+from gxfgenie.gxf_dataset import GxfDataSet
+
+class GtfDataSet(GxfDataSet):
+    """Container for contents of a GTF file.
+
+    Records are linked using the gene_id and transcript_id attributes, within
+    a sequence, as the same ids are used on the chrX and chrY PARs in some
+    GENCODE versions.  Gene records are roots, transcript records are children
+    of the gene, and other records are children of their transcript, or of
+    the gene if they only have a gene_id.
+
+    Many GTF files don't contain gene or transcript records.  Records whose
+    gene or transcript is not in the file become roots.
+    """
+
+    def _link_record(self, rec):
+        attrs = rec.attrs
+        gene_id = attrs.find_attr_value(ATTR_GENE_ID)
+        transcript_id = attrs.find_attr_value(ATTR_TRANSCRIPT_ID)
+        if rec.feature == FEATURE_GENE:
+            self._genes_by_id.append(gene_id, rec)
+            self._set_link_target((FEATURE_GENE, rec.seqname, gene_id), rec)
+            self._add_root(rec)
+        elif rec.feature == FEATURE_TRANSCRIPT:
+            self._transcripts_by_id.append(transcript_id, rec)
+            self._set_link_target((FEATURE_TRANSCRIPT, rec.seqname, transcript_id), rec)
+            self._link_to_gene(gene_id, rec)
+        elif transcript_id is not None:
+            self._link_to_parent((FEATURE_TRANSCRIPT, rec.seqname, transcript_id), rec)
+        else:
+            self._link_to_gene(gene_id, rec)
+
+    def _link_to_gene(self, gene_id, rec):
+        if gene_id is None:
+            self._add_root(rec)
+        else:
+            self._link_to_parent((FEATURE_GENE, rec.seqname, gene_id), rec)
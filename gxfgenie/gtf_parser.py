@@ -4,15 +4,39 @@ GTF parser
 # Copyright 2025-2025 Mark Diekhans
 import re
 from gxfgenie.errors import GxfGenieFormatError
-from gxfgenie.gxf_record import GxfAttrs, GxfRecord, gxf_attr_add, str_or_dot
+from gxfgenie.gxf_record import GxfAttrs, GxfRecord, gxf_attr_add_parsed, str_or_dot
 from gxfgenie.gxf_parser import GxfParser
 
-# split attributes field
-# Will not currently work if attr has quoted space or ;
-_split_attr_col_re = re.compile(r"; *")
+# Parses one `attr "strval";' or `attr numval;', including the leading
+# separators.  Quoted values may contain `;', spaces and quotes, a value ends
+# at the quote that is followed by `;' or the end of the column.  Empty values
+# are not allowed.  Used with finditer() to tokenize the whole column in one
+# pass.
+_attr_re = re.compile(r'[ ;]*([a-zA-Z_]+) +(?:"(?!" *(?:;|$))([^"]*(?:"(?! *(?:;|$))[^"]*)*)"|([0-9]+)) *(?:;|$)')
 
-# Parses `attr "strval"' or `attr numval'.
-_split_attr_re = re.compile(r"^([a-zA-Z_]+) +((\"(.+)\")|([0-9]+))$")
+
+def _attr_parse_error(attrs_str, pos):
+    attr_str = attrs_str[pos:].lstrip(" ;").split(";", 1)[0]
+    return GxfGenieFormatError(f"Can't parse attribute=value: `{attr_str}'")
+
+def gtf_parse_attrs(attrs_str, attrs_cache, attr_names=None):
+    """
+    Parse a GTF attribute column into a GtfAttrs object.  The attrs_cache
+    GxfAttrPool is used to share GxfAttr objects, or None to not share them.  If attr_names is not None, only
+    attributes in this set are kept.
+    """
+    attrs = GtfAttrs()
+    pos = 0
+    for match in _attr_re.finditer(attrs_str):
+        if match.start() != pos:
+            raise _attr_parse_error(attrs_str, pos)
+        pos = match.end()
+        name, str_val, num_val = match.groups()
+        if (attr_names is None) or (name in attr_names):
+            gxf_attr_add_parsed(attrs, attrs_cache, name, str_val if str_val is not None else num_val)
+    if (pos < len(attrs_str)) and (len(attrs_str[pos:].strip(" \t;")) > 0):
+        raise _attr_parse_error(attrs_str, pos)
+    return attrs
 
 
 class GtfAttrs(GxfAttrs):
@@ -23,6 +47,12 @@ class GtfAttrs(GxfAttrs):
 
 class GtfRecord(GxfRecord):
     "A GTF record"
+    attrs_class = GtfAttrs
+
+    @staticmethod
+    def parse_attrs_str(attrs_str):
+        "parse an attribute column into a GtfAttrs object"
+        return gtf_parse_attrs(attrs_str, None)
 
     def __str__(self):
         """convert to tab-separate line"""
@@ -34,29 +64,19 @@ class GtfRecord(GxfRecord):
                           str_or_dot(self.score),
                           str_or_dot(self.strand),
                           str_or_dot(self.phase),
-                          str(self.attrs)])
+                          str(self._attrs)])
 
 class GtfParser(GxfParser):
     """
     Parse a GTF file.
     """
-    def _parse_attr_val(self, attr_str, attrs):
-        match = _split_attr_re.match(attr_str)
-        if match is None:
-            raise GxfGenieFormatError(f"Can't parse attribute=value: `{attr_str}'")
-        name = match.group(1)
-        value = match.group(5) if match.group(5) is not None else match.group(4)
-        gxf_attr_add(attrs, self.attrs_cache, name, value)
+    record_class = GtfRecord
 
     def parse_attrs(self, attrs_str):
         """
         Parse the attributes and values.
         """
-        attrs = GtfAttrs()
-        for attr_str in _split_attr_col_re.split(attrs_str.strip()):
-            if len(attr_str) > 0:
-                self._parse_attr_val(attr_str, attrs)
-        return attrs
+        return gtf_parse_attrs(attrs_str, self.attrs_cache, self.gxf_filter.attr_names)
 
     def create_record(self, seqname, source, feature, start, end, score, strand, phase, attrs, *,
                       file_name=None, line_number=None):
@@ -72,13 +92,15 @@ def _format_attr(attr, value):
     else:
         return f'{attr.name} "{value}";'
 
+def gtf_format_attr(attr):
+    """
+    Format one attribute, repeating it for each value.
+    """
+    # must repeat attributes, no multi-value syntax like GFF3
+    return " ".join([_format_attr(attr, attr[ival]) for ival in range(0, len(attr))])
+
 def gtf_format_attrs(attrs):
     """
     Format a GtfAttrs object into a valid GTF attributes string.
     """
-    # must repeat attributes, no multi-value syntax like GFF3
-    attrs_strs = []
-    for attr in attrs.values():
-        for ival in range(0, len(attr)):
-            attrs_strs.append(_format_attr(attr, attr[ival]))
-    return " ".join(attrs_strs)
+    return " ".join([gtf_format_attr(attr) for attr in attrs.values()])
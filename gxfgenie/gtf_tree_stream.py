@@ -0,0 +1,266 @@
+"""
+Streaming grouping of GTF records into gene and transcript trees.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import pickle
+import tempfile
+from gxfgenie.defs import ATTR_GENE_ID, ATTR_TRANSCRIPT_ID, FEATURE_GENE, FEATURE_TRANSCRIPT
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_tree_stream import GxfTreeStream
+
+# number of temporary files records are partitioned into when spilling
+DEFAULT_SPILL_PARTITIONS = 64
+
+# attributes of exons that are not copied to synthesized transcripts
+EXON_ATTRS = frozenset(("exon_number", "exon_id"))
+
+
+def _group_key(rec):
+    """key for the records grouped together, normally the gene, or None if
+    the record is not grouped"""
+    attrs = rec.attrs
+    gene_id = attrs.find_attr_value(ATTR_GENE_ID)
+    if gene_id is not None:
+        return (rec.seqname, gene_id, None)
+    transcript_id = attrs.find_attr_value(ATTR_TRANSCRIPT_ID)
+    if transcript_id is not None:
+        return (rec.seqname, None, transcript_id)
+    return None
+
+def _common_attrs(recs, keep_attr):
+    "attributes that have the same value in all records and pass keep_attr(name)"
+    attrs = recs[0].attrs_class()
+    for name, attr in recs[0].attrs.items():
+        if keep_attr(name) and all(rec.attrs.find_attr(name) == attr for rec in recs[1:]):
+            attrs[name] = attr
+    return attrs
+
+def _keep_transcript_attr(name):
+    return name not in EXON_ATTRS
+
+def _keep_gene_attr(name):
+    return (name == ATTR_GENE_ID) or name.startswith("gene_")
+
+def _synthesize_record(feature, recs, attrs):
+    "create a record covering recs"
+    rec0 = recs[0]
+    strand = rec0.strand
+    if any(rec.strand != strand for rec in recs):
+        strand = None
+    return type(rec0)(rec0.seqname, rec0.source, feature,
+                      min(rec.start for rec in recs), max(rec.end for rec in recs),
+                      None, strand, None, attrs, file_name=rec0.file_name)
+
+
+class GtfTreeStream(GxfTreeStream):
+    """Group GTF records into gene and transcript trees from a stream of
+    records, returning each tree as soon as it is complete.  See
+    GxfTreeStream.
+
+    Records are grouped by gene_id within a sequence, and linked as in
+    GtfDataSet: gene records are roots, transcript records are children
+    of the gene, and other records are children of their transcript, or of
+    the gene if they only have a gene_id.  Records whose gene or transcript
+    record is not in the input become roots, unless synthesize is specified.
+
+    With synthesize, missing transcript records are created from their
+    child records, with the attributes the children have in common, other
+    than those in EXON_ATTRS.  Missing gene records are created from all of
+    the records of the gene, with gene_id and the other common attributes
+    whose names start with `gene_'.  Synthesized records have a line_number
+    of None.
+
+    Position sorted input without gene or transcript records, where the
+    records of a transcript are not grouped together, should be treated as
+    unsorted, as the end of a gene can't be determined.
+
+    Input that is not sorted is held in memory until finish().  Specifying
+    spill_records bounds memory by writing the records to temporary files
+    when more than this number are held.  The files are partitioned by gene
+    and each partition is loaded in turn after all records have been added,
+    so the trees are then not returned in input order.
+
+    Args:
+        sorted_input (bool): input is sorted or grouped by locus.
+        synthesize (bool): create missing gene and transcript records.
+        spill_records (int): spill to temporary files when this number of
+            records are held, only used with unsorted input.
+        spill_partitions (int): number of temporary files used to spill.
+        tmp_dir (str): directory for temporary files.
+
+    Attributes:
+        spilled (bool): records have been written to temporary files.
+    """
+
+    def __init__(self, *, sorted_input=True, synthesize=False, spill_records=None,
+                 spill_partitions=DEFAULT_SPILL_PARTITIONS, tmp_dir=None):
+        if sorted_input and (spill_records is not None):
+            raise GxfGenieError("spill_records can only be used with unsorted input")
+        super().__init__(sorted_input=sorted_input)
+        self.synthesize = synthesize
+        self.spill_records = spill_records
+        self.spill_partitions = spill_partitions
+        self.tmp_dir = tmp_dir
+        self._num_held = 0
+        self._spill_fhs = None
+        self._finished = False
+        self.spilled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        "remove spill files"
+        if self._spill_fhs is not None:
+            for fh in self._spill_fhs:
+                fh.close()
+            self._spill_fhs = None
+
+    def add_record(self, rec):
+        super().add_record(rec)
+        if (self.spill_records is not None) and (self._num_held > self.spill_records):
+            self._spill()
+
+    def finish(self):
+        if self._spill_fhs is None:
+            super().finish()
+        else:
+            self._spill()
+        self._finished = True
+
+    def pop_trees(self):
+        yield from super().pop_trees()
+        if self._finished and (self._spill_fhs is not None):
+            try:
+                while len(self._spill_fhs) > 0:
+                    yield from self._load_partition(self._spill_fhs.pop(0))
+            finally:
+                self.close()
+
+    def _link_record(self, rec, group):
+        key = _group_key(rec)
+        self._num_held += 1
+        if key is None:
+            self._add_root(rec, group)
+            return group
+        target = self._link_targets.get(key)
+        if target is None:
+            self._link_targets[key] = ([rec], group)
+            group.keys.append(key)
+            return group
+        records, gene_group = target
+        records.append(rec)
+        return self._merge_groups(group, gene_group)
+
+    def _group_roots(self, group):
+        roots = list(group.roots)
+        for key in group.keys:
+            records = self._link_targets[key][0]
+            roots.extend(self._build_trees(records))
+            self._num_held -= len(records)
+        self._num_held -= len(group.roots)
+        return roots
+
+    def _build_trees(self, records):
+        "link the records of a group, returning the roots"
+        gene = None
+        transcripts = {}
+        for rec in records:
+            if rec.feature == FEATURE_GENE:
+                if gene is None:
+                    gene = rec
+            elif rec.feature == FEATURE_TRANSCRIPT:
+                transcripts.setdefault(rec.attrs.find_attr_value(ATTR_TRANSCRIPT_ID), rec)
+        roots = []
+        synthesized = set()
+        if self.synthesize:
+            gene, transcripts = self._synthesize(records, gene, transcripts, synthesized)
+            if id(gene) in synthesized:
+                roots.append(gene)
+
+        def link(parent, rec):
+            if parent is None:
+                roots.append(rec)
+            else:
+                self._link_child(parent, rec)
+
+        for rec in records:
+            if rec.feature == FEATURE_GENE:
+                roots.append(rec)
+            elif rec.feature == FEATURE_TRANSCRIPT:
+                link(gene, rec)
+            else:
+                transcript_id = rec.attrs.find_attr_value(ATTR_TRANSCRIPT_ID)
+                if transcript_id is None:
+                    link(gene, rec)
+                else:
+                    trans = transcripts.get(transcript_id)
+                    if (trans is not None) and (id(trans) in synthesized):
+                        # link a synthesized transcript before its first child
+                        synthesized.remove(id(trans))
+                        link(gene, trans)
+                    link(trans, rec)
+        return roots
+
+    def _synthesize(self, records, gene, transcripts, synthesized):
+        """create missing transcript and gene records, adding their ids to
+        synthesized, returning the gene and transcripts"""
+        children = {}
+        for rec in records:
+            if rec.feature not in (FEATURE_GENE, FEATURE_TRANSCRIPT):
+                transcript_id = rec.attrs.find_attr_value(ATTR_TRANSCRIPT_ID)
+                if (transcript_id is not None) and (transcript_id not in transcripts):
+                    children.setdefault(transcript_id, []).append(rec)
+        for transcript_id, recs in children.items():
+            trans = transcripts[transcript_id] = _synthesize_record(FEATURE_TRANSCRIPT, recs,
+                                                                    _common_attrs(recs, _keep_transcript_attr))
+            synthesized.add(id(trans))
+        if (gene is None) and (records[0].attrs.find_attr_value(ATTR_GENE_ID) is not None):
+            gene = _synthesize_record(FEATURE_GENE, records, _common_attrs(records, _keep_gene_attr))
+            synthesized.add(id(gene))
+        return gene, transcripts
+
+    def _spill(self):
+        """write all records held to the partition files, as one list of
+        (key, records) per partition, so shared attributes are only written
+        once"""
+        if self._spill_fhs is None:
+            self._spill_fhs = [tempfile.TemporaryFile(dir=self.tmp_dir) for _ in range(self.spill_partitions)]
+            self.spilled = True
+        fhs = self._spill_fhs
+        parts = [[] for _ in range(len(fhs))]
+        for group in self._groups:
+            for key in group.keys:
+                parts[hash(key) % len(fhs)].append((key, self._link_targets[key][0]))
+            for rec in group.roots:
+                parts[hash((rec.seqname, rec.start)) % len(fhs)].append((None, [rec]))
+        for fh, part in zip(fhs, parts):
+            if len(part) > 0:
+                pickle.dump(part, fh, pickle.HIGHEST_PROTOCOL)
+        self._groups.clear()
+        self._link_targets = {}
+        self._num_held = 0
+
+    def _load_partition(self, fh):
+        "generator of the trees in a partition file, in order of their first record"
+        fh.seek(0)
+        groups = {}
+        while True:
+            try:
+                part = pickle.load(fh)
+            except EOFError:
+                break
+            for key, records in part:
+                if key is None:
+                    groups[id(records)] = records
+                else:
+                    groups.setdefault(key, []).extend(records)
+        fh.close()
+        for records in sorted(groups.values(), key=lambda recs: recs[0].line_number):
+            if (len(records) == 1) and (_group_key(records[0]) is None):
+                yield records[0]
+            else:
+                yield from self._build_trees(records)
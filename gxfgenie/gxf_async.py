@@ -0,0 +1,89 @@
+"""
+Parsing for use with asyncio.  The blocking parse() of a parser, including
+reading compressed files through a pipe, is run in a background thread that
+passes batches of records to the event loop through a bounded queue.  The
+queue size limits how far the thread reads ahead of the consumer.  Use
+GxfParser.aparse() or GxfParser.aparse_batches() rather than this module
+directly.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import asyncio
+import threading
+
+# number of records passed to the event loop at a time
+DEFAULT_BATCH_SIZE = 1000
+
+# maximum number of batches read ahead of the consumer
+DEFAULT_MAX_BATCHES = 4
+
+_END = object()
+
+
+class _ParseFailed:
+    "exception raised by the parse, passed to the event loop"
+    __slots__ = ("exc",)
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _parse_thread(parser, parse_args, batch_size, loop, queue, stop):
+    """Run the parse in the thread, putting batches in the queue.  Once stop
+    is set, nothing more is added to the queue and the parse is closed."""
+    def put(item):
+        if not stop.is_set():
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    try:
+        recs = parser.parse(**parse_args)
+        try:
+            batch = []
+            for rec in recs:
+                batch.append(rec)
+                if len(batch) >= batch_size:
+                    put(batch)
+                    batch = []
+                    if stop.is_set():
+                        return
+            if len(batch) > 0:
+                put(batch)
+        finally:
+            recs.close()
+        put(_END)
+    except BaseException as ex:
+        put(_ParseFailed(ex))
+
+
+async def gxf_aparse_batches(parser, *, batch_size=None, max_batches=None, **parse_args):
+    """Async generator of lists of records or metadata parsed by parser.
+    See GxfParser.aparse_batches()."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(max_batches if max_batches is not None else DEFAULT_MAX_BATCHES)
+    stop = threading.Event()
+    thread = threading.Thread(target=_parse_thread, name="gxf-aparse", daemon=True,
+                              args=(parser, parse_args, batch_size if batch_size is not None else DEFAULT_BATCH_SIZE,
+                                    loop, queue, stop))
+    thread.start()
+    try:
+        while (batch := await queue.get()) is not _END:
+            if isinstance(batch, _ParseFailed):
+                raise batch.exc
+            yield batch
+    finally:
+        # stop the thread, emptying the queue so a put in progress can finish
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+        await asyncio.to_thread(thread.join)
+
+
+async def gxf_aparse(parser, *, batch_size=None, max_batches=None, **parse_args):
+    """Async generator of records or metadata parsed by parser.
+    See GxfParser.aparse()."""
+    batches = gxf_aparse_batches(parser, batch_size=batch_size, max_batches=max_batches, **parse_args)
+    try:
+        async for batch in batches:
+            for rec in batch:
+                yield rec
+    finally:
+        await batches.aclose()
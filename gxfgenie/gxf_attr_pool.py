@@ -0,0 +1,151 @@
+"""
+Pool of GxfAttr objects shared between records by the parsers.
+"""
+# Copyright 2025-2025 Mark Diekhans
+from gxfgenie.gxf_record import GxfAttr
+
+# number of lookups of an attribute name used to decide if it is pooled
+DEFAULT_SAMPLE_SIZE = 1000
+
+# attribute names with more than this fraction of distinct values in the
+# sample are not pooled
+DEFAULT_MAX_DISTINCT_FRACTION = 0.5
+
+
+class _NameSample:
+    "attributes of a name collected while deciding if it is pooled"
+    __slots__ = ("lookups", "attrs")
+
+    def __init__(self):
+        self.lookups = 0
+        self.attrs = {}
+
+
+class GxfAttrPool(dict):
+    """
+    Pool of GxfAttr objects, which are shared between records to save memory.
+    The pool is a dict keyed by (name, value).  Parsers look up attributes
+    with get() and call add() when it is not found, so that lookups of pooled
+    attributes are plain dictionary lookups.  A pool may be passed to
+    multiple parsers, so attributes common to many files are stored once.
+
+    The first sample_size lookups of each attribute name are used to measure
+    how often its values repeat.  Names where more than max_distinct_fraction
+    of the values are distinct, such as exon_id, are not pooled, since
+    sharing them saves little memory and would grow the pool with each
+    record.
+
+    If max_size is specified, the pool is bounded by an approximate
+    least-recently-used eviction.  Attributes are kept in two generations,
+    the dict itself and an older generation.  When the dict reaches half of
+    max_size, the older generation is discarded and replaced by the contents
+    of the dict.  Attributes found in the older generation are moved back
+    into the dict, so attributes used since the last eviction are kept.
+
+    Args:
+        max_size (int): maximum number of attributes kept, None for no limit.
+        sample_size (int): number of lookups of an attribute name used to
+            decide if it is pooled, 0 to pool all attributes.
+        max_distinct_fraction (float): names with more than this fraction of
+            distinct values in the sample are not pooled.
+    """
+
+    def __init__(self, max_size=None, *, sample_size=DEFAULT_SAMPLE_SIZE,
+                 max_distinct_fraction=DEFAULT_MAX_DISTINCT_FRACTION):
+        super().__init__()
+        self.max_size = max_size
+        self.sample_size = sample_size
+        self.max_distinct_fraction = max_distinct_fraction
+        self._generation_size = None if max_size is None else max(max_size // 2, 1)
+        self._old = {}
+        # name to True if pooled, False if not pooled, or a _NameSample
+        self._name_states = {}
+        self.evictions = 0
+
+    def __reduce__(self):
+        # a copy of a pool, such as one sent to another process, starts empty
+        return (self.__class__, (self.max_size,),
+                {"sample_size": self.sample_size, "max_distinct_fraction": self.max_distinct_fraction})
+
+    def __setstate__(self, state):
+        self.sample_size = state["sample_size"]
+        self.max_distinct_fraction = state["max_distinct_fraction"]
+
+    @property
+    def size(self):
+        "number of attributes held by the pool, including those being sampled"
+        return (len(self) + len(self._old)
+                + sum(len(s.attrs) for s in self._name_states.values() if isinstance(s, _NameSample)))
+
+    @property
+    def unpooled_names(self):
+        "set of attribute names that were sampled and found to not be worth pooling"
+        return {name for name, state in self._name_states.items() if state is False}
+
+    def add(self, key, attr=None):
+        """Called when key, a tuple of (name, value), is not found by get().
+        Returns the pooled GxfAttr, creating it from the key if attr is None
+        and it is not in the pool.  Attributes that are not pooled are
+        returned without being stored."""
+        name = key[0]
+        state = self._name_states.get(name)
+        if state is True:
+            return self._add_pooled(key, attr)
+        elif state is False:
+            return attr if attr is not None else GxfAttr.from_parsed(name, key[1])
+        elif self.sample_size <= 0:
+            self._name_states[name] = True
+            return self._add_pooled(key, attr)
+        else:
+            return self._add_sampled(name, key, attr, state)
+
+    def _add_pooled(self, key, attr):
+        pooled = self._old.pop(key, None)
+        if pooled is None:
+            pooled = attr if attr is not None else GxfAttr.from_parsed(key[0], key[1])
+        self._insert(key, pooled)
+        return pooled
+
+    def _insert(self, key, attr):
+        if (self._generation_size is not None) and (len(self) >= self._generation_size):
+            self.evictions += len(self._old)
+            self._old = dict(self)
+            self.clear()
+        self[key] = attr
+
+    def _add_sampled(self, name, key, attr, sample):
+        if sample is None:
+            sample = self._name_states[name] = _NameSample()
+        sample.lookups += 1
+        sampled = sample.attrs.get(key)
+        if sampled is None:
+            sampled = sample.attrs[key] = attr if attr is not None else GxfAttr.from_parsed(name, key[1])
+        if sample.lookups >= self.sample_size:
+            self._finish_sample(name, sample)
+        return sampled
+
+    def _finish_sample(self, name, sample):
+        if len(sample.attrs) > self.max_distinct_fraction * sample.lookups:
+            self._name_states[name] = False
+        else:
+            self._name_states[name] = True
+            for key, attr in sample.attrs.items():
+                self._insert(key, attr)
+
+    def intern_attrs(self, attrs):
+        """Replace the GxfAttr objects in a GxfAttrs object with pooled ones.
+        This is used for attributes that were not created using the pool,
+        such as those of records parsed in another process."""
+        for name, attr in attrs.items():
+            key = (name, attr.value)
+            pooled = self.get(key)
+            if pooled is None:
+                pooled = self.add(key, attr)
+            if pooled is not attr:
+                attrs[name] = pooled
+
+    def clear_all(self):
+        "remove all attributes and sampling information from the pool"
+        self.clear()
+        self._old = {}
+        self._name_states = {}
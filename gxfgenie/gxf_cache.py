@@ -0,0 +1,373 @@
+"""
+Binary cache of parsed GxF files, which can be loaded without parsing the
+text.  The cache stores the columns of a GxfColumns object as arrays in a
+file that is memory-mapped on load, so that loading is nearly instant and
+data is only paged in as it is used.
+
+The cache file starts with a header, followed by JSON metadata and then
+the arrays, aligned to 8 bytes.  Strings of the attribute values are
+stored in a table of UTF-8 bytes with an array of offsets.  GxfAttr objects
+are created on demand when records are materialized.
+
+The cache is keyed on the absolute path, size, and modification time of the
+GxF file, and on the options used to parse it.  A cache that does not match
+is rebuilt.
+
+This module requires numpy, which is an optional dependency.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import os
+import json
+import mmap
+import struct
+import tempfile
+import numpy as np
+from gxfgenie import gxf_parser_class, gxf_parser_factory, gxf_dataset_class
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfAttr, GxfMeta
+from gxfgenie.gxf_error_sink import GxfErrorSink
+from gxfgenie.gxf_filter import GxfFilter
+from gxfgenie.gtf_parser import GtfRecord
+from gxfgenie.gff3_parser import Gff3Record
+from gxfgenie.gxf_columns import GxfColumns, GxfCategories, gxf_columns_load
+
+CACHE_EXT = ".gxc"
+CACHE_VERSION = 1
+
+_CACHE_MAGIC = b"GXFCACHE"
+_header_struct = struct.Struct("<8sIQ")
+_ALIGN = 8
+
+_record_classes = {"gtf": GtfRecord, "gff3": Gff3Record}
+_record_class_names = {cls: name for name, cls in _record_classes.items()}
+
+# dtypes of GxfColumns arrays, stored little-endian
+_column_dtypes = {
+    "seqname_codes": "<u4",
+    "source_codes": "<u4",
+    "feature_codes": "<u4",
+    "starts": "<i8",
+    "ends": "<i8",
+    "scores": "<f8",
+    "score_is_int": "|b1",
+    "strands": "|i1",
+    "phases": "|i1",
+    "attr_set_ids": "<u4",
+    "line_numbers": "<i8",
+}
+
+# parser options that don't change the results
+_non_key_options = frozenset(("workers", "lazy_attrs", "block_size", "use_mmap", "attr_pool", "stats"))
+
+
+def gxf_cache_path(gxf_file, cache_dir=None):
+    """Path to the cache file for a GxF file.  By default, the cache is next to
+    the GxF file, otherwise it is in cache_dir, named after the file."""
+    if cache_dir is None:
+        return str(gxf_file) + CACHE_EXT
+    return os.path.join(cache_dir, os.path.basename(gxf_file) + CACHE_EXT)
+
+def _normalize_option(value):
+    if isinstance(value, GxfErrorSink):
+        # bad lines are skipped, the errors are not cached
+        return True
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+def _filter_options(gxf_filter):
+    """Criteria of a GxfFilter, keyed as the equivalent parse arguments.  A
+    subclass may test lines in ways not described by the criteria, so it can't
+    be part of a key."""
+    if type(gxf_filter) is not GxfFilter:
+        raise GxfGenieError(f"can't cache results parsed with a {type(gxf_filter).__name__} filter, only GxfFilter")
+    return {"features": gxf_filter.features, "seqnames": gxf_filter.seqnames,
+            "region": gxf_filter.region, "attr_names": gxf_filter.attr_names}
+
+def gxf_cache_key(gxf_file, parser_opts=None, parse_args=None):
+    """Key identifying the version of a GxF file and the options used to parse
+    it, as a JSON-compatible dict."""
+    stat = os.stat(gxf_file)
+    parse_args = dict(parse_args or {})
+    gxf_filter = parse_args.pop("gxf_filter", None)
+    if gxf_filter is not None:
+        parse_args.update(_filter_options(gxf_filter))
+    options = {}
+    for name, value in list((parser_opts or {}).items()) + list(parse_args.items()):
+        if (value is not None) and (name not in _non_key_options):
+            options[name] = _normalize_option(value)
+    return {"path": os.path.abspath(gxf_file),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "options": options}
+
+
+class _StringTable:
+    "Table of strings stored as UTF-8 bytes and an array of offsets"
+    __slots__ = ("_data", "_offsets")
+
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx):
+        return str(self._data[self._offsets[idx]:self._offsets[idx + 1]], "utf-8")
+
+
+class GxfCachedAttrStore:
+    """Attribute sets read from a cache, with the same interface as
+    GxfAttrStore.  GxfAttr objects are created when first used and then
+    shared between sets.
+
+    Each attribute has a name code, indexing attr_names, and a range of the
+    value_ids array of string table indices.  Each set is a range of the
+    set_attr_ids array of attribute ids.
+    """
+
+    def __init__(self, attr_names, attr_name_codes, attr_value_starts, value_ids,
+                 strings, set_starts, set_attr_ids):
+        self.attr_names = attr_names
+        self.attr_name_codes = attr_name_codes
+        self.attr_value_starts = attr_value_starts
+        self.value_ids = value_ids
+        self.strings = strings
+        self.set_starts = set_starts
+        self.set_attr_ids = set_attr_ids
+        self._attrs = {}
+
+    def __len__(self):
+        return len(self.set_starts) - 1
+
+    def _attr_value(self, attr_id):
+        start, end = int(self.attr_value_starts[attr_id]), int(self.attr_value_starts[attr_id + 1])
+        if end - start == 1:
+            return self.strings[int(self.value_ids[start])]
+        return tuple(self.strings[int(i)] for i in self.value_ids[start:end])
+
+    def _get_attr(self, attr_id):
+        attr = self._attrs.get(attr_id)
+        if attr is None:
+            attr = self._attrs[attr_id] = GxfAttr.from_parsed(self.attr_names[self.attr_name_codes[attr_id]],
+                                                              self._attr_value(attr_id))
+        return attr
+
+    def attr_set(self, set_id):
+        "tuple of GxfAttr objects in a set"
+        attr_ids = self.set_attr_ids[self.set_starts[set_id]:self.set_starts[set_id + 1]]
+        return tuple(self._get_attr(attr_id) for attr_id in attr_ids.tolist())
+
+    def finish(self):
+        pass
+
+    def make_attrs(self, attrs_class, set_id):
+        "create an GxfAttrs object of attrs_class for set"
+        attrs = attrs_class()
+        for attr in self.attr_set(set_id):
+            attrs[attr.name] = attr
+        return attrs
+
+    def set_mask(self, name, values=None):
+        """Boolean array, indexed by set id, of sets having attribute name.  If
+        values is not None, the attribute must have one of these values."""
+        if name not in self.attr_names:
+            return np.zeros(len(self), dtype=bool)
+        attr_mask = self.attr_name_codes == self.attr_names.index(name)
+        if values is not None:
+            values = frozenset(values)
+            for attr_id in np.flatnonzero(attr_mask).tolist():
+                attr = self._get_attr(attr_id)
+                attr_mask[attr_id] = any((attr[i] in values) for i in range(len(attr)))
+        # map attribute hits to the sets containing them
+        set_ids = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.set_starts))
+        mask = np.zeros(len(self), dtype=bool)
+        mask[set_ids[attr_mask[self.set_attr_ids]]] = True
+        return mask
+
+
+class _CacheWriter:
+    "write a GxfColumns object to a cache file"
+
+    def __init__(self, columns, key):
+        self.columns = columns
+        self.key = key
+        self.arrays = {}
+
+    def _build_attr_tables(self):
+        attr_store = self.columns.attr_store
+        attr_ids = {}
+        attr_names = GxfCategories()
+        strings = GxfCategories()
+        attr_name_codes, attr_value_starts, value_ids = [], [0], []
+        set_starts, set_attr_ids = [0], []
+        for set_id in range(len(attr_store)):
+            for attr in attr_store.attr_set(set_id):
+                attr_id = attr_ids.get(attr)
+                if attr_id is None:
+                    attr_id = attr_ids[attr] = len(attr_name_codes)
+                    attr_name_codes.append(attr_names.get_code(attr.name))
+                    for i in range(len(attr)):
+                        if not isinstance(attr[i], str):
+                            raise GxfGenieError(f"only str attribute values can be cached, `{attr.name}' has {type(attr[i])}")
+                        value_ids.append(strings.get_code(attr[i]))
+                    attr_value_starts.append(len(value_ids))
+                set_attr_ids.append(attr_id)
+            set_starts.append(len(set_attr_ids))
+
+        string_data = [s.encode() for s in strings.names]
+        string_offsets = np.zeros(len(string_data) + 1, dtype="<i8")
+        np.cumsum([len(s) for s in string_data], out=string_offsets[1:])
+        self.arrays.update({
+            "attr_name_codes": np.array(attr_name_codes, dtype="<u4"),
+            "attr_value_starts": np.array(attr_value_starts, dtype="<i8"),
+            "value_ids": np.array(value_ids, dtype="<u4"),
+            "string_offsets": string_offsets,
+            "string_data": np.frombuffer(b"".join(string_data), dtype="|u1"),
+            "set_starts": np.array(set_starts, dtype="<i8"),
+            "set_attr_ids": np.array(set_attr_ids, dtype="<u4"),
+        })
+        return attr_names.names
+
+    def _build_metadata(self, attr_names):
+        columns = self.columns
+        record_class_name = _record_class_names.get(columns.record_class)
+        if record_class_name is None:
+            raise GxfGenieError(f"can't cache records of class {columns.record_class}")
+        for name, dtype in _column_dtypes.items():
+            self.arrays[name] = getattr(columns, name).astype(dtype, copy=False)
+        return {"version": CACHE_VERSION,
+                "key": self.key,
+                "record_class": record_class_name,
+                "file_name": columns.file_name,
+                "seqnames": columns.seqnames.names,
+                "sources": columns.sources.names,
+                "features": columns.features.names,
+                "attr_names": attr_names,
+                "metas": [(meta.value, meta.line_number) for meta in columns.metas]}
+
+    def write(self, fh):
+        attr_names = self._build_attr_tables()
+        metadata = self._build_metadata(attr_names)
+        # compute array layout from the size of the metadata, which includes the layout
+        metadata["arrays"] = {name: [arr.dtype.str, 0, len(arr)] for name, arr in self.arrays.items()}
+        meta_size = len(json.dumps(metadata).encode()) + 32 * len(self.arrays)
+        offset = _align(_header_struct.size + meta_size)
+        for name, arr in self.arrays.items():
+            metadata["arrays"][name][1] = offset
+            offset = _align(offset + arr.nbytes)
+        meta_bytes = json.dumps(metadata).encode()
+        assert len(meta_bytes) <= meta_size
+        fh.write(_header_struct.pack(_CACHE_MAGIC, CACHE_VERSION, meta_size))
+        fh.write(meta_bytes.ljust(meta_size))
+        for name, arr in self.arrays.items():
+            fh.seek(metadata["arrays"][name][1])
+            fh.write(arr.tobytes())
+        fh.truncate(offset)
+
+def _align(offset):
+    return (offset + _ALIGN - 1) & ~(_ALIGN - 1)
+
+
+def gxf_cache_save(columns, cache_file, key=None):
+    """Save a GxfColumns object to a cache file.  The key is a dict,
+    normally from gxf_cache_key(), that is stored in the cache to check
+    if it is current.  The file is written atomically."""
+    writer = _CacheWriter(columns, key)
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    fd, tmp_file = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(cache_file), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            writer.write(fh)
+        os.replace(tmp_file, cache_file)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
+
+def _read_metadata(cache_file, mm):
+    if len(mm) < _header_struct.size:
+        raise GxfGenieError(f"not a GxfGenie cache file: `{cache_file}'")
+    magic, version, meta_size = _header_struct.unpack_from(mm, 0)
+    if magic != _CACHE_MAGIC:
+        raise GxfGenieError(f"not a GxfGenie cache file: `{cache_file}'")
+    if version != CACHE_VERSION:
+        return None
+    return json.loads(bytes(mm[_header_struct.size:_header_struct.size + meta_size]))
+
+def gxf_cache_read_key(cache_file):
+    """Read the key from a cache file, or None if the cache is from a different
+    version of this library."""
+    with open(cache_file, "rb") as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            metadata = _read_metadata(cache_file, mm)
+    return None if metadata is None else metadata["key"]
+
+def gxf_cache_load(cache_file):
+    """Load a GxfColumns object from a cache file.  The arrays are backed by
+    the memory-mapped file."""
+    with open(cache_file, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    metadata = _read_metadata(cache_file, mm)
+    if metadata is None:
+        raise GxfGenieError(f"GxfGenie cache file is from a different version: `{cache_file}'")
+    arrays = {name: np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+              for name, (dtype, offset, count) in metadata["arrays"].items()}
+    offset = metadata["arrays"]["string_data"][1]
+    strings = _StringTable(memoryview(mm)[offset:offset + len(arrays["string_data"])],
+                           arrays["string_offsets"])
+    attr_store = GxfCachedAttrStore(metadata["attr_names"], arrays["attr_name_codes"],
+                                    arrays["attr_value_starts"], arrays["value_ids"], strings,
+                                    arrays["set_starts"], arrays["set_attr_ids"])
+    return GxfColumns(_record_classes[metadata["record_class"]],
+                      file_name=metadata["file_name"],
+                      seqnames=GxfCategories(metadata["seqnames"]),
+                      sources=GxfCategories(metadata["sources"]),
+                      features=GxfCategories(metadata["features"]),
+                      attr_store=attr_store,
+                      metas=[GxfMeta(value, line_number=line_number) for value, line_number in metadata["metas"]],
+                      **{name: arrays[name] for name in _column_dtypes.keys()})
+
+def _is_cache_current(cache_file, key):
+    try:
+        return gxf_cache_read_key(cache_file) == key
+    except (OSError, ValueError, GxfGenieError):
+        return False
+
+def gxf_columns_load_cached(gxf_file, *, cache_file=None, cache_dir=None, parser_opts=None, **parse_args):
+    """Load a GxF file into a GxfColumns object using a cache.  If the cache
+    does not exist or does not match the file and options, the file is parsed
+    and the cache is written.
+
+    Args:
+        gxf_file (str): Path to the GXF file (.gtf or .gff3).
+        cache_file (str): cache file to use, defaults to gxf_cache_path(gxf_file, cache_dir).
+        cache_dir (str): directory for the cache file.
+        parser_opts (dict): keyword arguments passed to the parser constructor.
+        parse_args: Other keyword arguments are passed to parser.parse() to select records.
+    """
+    gxf_parser_class(gxf_file)  # check file type
+    if cache_file is None:
+        cache_file = gxf_cache_path(gxf_file, cache_dir)
+    parser_opts = dict(parser_opts) if parser_opts is not None else {}
+    parser_opts.pop("lazy_attrs", None)  # attributes are always parsed for the cache
+    key = gxf_cache_key(gxf_file, parser_opts, parse_args)
+    if not _is_cache_current(cache_file, key):
+        columns = gxf_columns_load(gxf_parser_factory(gxf_file, **parser_opts), **parse_args)
+        gxf_cache_save(columns, cache_file, key)
+    return gxf_cache_load(cache_file)
+
+def gxf_dataset_load_cached(gxf_file, *, cache_file=None, cache_dir=None, parser_opts=None, **parse_args):
+    """Load a GtfDataSet or Gff3DataSet using a cache, see gxf_columns_load_cached().
+    Records are created from the cache, without parsing the text."""
+    columns = gxf_columns_load_cached(gxf_file, cache_file=cache_file, cache_dir=cache_dir,
+                                      parser_opts=parser_opts, **parse_args)
+    dataset = gxf_dataset_class(gxf_file)()
+    for meta in columns.metas:
+        dataset.add_meta(meta)
+    for rec in columns.iter_records():
+        dataset.add_record(rec)
+    dataset.finish()
+    return dataset
@@ -0,0 +1,284 @@
+"""
+Columnar (struct-of-arrays) storage of GxF records, using NumPy arrays.
+This uses much less memory than GxfRecord objects and allows vectorized
+selection of records.  Records can be materialized on demand.
+
+This module requires numpy, which is an optional dependency.
+"""
+# Copyright 2025-2025 Mark Diekhans
+from array import array
+import numpy as np
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfRecord
+
+# strand column codes
+STRAND_NONE = 0
+STRAND_PLUS = 1
+STRAND_MINUS = 2
+
+_strand_codes = {None: STRAND_NONE, '+': STRAND_PLUS, '-': STRAND_MINUS}
+_strand_values = (None, '+', '-')
+
+# phase column code for no phase
+PHASE_NONE = -1
+
+
+class GxfCategories:
+    """Table of unique strings for a column, with each row of the column stored
+    as an integer code.
+
+    Attributes:
+        names (list of str): the unique values, indexed by code.
+    """
+    __slots__ = ("names", "_codes")
+
+    def __init__(self, names=()):
+        self.names = list(names)
+        self._codes = {name: code for code, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_code(self, name):
+        "get code for a name, adding it if needed"
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def find_code(self, name):
+        "get code for a name, or None if not in table"
+        return self._codes.get(name)
+
+    def find_codes(self, names):
+        "get array of codes for an iterable of names, ignoring names not in table"
+        codes = [self._codes.get(name) for name in names]
+        return np.array([c for c in codes if c is not None], dtype=np.uint32)
+
+
+class GxfAttrStore:
+    """Interned storage of attributes.  Each unique set of GxfAttr objects is
+    stored once, as a tuple, and rows reference the set by index.  The GxfAttr
+    objects are shared between sets.
+
+    Attributes:
+        attr_sets (list of tuple of GxfAttr): unique attribute sets.
+    """
+    __slots__ = ("attr_sets", "_set_ids")
+
+    def __init__(self, attr_sets=()):
+        self.attr_sets = list(attr_sets)
+        self._set_ids = None
+
+    def __len__(self):
+        return len(self.attr_sets)
+
+    def get_set_id(self, attrs):
+        "get id of a set from a GxfAttrs object, adding it if needed"
+        if self._set_ids is None:
+            self._set_ids = {attr_set: set_id for set_id, attr_set in enumerate(self.attr_sets)}
+        attr_set = tuple(attrs.values())
+        set_id = self._set_ids.get(attr_set)
+        if set_id is None:
+            set_id = self._set_ids[attr_set] = len(self.attr_sets)
+            self.attr_sets.append(attr_set)
+        return set_id
+
+    def attr_set(self, set_id):
+        "tuple of GxfAttr objects in a set"
+        return self.attr_sets[set_id]
+
+    def finish(self):
+        "done adding sets, free index memory"
+        self._set_ids = None
+
+    def make_attrs(self, attrs_class, set_id):
+        "create an GxfAttrs object of attrs_class for set"
+        attrs = attrs_class()
+        for attr in self.attr_sets[set_id]:
+            attrs[attr.name] = attr
+        return attrs
+
+    def set_mask(self, name, values=None):
+        """Boolean array, indexed by set id, of sets having attribute name.  If
+        values is not None, the attribute must have one of these values."""
+        if values is not None:
+            values = frozenset(values)
+        mask = np.zeros(len(self.attr_sets), dtype=bool)
+        for set_id, attr_set in enumerate(self.attr_sets):
+            for attr in attr_set:
+                if attr.name == name:
+                    mask[set_id] = (values is None) or any((attr[i] in values) for i in range(len(attr)))
+                    break
+        return mask
+
+
+class GxfColumns:
+    """
+    Columnar storage of the records of a GxF file.  Use gxf_columns_load()
+    to create from a parser.
+
+    Attributes:
+        record_class: GtfRecord or Gff3Record class used to materialize records.
+        file_name (str): name of the file the records were loaded from
+        seqnames, sources, features (GxfCategories): tables of names
+        seqname_codes, source_codes, feature_codes (np.ndarray of uint32): per-row
+            category codes
+        starts, ends (np.ndarray of int64): one-based, closed coordinates.
+        scores (np.ndarray of float64): score, NaN if not specified.
+        score_is_int (np.ndarray of bool): score was parsed as an integer.
+        strands (np.ndarray of int8): strand as STRAND_NONE, STRAND_PLUS, STRAND_MINUS.
+        phases (np.ndarray of int8): phase, or PHASE_NONE.
+        attr_store (GxfAttrStore): attribute sets.
+        attr_set_ids (np.ndarray of uint32): per-row index into attr_store.
+        line_numbers (np.ndarray of int64): line number of each record.
+        metas (list of GxfMeta): metadata lines.
+    """
+
+    def __init__(self, record_class, *, file_name, seqnames, sources, features,
+                 seqname_codes, source_codes, feature_codes, starts, ends, scores, score_is_int,
+                 strands, phases, attr_store, attr_set_ids, line_numbers, metas=()):
+        self.record_class = record_class
+        self.file_name = file_name
+        self.seqnames = seqnames
+        self.sources = sources
+        self.features = features
+        self.seqname_codes = seqname_codes
+        self.source_codes = source_codes
+        self.feature_codes = feature_codes
+        self.starts = starts
+        self.ends = ends
+        self.scores = scores
+        self.score_is_int = score_is_int
+        self.strands = strands
+        self.phases = phases
+        self.attr_store = attr_store
+        self.attr_set_ids = attr_set_ids
+        self.line_numbers = line_numbers
+        self.metas = list(metas)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _row_score(self, irow):
+        score = self.scores[irow]
+        if np.isnan(score):
+            return None
+        return int(score) if self.score_is_int[irow] else float(score)
+
+    def record(self, irow):
+        "materialize a GtfRecord or Gff3Record for a row"
+        phase = int(self.phases[irow])
+        return self.record_class(self.seqnames.names[self.seqname_codes[irow]],
+                                 self.sources.names[self.source_codes[irow]],
+                                 self.features.names[self.feature_codes[irow]],
+                                 int(self.starts[irow]), int(self.ends[irow]),
+                                 self._row_score(irow),
+                                 _strand_values[self.strands[irow]],
+                                 None if phase == PHASE_NONE else phase,
+                                 self.attr_store.make_attrs(self.record_class.attrs_class, self.attr_set_ids[irow]),
+                                 file_name=self.file_name,
+                                 line_number=int(self.line_numbers[irow]))
+
+    def iter_records(self):
+        "generator of materialized records for all rows"
+        for irow in range(len(self)):
+            yield self.record(irow)
+
+    def select(self, rows):
+        """Create a new GxfColumns with a subset of rows, specified as a boolean
+        mask or array of row indices.  Category tables and attribute sets are shared."""
+        return GxfColumns(self.record_class, file_name=self.file_name,
+                          seqnames=self.seqnames, sources=self.sources, features=self.features,
+                          seqname_codes=self.seqname_codes[rows], source_codes=self.source_codes[rows],
+                          feature_codes=self.feature_codes[rows],
+                          starts=self.starts[rows], ends=self.ends[rows],
+                          scores=self.scores[rows], score_is_int=self.score_is_int[rows],
+                          strands=self.strands[rows], phases=self.phases[rows],
+                          attr_store=self.attr_store, attr_set_ids=self.attr_set_ids[rows],
+                          line_numbers=self.line_numbers[rows], metas=self.metas)
+
+    def seqname_mask(self, seqnames):
+        "boolean array of rows with one of the sequence names"
+        return np.isin(self.seqname_codes, self.seqnames.find_codes(seqnames))
+
+    def source_mask(self, sources):
+        "boolean array of rows with one of the sources"
+        return np.isin(self.source_codes, self.sources.find_codes(sources))
+
+    def feature_mask(self, features):
+        "boolean array of rows with one of the feature types"
+        return np.isin(self.feature_codes, self.features.find_codes(features))
+
+    def strand_mask(self, strand):
+        "boolean array of rows on strand, which is '+', '-', or None"
+        return self.strands == _strand_codes[strand]
+
+    def region_mask(self, seqname, start, end):
+        "boolean array of rows overlapping a one-based, closed range"
+        code = self.seqnames.find_code(seqname)
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return (self.seqname_codes == code) & (self.starts <= end) & (self.ends >= start)
+
+    def attr_mask(self, name, values=None):
+        """boolean array of rows having attribute name, and optionally one of the
+        specified values"""
+        return self.attr_store.set_mask(name, values)[self.attr_set_ids]
+
+
+def _score_value(score):
+    if score is None:
+        return np.nan, False
+    return float(score), isinstance(score, int)
+
+def gxf_columns_load(parser, **parse_args):
+    """Load records from a GtfParser or Gff3Parser into a GxfColumns object.
+    Additional keyword arguments are passed to parser.parse() to select
+    records."""
+    seqnames, sources, features = GxfCategories(), GxfCategories(), GxfCategories()
+    attr_store = GxfAttrStore()
+    seqname_codes, source_codes, feature_codes = array('I'), array('I'), array('I')
+    starts, ends, line_numbers = array('q'), array('q'), array('q')
+    scores, score_is_int = array('d'), array('b')
+    strands, phases = array('b'), array('b')
+    attr_set_ids = array('I')
+    metas = []
+
+    for rec in parser.parse(**parse_args):
+        if not isinstance(rec, GxfRecord):
+            metas.append(rec)
+            continue
+        seqname_codes.append(seqnames.get_code(rec.seqname))
+        source_codes.append(sources.get_code(rec.source))
+        feature_codes.append(features.get_code(rec.feature))
+        starts.append(rec.start)
+        ends.append(rec.end)
+        score, is_int = _score_value(rec.score)
+        scores.append(score)
+        score_is_int.append(is_int)
+        strands.append(_strand_codes[rec.strand])
+        phases.append(PHASE_NONE if rec.phase is None else rec.phase)
+        attr_set_ids.append(attr_store.get_set_id(rec.attrs))
+        line_numbers.append(rec.line_number)
+    attr_store.finish()
+
+    record_class = getattr(parser, "record_class", None)
+    if record_class is None:
+        raise GxfGenieError(f"parser does not define a record_class: {type(parser)}")
+    return GxfColumns(record_class, file_name=parser.gxf_file,
+                      seqnames=seqnames, sources=sources, features=features,
+                      seqname_codes=np.frombuffer(seqname_codes, dtype=np.uint32),
+                      source_codes=np.frombuffer(source_codes, dtype=np.uint32),
+                      feature_codes=np.frombuffer(feature_codes, dtype=np.uint32),
+                      starts=np.frombuffer(starts, dtype=np.int64),
+                      ends=np.frombuffer(ends, dtype=np.int64),
+                      scores=np.frombuffer(scores, dtype=np.float64),
+                      score_is_int=np.frombuffer(score_is_int, dtype=np.int8).astype(bool),
+                      strands=np.frombuffer(strands, dtype=np.int8),
+                      phases=np.frombuffer(phases, dtype=np.int8),
+                      attr_store=attr_store,
+                      attr_set_ids=np.frombuffer(attr_set_ids, dtype=np.uint32),
+                      line_numbers=np.frombuffer(line_numbers, dtype=np.int64),
+                      metas=metas)
@@ -0,0 +1,257 @@
+"""
+Conversion between GTF and GFF3.  Files are converted one gene tree at a
+time, as the trees are completed by GtfTreeStream or Gff3TreeStream, so
+memory is bounded by the largest locus rather than the size of the file.
+"""
+# Copyright 2025-2025 Mark Diekhans
+from gxfgenie import gxf_parser_class, gxf_parser_factory
+from gxfgenie.defs import (ATTR_ID, ATTR_PARENT, ATTR_GENE_ID, ATTR_TRANSCRIPT_ID, FEATURE_GENE,
+                           FEATURE_TRANSCRIPT, FEATURE_EXON, FEATURE_CDS, GENE_FEATURES, TRANSCRIPT_FEATURES)
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfAttr, GxfMeta
+from gxfgenie.gtf_parser import GtfParser, GtfRecord, GtfAttrs
+from gxfgenie.gff3_parser import Gff3Record, Gff3Attrs
+from gxfgenie.gtf_tree_stream import GtfTreeStream
+from gxfgenie.gff3_tree_stream import Gff3TreeStream
+from gxfgenie.gxf_writer import GxfWriter
+
+FEATURE_UTR = "UTR"
+FEATURE_FIVE_PRIME_UTR = "five_prime_UTR"
+FEATURE_THREE_PRIME_UTR = "three_prime_UTR"
+
+# GFF3 feature types that are converted to other GTF feature types by
+# default.  GTF identifies genes and transcripts by feature type.
+GFF3_TO_GTF_FEATURES = {**dict.fromkeys(GENE_FEATURES, FEATURE_GENE),
+                        **dict.fromkeys(TRANSCRIPT_FEATURES, FEATURE_TRANSCRIPT),
+                        FEATURE_FIVE_PRIME_UTR: FEATURE_UTR,
+                        FEATURE_THREE_PRIME_UTR: FEATURE_UTR}
+
+# Size of the writer's formatted attribute cache.  The created ID and Parent
+# attributes are not shared with other records, so a smaller cache bounds
+# the memory they use.
+CONVERT_ATTR_CACHE_SIZE = 128 * 1024
+
+# version directive, which is not copied, as it is written for GFF3 output
+_GFF3_VERSION_DIRECTIVE = "gff-version"
+
+# GFF3 directives that are not copied to GTF
+_GFF3_ONLY_DIRECTIVES = ("sequence-region",)
+
+# GFF3 attributes that are replaced when converting to GTF
+_GTF_ID_ATTRS = frozenset((ATTR_ID, ATTR_PARENT, ATTR_GENE_ID, ATTR_TRANSCRIPT_ID))
+
+
+def _rename_attr(attr, attr_renames):
+    new_name = attr_renames.get(attr.name)
+    return attr if new_name is None else GxfAttr(new_name, attr.value)
+
+
+class GtfToGff3Converter:
+    """Convert GTF gene trees, as returned by GtfTreeStream with synthesize,
+    to GFF3 records.  ID and Parent attributes are created following the
+    GENCODE conventions: genes and transcripts use the gene_id and
+    transcript_id, exons use `exon:<transcript_id>:<exon_number>', and
+    other features use `<feature>:<transcript_id>', with the parts of CDS
+    and other discontinuous features sharing an ID.  Features are named
+    after renaming.  The GTF attributes are
+    kept.
+
+    Args:
+        attr_renames (dict): attribute names to rename.
+        feature_renames (dict): feature types to rename.
+        split_utrs (bool): convert UTR features to five_prime_UTR and
+            three_prime_UTR, based on the position relative to the CDS.
+    """
+
+    def __init__(self, *, attr_renames=None, feature_renames=None, split_utrs=True):
+        self.attr_renames = attr_renames if attr_renames is not None else {}
+        self.feature_renames = feature_renames if feature_renames is not None else {}
+        self.split_utrs = split_utrs
+
+    def convert_tree(self, root):
+        "generator of Gff3Records converted from a tree of GtfRecords"
+        yield from self._convert(root, None, self.feature_renames.get(root.feature, root.feature), 0)
+
+    def _convert(self, rec, parent_attr, feature, exon_cnt):
+        id_value = self._make_id(rec, feature, exon_cnt)
+        id_attr = GxfAttr(ATTR_ID, id_value) if id_value is not None else None
+        yield self.convert_record(rec, id_attr, parent_attr, feature)
+        if len(rec.children) > 0:
+            child_parent = GxfAttr(ATTR_PARENT, id_value) if id_value is not None else parent_attr
+            cds_range = self._cds_range(rec) if self.split_utrs else None
+            exon_cnt = 0
+            for child in rec.children:
+                if child.feature == FEATURE_EXON:
+                    exon_cnt += 1
+                if (child.feature == FEATURE_UTR) and (cds_range is not None):
+                    child_feature = self._utr_feature(child, cds_range)
+                else:
+                    child_feature = self.feature_renames.get(child.feature, child.feature)
+                yield from self._convert(child, child_parent, child_feature, exon_cnt)
+
+    @staticmethod
+    def _make_id(rec, feature, exon_cnt):
+        "ID for a record with the converted feature, or None if it can't be determined"
+        attrs = rec.attrs
+        if rec.feature == FEATURE_GENE:
+            return attrs.find_attr_value(ATTR_GENE_ID)
+        transcript_id = attrs.find_attr_value(ATTR_TRANSCRIPT_ID)
+        if rec.feature == FEATURE_TRANSCRIPT:
+            return transcript_id
+        if transcript_id is None:
+            return None
+        if rec.feature == FEATURE_EXON:
+            return f"{feature}:{transcript_id}:{attrs.find_attr_value('exon_number', exon_cnt)}"
+        return f"{feature}:{transcript_id}"
+
+    @staticmethod
+    def _cds_range(rec):
+        cds_recs = [child for child in rec.children if child.feature == FEATURE_CDS]
+        if len(cds_recs) == 0:
+            return None
+        return (min(r.start for r in cds_recs), max(r.end for r in cds_recs))
+
+    @staticmethod
+    def _utr_feature(rec, cds_range):
+        before_cds = rec.end < cds_range[0]
+        if rec.strand == '-':
+            before_cds = rec.start > cds_range[1]
+        return FEATURE_FIVE_PRIME_UTR if before_cds else FEATURE_THREE_PRIME_UTR
+
+    def convert_record(self, rec, id_attr, parent_attr, feature):
+        "convert one GtfRecord to feature, adding ID and Parent attributes if not None"
+        attrs = Gff3Attrs()
+        if id_attr is not None:
+            attrs[ATTR_ID] = id_attr
+        if parent_attr is not None:
+            attrs[ATTR_PARENT] = parent_attr
+        if len(self.attr_renames) == 0:
+            attrs.update(rec.attrs)
+        else:
+            for attr in rec.attrs.values():
+                attr = _rename_attr(attr, self.attr_renames)
+                attrs[attr.name] = attr
+        return Gff3Record(rec.seqname, rec.source, feature, rec.start, rec.end, rec.score, rec.strand, rec.phase,
+                          attrs, file_name=rec.file_name, line_number=rec.line_number)
+
+
+class Gff3ToGtfConverter:
+    """Convert GFF3 feature trees, as returned by Gff3TreeStream, to GTF
+    records.  The gene_id of all records of a tree is the gene_id attribute
+    or ID of the root.  The transcript_id is the transcript_id attribute or
+    ID of a root that is a transcript, or a child of the root that is a
+    transcript or has children.  These are the first attributes, followed by
+    the other attributes, except ID and Parent.  A record with multiple
+    parents is written for each of the parents.
+
+    Args:
+        attr_renames (dict): attribute names to rename.
+        feature_renames (dict): feature types to rename, default is
+            GFF3_TO_GTF_FEATURES.
+    """
+
+    def __init__(self, *, attr_renames=None, feature_renames=None):
+        self.attr_renames = attr_renames if attr_renames is not None else {}
+        self.feature_renames = feature_renames if feature_renames is not None else GFF3_TO_GTF_FEATURES
+
+    def convert_tree(self, root):
+        "generator of GtfRecords converted from a tree of Gff3Records"
+        gene_attr = self._id_attr(root, ATTR_GENE_ID)
+        transcript_attr = None
+        if self.feature_renames.get(root.feature, root.feature) == FEATURE_TRANSCRIPT:
+            transcript_attr = self._id_attr(root, ATTR_TRANSCRIPT_ID)
+        yield self.convert_record(root, gene_attr, transcript_attr)
+        for child in root.children:
+            child_transcript_attr = transcript_attr
+            if (child_transcript_attr is None) and ((len(child.children) > 0) or (self.feature_renames.get(child.feature, child.feature) == FEATURE_TRANSCRIPT)):
+                child_transcript_attr = self._id_attr(child, ATTR_TRANSCRIPT_ID)
+            yield from self._convert(child, gene_attr, child_transcript_attr)
+
+    def _convert(self, rec, gene_attr, transcript_attr):
+        yield self.convert_record(rec, gene_attr, transcript_attr)
+        for child in rec.children:
+            yield from self._convert(child, gene_attr, transcript_attr)
+
+    @staticmethod
+    def _id_attr(rec, name):
+        "get the attribute name, or create it from the ID"
+        attr = rec.attrs.find_attr(name)
+        if attr is None:
+            rec_id = rec.attrs.find_attr_value(ATTR_ID)
+            if rec_id is not None:
+                attr = GxfAttr(name, rec_id)
+        return attr
+
+    def convert_record(self, rec, gene_attr, transcript_attr):
+        "convert one Gff3Record, with gene_id and transcript_id attributes if not None"
+        attrs = GtfAttrs()
+        if gene_attr is not None:
+            attrs[ATTR_GENE_ID] = gene_attr
+        if transcript_attr is not None:
+            attrs[ATTR_TRANSCRIPT_ID] = transcript_attr
+        for name, attr in rec.attrs.items():
+            if name not in _GTF_ID_ATTRS:
+                if len(self.attr_renames) > 0:
+                    attr = _rename_attr(attr, self.attr_renames)
+                attrs[attr.name] = attr
+        return GtfRecord(rec.seqname, rec.source, self.feature_renames.get(rec.feature, rec.feature),
+                         rec.start, rec.end, rec.score, rec.strand, rec.phase,
+                         attrs, file_name=rec.file_name, line_number=rec.line_number)
+
+
+def _copy_metas(writer, metas, start, to_gtf):
+    "write metadata from start, returning the number written"
+    for meta in metas[start:]:
+        if not (meta.value.startswith(_GFF3_VERSION_DIRECTIVE)
+                or (to_gtf and meta.value.startswith(_GFF3_ONLY_DIRECTIVES))):
+            writer.write(meta)
+    return len(metas)
+
+
+def gxf_convert(in_gxf, out_gxf, *, workers=None, sorted_input=True, spill_records=None, tmp_dir=None,
+                attr_renames=None, feature_renames=None, parser_opts=None, **parse_args):
+    """
+    Convert a GTF file to GFF3 or a GFF3 file to GTF, based on the file
+    extensions.  See GtfToGff3Converter and Gff3ToGtfConverter.  The input
+    is streamed a gene at a time, with missing GTF gene and transcript
+    records synthesized.
+
+    Args:
+        in_gxf (str): GTF or GFF3 file to convert, which may be compressed.
+        out_gxf (str): output file in the other format, which may be compressed.
+        workers (int): number of worker processes used to parse, see gxf_parser_factory().
+        sorted_input, spill_records, tmp_dir: see GtfTreeStream, spill_records
+            is only supported for GTF input.
+        attr_renames (dict): attribute names to rename.
+        feature_renames (dict): feature types to rename.
+        parser_opts (dict): keyword arguments passed to the parser constructor.
+        parse_args: Other keyword arguments are passed to parse() to select records.
+
+    Returns:
+        the number of records written
+    """
+    to_gff3 = issubclass(gxf_parser_class(in_gxf), GtfParser)
+    if issubclass(gxf_parser_class(out_gxf), GtfParser) == to_gff3:
+        raise GxfGenieError(f"convert output file must be a different format than the input, `{in_gxf}' and `{out_gxf}'")
+    if to_gff3:
+        stream = GtfTreeStream(sorted_input=sorted_input, synthesize=True, spill_records=spill_records, tmp_dir=tmp_dir)
+        converter = GtfToGff3Converter(attr_renames=attr_renames, feature_renames=feature_renames)
+    else:
+        if spill_records is not None:
+            raise GxfGenieError("spill_records is only supported when converting GTF to GFF3")
+        stream = Gff3TreeStream(sorted_input=sorted_input)
+        converter = Gff3ToGtfConverter(attr_renames=attr_renames, feature_renames=feature_renames)
+    parser = gxf_parser_factory(in_gxf, workers=workers, **(parser_opts if parser_opts is not None else {}))
+    num_records = 0
+    num_metas = 0
+    with GxfWriter(out_gxf, attr_cache_size=CONVERT_ATTR_CACHE_SIZE) as writer:
+        if to_gff3:
+            writer.write(GxfMeta(f"{_GFF3_VERSION_DIRECTIVE} 3"))
+        for root in stream.iter_trees(parser, **parse_args):
+            if len(stream.metas) > num_metas:
+                num_metas = _copy_metas(writer, stream.metas, num_metas, not to_gff3)
+            recs = list(converter.convert_tree(root))
+            writer.write_all(recs)
+            num_records += len(recs)
+        _copy_metas(writer, stream.metas, num_metas, not to_gff3)
+    return num_records
@@ -1,7 +1,10 @@
 """
 Base class to store contents of a GxF file as collection of feature trees.
 """
+from abc import ABC, abstractmethod
 from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.range_index import RangeIndex
 
 class GxfRecListDict(dict):
     """Dict for a list of values"""
@@ -14,7 +17,7 @@ class GxfRecListDict(dict):
         self[idx].append(rec)
 
 
-class GxfDataSet:
+class GxfDataSet(ABC):
     """Container for contents of a GTF or GFF3 file.
 
     This implements lookup of genes by gene_id and transcripts by
@@ -22,28 +25,113 @@ class GxfDataSet:
     records are not required to be unique, lists are always returned.  This is
     the case for the PAR with RefSeq and older GENCODE versions.
 
+    Records are linked into feature trees, using the GxfRecord parent and
+    children fields, as they are added with add_record().  Children added
+    before their parent are kept in a pending table until the parent is
+    added, so only a single pass is needed.  Derived classes implement
+    _link_record() to link records based on the file format. The finish()
+    method must be called after all records are added.
     """
 
     def __init__(self):
         self._records = []
+        self._metas = []
         self._roots = []
         self._transcripts_by_id = GxfRecListDict()
         self._genes_by_id = GxfRecListDict()
+        # record to link children to, by a key defined by the derived class
+        self._link_targets = {}
+        # children added before their parent, by the parent's key
+        self._pending = GxfRecListDict()
         # Built in a lazy manner
         self._transcripts_by_range = None
         self._genes_by_range = None
 
-    def _build_genes_range_index(self):
-        assert False
+    @classmethod
+    def load(cls, parser, **parse_args):
+        """Create a data set from the records returned by a parser.  Additional
+        keyword arguments are passed to parser.parse()."""
+        dataset = cls()
+        for rec in parser.parse(**parse_args):
+            if isinstance(rec, GxfRecord):
+                dataset.add_record(rec)
+            else:
+                dataset.add_meta(rec)
+        dataset.finish()
+        return dataset
+
+    def add_meta(self, meta):
+        self._metas.append(meta)
 
     def add_record(self, rec):
         self._records.append(rec)
+        self._link_record(rec)
+
+    @abstractmethod
+    def _link_record(self, rec):
+        "link a record into the trees and ids indexes"
+        pass
+
+    def _child_linked(self, parent, child):
+        "called when a child is linked to a parent, used to classify the child"
+        pass
+
+    def _link_child(self, parent, child):
+        if child.parent is None:
+            child.parent = parent
+        parent.children.append(child)
+        self._child_linked(parent, child)
+
+    def _set_link_target(self, key, rec):
+        "make rec the record that children with key will be linked to"
+        self._link_targets[key] = rec
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            for child in pending:
+                self._link_child(rec, child)
+
+    def _link_to_parent(self, key, rec):
+        "link rec to a parent, or save it until the parent is added"
+        parent = self._link_targets.get(key)
+        if parent is None:
+            self._pending.append(key, rec)
+        else:
+            self._link_child(parent, rec)
+
+    def _add_root(self, rec):
+        self._roots.append(rec)
+
+    def _unresolved_parents(self, pending):
+        """Called by finish() with a dict of parent keys to lists of children
+        whose parents were never added."""
+        for children in pending.values():
+            for child in children:
+                if child.parent is None:
+                    self._add_root(child)
+
+    def finish(self):
+        "finish building the data set after all records have been added"
+        pending = self._pending
+        self._pending = GxfRecListDict()
+        self._link_targets = {}
+        self._unresolved_parents(pending)
+
+    @property
+    def records(self):
+        "list of all records in the order added"
+        return self._records
+
+    @property
+    def metas(self):
+        "list of metadata (GxfMeta) from the file"
+        return self._metas
 
     def iter_transcripts(self):
         """
         Get an generator over all transcript records.
         """
-        return self._transcripts_by_id.values()
+        for transes in self._transcripts_by_id.values():
+            yield from transes
 
     def get_transcripts_by_id(self, transcript_id, default=None):
         """
@@ -55,7 +143,7 @@ class GxfDataSet:
         """
         Get a list transcripts records for a transcript_id or raise an exception if it doesn't exist.
         """
-        transes = self.transcripts_by_id.get(transcript_id)
+        transes = self._transcripts_by_id.get(transcript_id)
         if transes is None:
             raise GxfGenieError(f"transcript_id not found: `{transcript_id}'")
         return transes
@@ -64,18 +152,16 @@ class GxfDataSet:
         """
         Get a list of transcript records overlapping a range, optionally filtering by strand
         """
-        if self._transcript_loci_by_range is None:
-            self._build_transcript_loci_by_range()
-        return self._transcript_loci_by_range.overlapping(chrom, start, end, strand)
-
-    def _build_transcripts_range_index(self):
-        assert False
+        if self._transcripts_by_range is None:
+            self._transcripts_by_range = RangeIndex(self.iter_transcripts())
+        return list(self._transcripts_by_range.iter_overlapping(chrom, start, end, strand=strand))
 
     def iter_genes(self):
         """
         Get an generator over all gene records.
         """
-        return self.genes_by_id.values()
+        for genes in self._genes_by_id.values():
+            yield from genes
 
     def get_genes_by_id(self, gene_id, default=None):
         """
@@ -87,22 +173,22 @@ class GxfDataSet:
         """
         Get a list genes records for a gene_id or raise an exception if it doesn't exist.
         """
-        transes = self._genes_by_id.get(gene_id)
-        if transes is None:
+        genes = self._genes_by_id.get(gene_id)
+        if genes is None:
             raise GxfGenieError(f"gene_id not found: `{gene_id}'")
-        return transes
+        return genes
 
     def get_overlapping_genes(self, chrom, start, end, strand=None):
         """
         Get gene records overlapping a range, optionally filtering by strand
         """
-        if self._gene_loci_by_range is None:
-            self._build_gene_loci_by_range()
-        return self._gene_loci_by_range.overlapping(chrom, start, end, strand)
+        if self._genes_by_range is None:
+            self._genes_by_range = RangeIndex(self.iter_genes())
+        return list(self._genes_by_range.iter_overlapping(chrom, start, end, strand=strand))
 
     def iter_roots(self):
         """Get generator over all of the roots of the annotation tree.  This differs
         from getting genes, as it includes non-gene related annotations.
         """
-        for root in self.roots:
+        for root in self._roots:
             yield root
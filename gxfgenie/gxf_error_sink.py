@@ -0,0 +1,64 @@
+"""
+Collection of errors from parsing that continues past bad lines.
+"""
+# Copyright 2025-2025 Mark Diekhans
+from gxfgenie import fileops
+from gxfgenie.errors import GxfGenieParseError
+
+
+class GxfErrorSink:
+    """
+    Receives records that fail to parse when passed to a parser with the
+    error_sink option.  The parser skips the bad line and continues.  Each
+    error is a GxfGenieParseError, with the file name, line number, and the
+    exception that caused the error as __cause__.
+
+    Errors can be kept in a list, passed to a callback, and written to a
+    reject file.  The reject file contains each bad line, preceded by a
+    comment line with the location and cause of the error.  A GxfErrorSink
+    object can be used with multiple parsers.
+
+    Args:
+        keep (bool): keep the errors in the errors list.
+        callback: function called with (error, line) for each error.
+        reject_file (str): file to write bad lines, which may be compressed.
+        max_errors (int): raise a GxfGenieParseError, chained to the last
+            error, if more than this number of errors occur.  None for no limit.
+
+    Attributes:
+        errors (list): list of GxfGenieParseError if keep is True.
+        count (int): number of errors.
+    """
+
+    def __init__(self, *, keep=True, callback=None, reject_file=None, max_errors=None):
+        self.errors = [] if keep else None
+        self.callback = callback
+        self.max_errors = max_errors
+        self.count = 0
+        self.reject_file = reject_file
+        self.reject_fh = fileops.opengz(reject_file, "w") if reject_file is not None else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        "close the reject file"
+        if self.reject_fh is not None:
+            self.reject_fh.close()
+            self.reject_fh = None
+
+    def add(self, error, line):
+        "add an error for a bad line"
+        self.count += 1
+        if self.errors is not None:
+            self.errors.append(error)
+        if self.reject_fh is not None:
+            self.reject_fh.write(f"# {error.gxf_file}:{error.line_number}: {error.__cause__}\n{line}\n")
+        if self.callback is not None:
+            self.callback(error, line)
+        if (self.max_errors is not None) and (self.count > self.max_errors):
+            raise GxfGenieParseError(error.gxf_file, error.line_number,
+                                     f"maximum number of errors exceeded ({self.max_errors})") from error
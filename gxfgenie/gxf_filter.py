@@ -0,0 +1,109 @@
+"""
+Filtering of GxF lines based on cheap column tests, which is done before a
+line is fully parsed.
+"""
+# Copyright 2025-2025 Mark Diekhans
+from gxfgenie.errors import GxfGenieError
+
+def _encode_names(names):
+    return frozenset(name.encode() for name in names) if names is not None else None
+
+class GxfFilter:
+    """
+    Selection criteria for GxF records.  Lines are tested with a partial
+    split of the columns, before any validation or attribute parsing is done.
+    Lines that are too short to test are accepted, so that the parser
+    reports the error.  Lines can be tested as str with accept_line() or as
+    undecoded UTF-8 bytes with accept_bytes_line().  Names are compared to the columns as they appear in
+    the file, without GFF3 %-decoding.
+
+    Attributes:
+        features (set of str): feature types to keep, or None for all.
+        seqnames (set of str): sequence names to keep, or None for all.
+        region ((seqname, start, end)): keep only records overlapping this
+            one-based, closed range, or None for all.
+        attr_names (set of str): names of attributes to keep when parsing
+            attributes, or None for all.
+    """
+    __slots__ = ("features", "seqnames", "region", "attr_names", "accept_line", "accept_bytes_line",
+                 "_bfeatures", "_bseqnames", "_bregion_seqname")
+
+    def __init__(self, *, features=None, seqnames=None, region=None, attr_names=None):
+        self.features = frozenset(features) if features is not None else None
+        self.seqnames = frozenset(seqnames) if seqnames is not None else None
+        if region is not None:
+            region = (region[0], int(region[1]), int(region[2]))
+            if region[1] > region[2]:
+                raise GxfGenieError(f"invalid region, start greater than end: {region}")
+        self.region = region
+        self.attr_names = frozenset(attr_names) if attr_names is not None else None
+        # encoded names for testing undecoded lines
+        self._bfeatures = _encode_names(self.features)
+        self._bseqnames = _encode_names(self.seqnames)
+        self._bregion_seqname = self.region[0].encode() if self.region is not None else None
+        # pick test based on columns needed
+        if self.region is not None:
+            self.accept_line = self._accept_region_line
+            self.accept_bytes_line = self._accept_region_bytes_line
+        elif (self.features is not None) or (self.seqnames is not None):
+            self.accept_line = self._accept_name_line
+            self.accept_bytes_line = self._accept_name_bytes_line
+        else:
+            self.accept_line = self.accept_bytes_line = self._accept_all_line
+
+    @property
+    def filters_lines(self):
+        "does this filter reject any lines?"
+        return (self.features is not None) or (self.seqnames is not None) or (self.region is not None)
+
+    def _accept_names(self, row):
+        return (((self.seqnames is None) or (row[0] in self.seqnames))
+                and ((self.features is None) or (row[2] in self.features)))
+
+    @staticmethod
+    def _accept_all_line(line):
+        return True
+
+    def _accept_name_line(self, line):
+        row = line.split("\t", 3)
+        return (len(row) < 4) or self._accept_names(row)
+
+    def _accept_region_line(self, line):
+        row = line.split("\t", 5)
+        if len(row) < 6:
+            return True
+        if (row[0] != self.region[0]) or not self._accept_names(row):
+            return False
+        try:
+            start, end = int(row[3]), int(row[4])
+        except ValueError:
+            return True  # parser will report
+        return (start <= self.region[2]) and (end >= self.region[1])
+
+    def _accept_bytes_names(self, row):
+        return (((self._bseqnames is None) or (row[0] in self._bseqnames))
+                and ((self._bfeatures is None) or (row[2] in self._bfeatures)))
+
+    def _accept_name_bytes_line(self, line):
+        row = line.split(b"\t", 3)
+        return (len(row) < 4) or self._accept_bytes_names(row)
+
+    def _accept_region_bytes_line(self, line):
+        row = line.split(b"\t", 5)
+        if len(row) < 6:
+            return True
+        if (row[0] != self._bregion_seqname) or not self._accept_bytes_names(row):
+            return False
+        try:
+            start, end = int(row[3]), int(row[4])
+        except ValueError:
+            return True  # parser will report
+        return (start <= self.region[2]) and (end >= self.region[1])
+
+    def accept_record(self, rec):
+        "check if a parsed record passes the filter"
+        return (((self.seqnames is None) or (rec.seqname in self.seqnames))
+                and ((self.features is None) or (rec.feature in self.features))
+                and ((self.region is None) or ((rec.seqname == self.region[0])
+                                               and (rec.start <= self.region[2])
+                                               and (rec.end >= self.region[1]))))
@@ -0,0 +1,319 @@
+"""
+Indexed random access to GxF files that are sorted by sequence name and
+start position.  Works with BGZF-compressed (bgzip) files using virtual
+offsets, or with uncompressed files using byte offsets.
+
+The index is a linear index, as in tabix.  For each sequence, the sequence
+is divided into windows and the offset of the first line of a record
+overlapping each window is stored, along with its line number.  The index
+is stored in its own binary format in a file with a `.gxi' extension.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import io
+import os
+import sys
+import struct
+from array import array
+from gxfgenie import gxf_parser_class, fileops
+from gxfgenie.errors import GxfGenieError, GxfGenieParseError
+from gxfgenie.gxf_record import GxfRecord, GxfMeta
+from gxfgenie.bgzf import BgzfReader, is_bgzf
+
+# size of windows is 2^WINDOW_SHIFT
+WINDOW_SHIFT = 14
+
+INDEX_EXT = ".gxi"
+
+_INDEX_MAGIC = b"GXI\x01"
+_header_struct = struct.Struct("<4sQQI")
+_seq_struct = struct.Struct("<HI")
+
+# value for windows not yet set
+_UNSET = 0xffffffffffffffff
+
+
+def gxf_index_path(gxf_file):
+    "path to the index file for a GxF file"
+    return str(gxf_file) + INDEX_EXT
+
+
+class _PlainReader:
+    """Reader of an uncompressed file, using byte offsets, with the same
+    interface as BgzfReader"""
+
+    def __init__(self, path):
+        self.fh = open(path, "rb")
+        self._offset = 0
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+    def seek(self, offset):
+        self.fh.seek(offset)
+        self._offset = offset
+
+    def iter_lines(self):
+        for line in self.fh:
+            offset = self._offset
+            self._offset += len(line)
+            yield offset, line
+
+
+def _open_reader(gxf_file):
+    if fileops.is_compressed(gxf_file):
+        if not (str(gxf_file).endswith(".gz") and is_bgzf(gxf_file)):
+            raise GxfGenieError(f"compressed GxF files must be BGZF (bgzip) compressed to be indexed: `{gxf_file}'")
+        return BgzfReader(gxf_file)
+    else:
+        return _PlainReader(gxf_file)
+
+def _is_record_line(line):
+    return (len(line) > 0) and (line[0] != ord('#')) and (len(line.strip()) > 0)
+
+def _file_stamp(gxf_file):
+    stat = os.stat(gxf_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class GxfIndex:
+    """
+    Linear index of a sorted GxF file.
+
+    Attributes:
+        source_size (int): size of the indexed file.
+        source_mtime_ns (int): modification time of the indexed file.
+    """
+
+    def __init__(self, source_size, source_mtime_ns):
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+        # seqname -> (offsets, line_numbers) arrays, indexed by window
+        self._windows = {}
+
+    @property
+    def seqnames(self):
+        "sequence names, in file order"
+        return list(self._windows.keys())
+
+    def is_current(self, gxf_file):
+        "does the index match the current version of the file?"
+        return _file_stamp(gxf_file) == (self.source_size, self.source_mtime_ns)
+
+    def lookup(self, seqname, start):
+        """Get (offset, line_number) to start reading from to find records
+        overlapping a range starting a the one-based start, or None if there
+        are no such records."""
+        windows = self._windows.get(seqname)
+        if windows is None:
+            return None
+        iwin = (start - 1) >> WINDOW_SHIFT
+        if iwin >= len(windows[0]):
+            return None
+        return windows[0][iwin], windows[1][iwin]
+
+    def _add_seq(self, seqname, offsets, line_numbers):
+        # windows with no overlapping records use the next window
+        for iwin in range(len(offsets) - 2, -1, -1):
+            if offsets[iwin] == _UNSET:
+                offsets[iwin] = offsets[iwin + 1]
+                line_numbers[iwin] = line_numbers[iwin + 1]
+        self._windows[seqname] = (offsets, line_numbers)
+
+    @classmethod
+    def build(cls, gxf_file):
+        "build an index for a file, which must be sorted"
+        index = cls(*_file_stamp(gxf_file))
+        reader = _open_reader(gxf_file)
+        try:
+            _IndexBuilder(index, gxf_file).scan(reader)
+        finally:
+            reader.close()
+        return index
+
+    def save(self, index_file):
+        "write index to a file"
+        with open(index_file, "wb") as fh:
+            fh.write(_header_struct.pack(_INDEX_MAGIC, self.source_size, self.source_mtime_ns, len(self._windows)))
+            for seqname, (offsets, line_numbers) in self._windows.items():
+                name = seqname.encode()
+                fh.write(_seq_struct.pack(len(name), len(offsets)))
+                fh.write(name)
+                for values in (offsets, line_numbers):
+                    if sys.byteorder == "big":
+                        values = array('Q', values)
+                        values.byteswap()
+                    values.tofile(fh)
+
+    @classmethod
+    def load(cls, index_file):
+        "read index from a file"
+        with open(index_file, "rb") as fh:
+            magic, source_size, source_mtime_ns, num_seqs = _header_struct.unpack(fh.read(_header_struct.size))
+            if magic != _INDEX_MAGIC:
+                raise GxfGenieError(f"not a GxfGenie index file: `{index_file}'")
+            index = cls(source_size, source_mtime_ns)
+            for _ in range(num_seqs):
+                name_len, num_windows = _seq_struct.unpack(fh.read(_seq_struct.size))
+                seqname = fh.read(name_len).decode()
+                windows = []
+                for _ in range(2):
+                    values = array('Q')
+                    values.fromfile(fh, num_windows)
+                    if sys.byteorder == "big":
+                        values.byteswap()
+                    windows.append(values)
+                index._windows[seqname] = tuple(windows)
+        return index
+
+
+class _IndexBuilder:
+    "scan a file to build the index"
+
+    def __init__(self, index, gxf_file):
+        self.index = index
+        self.gxf_file = gxf_file
+        self.seqname = None
+        self.prev_start = 0
+        self.offsets = self.line_numbers = None
+        self.max_window = -1
+
+    def _finish_seq(self):
+        if self.seqname is not None:
+            self.index._add_seq(self.seqname, self.offsets, self.line_numbers)
+
+    def _start_seq(self, seqname, line_number):
+        if seqname in self.index._windows:
+            raise GxfGenieParseError(self.gxf_file, line_number, f"file is not sorted, sequence `{seqname}' is not contiguous")
+        self.seqname = seqname
+        self.prev_start = 0
+        self.offsets, self.line_numbers = array('Q'), array('Q')
+        self.max_window = -1
+
+    def _add_record(self, offset, line_number, start, end):
+        # windows up to max_window are already set or can't be overlapped by later records
+        first_win = max(((start - 1) >> WINDOW_SHIFT), self.max_window + 1)
+        last_win = (end - 1) >> WINDOW_SHIFT
+        if last_win >= first_win:
+            while len(self.offsets) < first_win:
+                self.offsets.append(_UNSET)
+                self.line_numbers.append(0)
+            num = last_win - first_win + 1
+            self.offsets.extend(num * [offset])
+            self.line_numbers.extend(num * [line_number])
+            self.max_window = last_win
+
+    def _parse_line(self, line, line_number):
+        row = line.split(b"\t", 5)
+        try:
+            return row[0].decode(), int(row[3]), int(row[4])
+        except (IndexError, ValueError) as ex:
+            raise GxfGenieParseError(self.gxf_file, line_number, f"can't index GxF record: `{line.decode().rstrip()}'") from ex
+
+    def scan(self, reader):
+        line_number = 0
+        for offset, line in reader.iter_lines():
+            line_number += 1
+            if _is_record_line(line):
+                seqname, start, end = self._parse_line(line, line_number)
+                if seqname != self.seqname:
+                    self._finish_seq()
+                    self._start_seq(seqname, line_number)
+                elif start < self.prev_start:
+                    raise GxfGenieParseError(self.gxf_file, line_number, "file is not sorted by start position")
+                self.prev_start = start
+                self._add_record(offset, line_number, start, end)
+        self._finish_seq()
+
+
+def gxf_index_build(gxf_file, index_file=None):
+    """Build and save the index for a sorted GxF file.  Returns the GxfIndex."""
+    index = GxfIndex.build(gxf_file)
+    index.save(index_file if index_file is not None else gxf_index_path(gxf_file))
+    return index
+
+
+class GxfIndexedReader:
+    """
+    Random access to records of an indexed GxF file.
+
+    Args:
+        gxf_file (str): sorted GxF file, either uncompressed or BGZF compressed.
+        index_file (str): index file, defaults to gxf_file with `.gxi' appended.
+        build (bool): build the index if it doesn't exist or is out of date.
+        parser_opts (dict): keyword arguments passed to the parser constructor.
+    """
+
+    def __init__(self, gxf_file, index_file=None, *, build=False, parser_opts=None):
+        self.gxf_file = gxf_file
+        self.parser_class = gxf_parser_class(gxf_file)
+        self.parser_opts = parser_opts if parser_opts is not None else {}
+        if index_file is None:
+            index_file = gxf_index_path(gxf_file)
+        self.index = self._load_index(index_file, build)
+        self.reader = _open_reader(gxf_file)
+
+    def _load_index(self, index_file, build):
+        index = GxfIndex.load(index_file) if os.path.exists(index_file) else None
+        if (index is None) or not index.is_current(self.gxf_file):
+            if not build:
+                raise GxfGenieError(f"index `{index_file}' does not exist or is older than `{self.gxf_file}'")
+            index = gxf_index_build(self.gxf_file, index_file)
+        return index
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_region_lines(self, seqname, end):
+        "read lines from the current position through the last one that might overlap"
+        seqname = seqname.encode()
+        lines = []
+        for _, line in self.reader.iter_lines():
+            if _is_record_line(line):
+                row = line.split(b"\t", 4)
+                if row[0] != seqname:
+                    break
+                try:
+                    if int(row[3]) > end:
+                        break
+                except (IndexError, ValueError):
+                    pass  # parser reports error
+            lines.append(line)
+        return lines
+
+    def read_header_metas(self):
+        """Get the GxfMeta objects of the `##' lines at the start of the file,
+        before the first record."""
+        self.reader.seek(0)
+        lines = []
+        for _, line in self.reader.iter_lines():
+            if _is_record_line(line):
+                break
+            lines.append(line)
+        parser = self.parser_class(self.gxf_file, gxf_fh=io.StringIO(b"".join(lines).decode()), **self.parser_opts)
+        return [meta for meta in parser.parse() if isinstance(meta, GxfMeta)]
+
+    def fetch(self, seqname, start, end, **parse_args):
+        """Generator of records overlapping the one-based, closed range.
+        Additional keyword arguments are passed to parser.parse() to further
+        select records."""
+        loc = self.index.lookup(seqname, start)
+        if loc is None:
+            return
+        offset, line_number = loc
+        self.reader.seek(offset)
+        lines = self._read_region_lines(seqname, end)
+        parser = self.parser_class(self.gxf_file, gxf_fh=io.StringIO(b"".join(lines).decode()), **self.parser_opts)
+        parser.line_number = line_number - 1
+        for rec in parser.parse(region=(seqname, start, end), **parse_args):
+            if isinstance(rec, GxfRecord):
+                yield rec
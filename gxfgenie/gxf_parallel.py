@@ -0,0 +1,265 @@
+"""
+Parallel parsing of uncompressed GxF files.  The file is split into
+newline-aligned byte ranges, which are parsed in worker processes by the
+normal GTF or GFF3 parser.  Workers return records as columns, which are
+much faster to pass between processes than GxfRecord objects.  Records are
+returned in the original file order with the correct line numbers.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import io
+import os
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from gxfgenie.errors import GxfGenieError, GxfGenieParseError
+from gxfgenie.gxf_filter import GxfFilter
+from gxfgenie.gxf_record import GxfRecord, GxfAttr
+from gxfgenie.gxf_parse_stats import GxfParseStats
+from gxfgenie import fileops
+
+# target size of a chunk that is parsed by a worker
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# don't split files into chunks smaller than this
+MIN_CHUNK_SIZE = 256 * 1024
+
+
+def find_chunks(gxf_file, workers, chunk_size=None):
+    """Split an uncompressed file into a list of (start, end) byte ranges,
+    with each range starting at the beginning of a line.  If chunk_size is
+    None, chunks are sized to give each worker several chunks, within the
+    range of MIN_CHUNK_SIZE to DEFAULT_CHUNK_SIZE."""
+    file_size = os.path.getsize(gxf_file)
+    if chunk_size is None:
+        chunk_size = max(min(DEFAULT_CHUNK_SIZE, file_size // (4 * workers)), MIN_CHUNK_SIZE)
+    starts = [0]
+    with open(gxf_file, "rb") as fh:
+        pos = chunk_size
+        while pos < file_size:
+            # back up one byte so a chunk boundary that lands at the start
+            # of a line is not skipped
+            fh.seek(pos - 1)
+            fh.readline()
+            boundary = fh.tell()
+            if boundary >= file_size:
+                break
+            starts.append(boundary)
+            pos = boundary + chunk_size
+    ends = starts[1:] + [file_size]
+    return list(zip(starts, ends))
+
+
+class _ChunkErrorSink:
+    """Error sink used by workers, errors are saved as picklable tuples of
+    (relative line number, message, cause, line) to be passed to the error
+    sink of the GxfParallelParser"""
+    def __init__(self):
+        self.errors = []
+
+    def add(self, error, line):
+        self.errors.append((error.line_number, error.msg, error.__cause__, line))
+
+
+class _ChunkPacker:
+    """Records and metadata of a chunk in a compact form that is fast to
+    pickle and to convert back to records.  Pickling GxfRecord objects costs
+    more than parsing them, which limited the speedup to little more than
+    the serial parser.
+
+    Columns are stored in parallel lists, with seqname, source, and feature
+    coded as indexes into a table of names.  Parsed attributes are stored as
+    a table of (name, value) and a tuple of table indexes for each record.
+    GxfAttr objects shared by the parser are stored in the table once.
+    Unparsed attribute columns are stored as str.  Metadata is stored with
+    the number of records that precede it."""
+
+    def __init__(self):
+        self.names = {}
+        self.columns = tuple([] for _ in range(10))
+        self.attr_table = []
+        self.metas = []
+        # GxfAttr ids to table index, the objects are kept so ids are not reused
+        self._attr_idxs = {}
+        self._attr_refs = []
+
+    def _add_attr(self, attr):
+        idx = self._attr_idxs[id(attr)] = len(self.attr_table)
+        self.attr_table.append((attr.name, attr.value))
+        self._attr_refs.append(attr)
+        return idx
+
+    def add(self, rec):
+        if not isinstance(rec, GxfRecord):
+            self.metas.append((len(self.columns[0]), rec))
+            return
+        names = self.names
+        seqnames, sources, features, starts, ends, scores, strands, phases, attrs, line_numbers = self.columns
+        seqnames.append(names.setdefault(rec.seqname, len(names)))
+        sources.append(names.setdefault(rec.source, len(names)))
+        features.append(names.setdefault(rec.feature, len(names)))
+        starts.append(rec.start)
+        ends.append(rec.end)
+        scores.append(rec.score)
+        strands.append(rec.strand)
+        phases.append(rec.phase)
+        line_numbers.append(rec.line_number)
+        attrs_str = rec.attrs_str
+        if attrs_str is not None:
+            attrs.append(attrs_str)
+        else:
+            attr_idxs = self._attr_idxs
+            idxs = []
+            for attr in rec.attrs.values():
+                idx = attr_idxs.get(id(attr))
+                idxs.append(idx if idx is not None else self._add_attr(attr))
+            attrs.append(tuple(idxs))
+
+    def pack(self):
+        "the picklable tuple of the chunk"
+        return (list(self.names), self.columns, self.attr_table, self.metas)
+
+
+def _parse_chunk(parser_class, gxf_file, start, end, parser_opts, gxf_filter, collect_stats, collect_errors):
+    """Worker function to parse one chunk.  Returns a tuple of the records
+    from _ChunkPacker.pack(), the number of lines in the chunk, None or error
+    information as a tuple of (relative line number, message, cause), a
+    GxfParseStats object if collect_stats is True, and a list of bad line
+    information from _ChunkErrorSink if collect_errors is True.  Records and
+    metadata have line numbers relative to the start of the chunk."""
+    with open(gxf_file, "rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    stats = GxfParseStats() if collect_stats else None
+    error_sink = _ChunkErrorSink() if collect_errors else None
+    parser = parser_class(gxf_file, gxf_fh=io.TextIOWrapper(io.BytesIO(data)), stats=stats,
+                          error_sink=error_sink, **parser_opts)
+    bad_lines = error_sink.errors if collect_errors else None
+    packer = _ChunkPacker()
+    try:
+        for rec in parser.parse(gxf_filter=gxf_filter):
+            packer.add(rec)
+    except GxfGenieParseError as ex:
+        return packer.pack(), parser.line_number, (ex.line_number, ex.msg, ex.__cause__), stats, bad_lines
+    return packer.pack(), parser.line_number, None, stats, bad_lines
+
+
+class GxfParallelParser:
+    """
+    Parse an uncompressed GxF file using a pool of worker processes.  This
+    has the same parse() interface as GxfParser, however gxf_file must be
+    the path of an uncompressed file, as the file is accessed by byte
+    offsets.
+
+    Args:
+        parser_class: GtfParser or Gff3Parser class used to parse each chunk.
+        gxf_file (str): Path to the GxF file.
+        workers (int): number of worker processes.
+        chunk_size (int): target size in bytes of chunks parsed by workers,
+            None to pick a size based on the file size.
+        parser_opts (dict): keyword arguments passed to the parser_class
+            constructor.  If attr_pool is specified, it is not passed to the
+            workers, instead the attributes of records returned by the
+            workers are replaced with ones from the pool.  If stats is
+            specified, statistics are collected by the workers and added to
+            it as each chunk is returned.
+    """
+
+    def __init__(self, parser_class, gxf_file, *, workers, chunk_size=None, parser_opts=None):
+        if fileops.is_compressed(gxf_file):
+            raise GxfGenieError(f"parallel parsing is not supported for compressed files: `{gxf_file}'")
+        if workers < 1:
+            raise GxfGenieError(f"number of workers must be at least one, got `{workers}'")
+        self.parser_class = parser_class
+        self.record_class = parser_class.record_class
+        self.gxf_file = gxf_file
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.parser_opts = dict(parser_opts) if parser_opts is not None else {}
+        self.attr_pool = self.parser_opts.pop("attr_pool", None)
+        self.stats = self.parser_opts.pop("stats", None)
+        self.error_sink = self.parser_opts.pop("error_sink", None)
+        self.line_number = 0
+
+    def close(self):
+        "provided for compatibility with GxfParser, no files are kept open"
+        pass
+
+    def _unpack_records(self, names, columns, attr_pairs, num_recs):
+        """generator of records from the columns of a packed chunk, for
+        the next num_recs records of the column iterators"""
+        record_class, attrs_class, gxf_file = self.record_class, self.record_class.attrs_class, self.gxf_file
+        base_line_number = self.line_number
+        attr_pool = self.attr_pool
+        for (seqname, source, feature, start, end, score, strand, phase, attr_idxs,
+             line_number) in islice(columns, num_recs):
+            if isinstance(attr_idxs, str):
+                attrs = attr_idxs
+            else:
+                attrs = attrs_class([attr_pairs[i] for i in attr_idxs])
+                if attr_pool is not None:
+                    attr_pool.intern_attrs(attrs)
+            yield record_class(names[seqname], names[source], names[feature], start, end, score,
+                               strand, phase, attrs, file_name=gxf_file,
+                               line_number=base_line_number + line_number)
+
+    def _finish_chunk(self, packed, num_lines, error, stats, bad_lines):
+        """generator of records of a chunk, converting chunk relative line
+        numbers to file line numbers, and raising an error after the records
+        preceding it are returned"""
+        if stats is not None:
+            self.stats.merge(stats)
+        if bad_lines is not None:
+            self._add_bad_lines(bad_lines)
+        names, columns, attr_table, metas = packed
+        attr_pairs = [(name, GxfAttr.from_parsed(name, value)) for name, value in attr_table]
+        columns_iter = zip(*columns)
+        num_done = 0
+        for num_before, meta in metas:
+            yield from self._unpack_records(names, columns_iter, attr_pairs, num_before - num_done)
+            num_done = num_before
+            meta.line_number += self.line_number
+            yield meta
+        yield from self._unpack_records(names, columns_iter, attr_pairs, len(columns[0]) - num_done)
+        if error is not None:
+            line_number, msg, cause = error
+            raise GxfGenieParseError(self.gxf_file, self.line_number + line_number, msg) from cause
+        self.line_number += num_lines
+
+    def _add_bad_lines(self, bad_lines):
+        "pass errors from a chunk to the error sink"
+        for line_number, msg, cause, line in bad_lines:
+            error = GxfGenieParseError(self.gxf_file, self.line_number + line_number, msg)
+            error.__cause__ = cause
+            self.error_sink.add(error, line)
+
+    def aparse_batches(self, *, batch_size=None, max_batches=None, **parse_args):
+        "async generator of lists of records, see GxfParser.aparse_batches()"
+        from gxfgenie.gxf_async import gxf_aparse_batches
+        return gxf_aparse_batches(self, batch_size=batch_size, max_batches=max_batches, **parse_args)
+
+    def aparse(self, *, batch_size=None, max_batches=None, **parse_args):
+        "async generator of records, see GxfParser.aparse()"
+        from gxfgenie.gxf_async import gxf_aparse
+        return gxf_aparse(self, batch_size=batch_size, max_batches=max_batches, **parse_args)
+
+    def parse(self, *, features=None, seqnames=None, region=None, attr_names=None, gxf_filter=None):
+        """parse generator of records or metadata, see GxfParser.parse() for
+        a description of the arguments"""
+        if gxf_filter is None:
+            gxf_filter = GxfFilter(features=features, seqnames=seqnames, region=region, attr_names=attr_names)
+        chunks = deque(find_chunks(self.gxf_file, self.workers, self.chunk_size))
+        pool = ProcessPoolExecutor(self.workers)
+        try:
+            # limit the number of outstanding chunks to bound memory
+            pending = deque()
+            while (len(chunks) > 0) or (len(pending) > 0):
+                while (len(chunks) > 0) and (len(pending) < 2 * self.workers):
+                    start, end = chunks.popleft()
+                    pending.append(pool.submit(_parse_chunk, self.parser_class, self.gxf_file,
+                                               start, end, self.parser_opts, gxf_filter,
+                                               self.stats is not None, self.error_sink is not None))
+                yield from self._finish_chunk(*pending.popleft().result())
+        finally:
+            pool.shutdown(cancel_futures=True)
+            if self.stats is not None:
+                self.stats.finish()
@@ -0,0 +1,170 @@
+"""
+Counters and timing of the stages of parsing, collected when a
+GxfParseStats object is passed to a parser.
+"""
+# Copyright 2025-2025 Mark Diekhans
+
+# stages of parsing that are timed:
+#   read: reading and splitting the file into lines
+#   filter: testing lines against the filter
+#   meta: parsing metadata lines
+#   columns: splitting and validating columns one through eight
+#   attrs: parsing the attribute column
+#   record: constructing the record object
+STAGE_READ = "read"
+STAGE_FILTER = "filter"
+STAGE_META = "meta"
+STAGE_COLUMNS = "columns"
+STAGE_ATTRS = "attrs"
+STAGE_RECORD = "record"
+PARSE_STAGES = (STAGE_READ, STAGE_FILTER, STAGE_META, STAGE_COLUMNS, STAGE_ATTRS, STAGE_RECORD)
+
+# stages that are also counted by feature
+FEATURE_STAGES = (STAGE_COLUMNS, STAGE_ATTRS, STAGE_RECORD)
+
+# default number of records between calls to the callback
+DEFAULT_CALLBACK_INTERVAL = 100000
+
+
+class GxfFeatureStats:
+    """Counters for records of one feature type.
+
+    Attributes:
+        records (int): number of records parsed.
+        attrs (int): number of attributes parsed, zero with lazy_attrs.
+        nsecs (dict): cumulative nanoseconds for each of FEATURE_STAGES.
+    """
+    __slots__ = ("records", "attrs", "nsecs")
+
+    def __init__(self):
+        self.records = 0
+        self.attrs = 0
+        self.nsecs = dict.fromkeys(FEATURE_STAGES, 0)
+
+    def merge(self, other):
+        self.records += other.records
+        self.attrs += other.attrs
+        for stage, nsecs in other.nsecs.items():
+            self.nsecs[stage] += nsecs
+
+    def to_dict(self):
+        return {"records": self.records,
+                "attrs": self.attrs,
+                "stage_secs": {stage: nsecs / 1.0e9 for stage, nsecs in self.nsecs.items()}}
+
+
+class GxfParseStats:
+    """
+    Counters and cumulative time of each stage of parsing.  Pass to a
+    parser with the stats option to collect them, parsers without stats
+    do no additional work.  A GxfParseStats object may be used with multiple
+    parsers to accumulate statistics over multiple files.
+
+    Time spent by the caller between records is not included.
+
+    Args:
+        callback: function called with this object after every
+            callback_interval records and when parsing of a file ends.
+        callback_interval (int): number of records between calls to callback.
+
+    Attributes:
+        lines (int): number of lines read.
+        records (int): number of records returned.
+        metas (int): number of metadata lines returned.
+        ignored (int): number of comment and blank lines.
+        filtered (int): number of lines rejected by the filter.  This includes
+            comment lines that are skipped without being decoded when
+            filtering memory-mapped files.
+        errors (int): number of lines that failed to parse and were passed
+            to an error sink.
+        nsecs (dict): cumulative nanoseconds for each of PARSE_STAGES.
+        features (dict): GxfFeatureStats for each feature type.
+    """
+
+    def __init__(self, *, callback=None, callback_interval=DEFAULT_CALLBACK_INTERVAL):
+        self.callback = callback
+        self.callback_interval = callback_interval
+        self.lines = 0
+        self.records = 0
+        self.metas = 0
+        self.ignored = 0
+        self.filtered = 0
+        self.errors = 0
+        self.nsecs = dict.fromkeys(PARSE_STAGES, 0)
+        self.features = {}
+        self._next_callback = callback_interval
+
+    def __getstate__(self):
+        # callbacks are often not picklable, they are not sent to other processes
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
+
+    def feature_stats(self, feature):
+        "get the GxfFeatureStats for a feature, creating if it doesn't exist"
+        feature_stats = self.features.get(feature)
+        if feature_stats is None:
+            feature_stats = self.features[feature] = GxfFeatureStats()
+        return feature_stats
+
+    def secs(self, stage):
+        "cumulative seconds of a stage"
+        return self.nsecs[stage] / 1.0e9
+
+    @property
+    def total_secs(self):
+        "cumulative seconds of all stages"
+        return sum(self.nsecs.values()) / 1.0e9
+
+    def merge(self, other):
+        "add counters from another GxfParseStats object"
+        self.lines += other.lines
+        self.records += other.records
+        self.metas += other.metas
+        self.ignored += other.ignored
+        self.filtered += other.filtered
+        self.errors += other.errors
+        for stage, nsecs in other.nsecs.items():
+            self.nsecs[stage] += nsecs
+        for feature, feature_stats in other.features.items():
+            self.feature_stats(feature).merge(feature_stats)
+        self.check_callback()
+
+    def check_callback(self):
+        "call the callback if callback_interval records have been parsed since the last call"
+        if (self.callback is not None) and (self.records >= self._next_callback):
+            self._next_callback = self.records + self.callback_interval
+            self.callback(self)
+
+    def finish(self):
+        "called when a parse ends"
+        if self.callback is not None:
+            self._next_callback = self.records + self.callback_interval
+            self.callback(self)
+
+    def to_dict(self):
+        "convert to a dict of simple types, suitable for JSON"
+        return {"lines": self.lines,
+                "records": self.records,
+                "metas": self.metas,
+                "ignored": self.ignored,
+                "filtered": self.filtered,
+                "errors": self.errors,
+                "stage_secs": {stage: nsecs / 1.0e9 for stage, nsecs in self.nsecs.items()},
+                "features": {feature: feature_stats.to_dict()
+                             for feature, feature_stats in self.features.items()}}
+
+    def format(self):
+        "format as a human readable table"
+        total_secs = self.total_secs
+        lines = [f"lines: {self.lines}  records: {self.records}  metas: {self.metas}  "
+                 f"ignored: {self.ignored}  filtered: {self.filtered}  errors: {self.errors}",
+                 "stage\tsecs\tpercent"]
+        for stage in PARSE_STAGES:
+            secs = self.secs(stage)
+            lines.append(f"{stage}\t{secs:.3f}\t{100.0 * secs / total_secs if total_secs > 0 else 0.0:.1f}")
+        lines.append("feature\trecords\tattrs\t" + "\t".join(f"{stage}_secs" for stage in FEATURE_STAGES))
+        for feature, feature_stats in sorted(self.features.items()):
+            lines.append(f"{feature}\t{feature_stats.records}\t{feature_stats.attrs}\t"
+                         + "\t".join(f"{feature_stats.nsecs[stage] / 1.0e9:.3f}" for stage in FEATURE_STAGES))
+        return "\n".join(lines)
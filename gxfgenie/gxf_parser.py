@@ -2,14 +2,24 @@
 Shared code for GFF3 and GTF parsing.
 """
 # Copyright 2025-2025 Mark Diekhans
+import os
 import re
+import mmap
+import time
 from abc import ABC, abstractmethod
 from gxfgenie.errors import GxfGenieFormatError, GxfGenieParseError
 from gxfgenie.gxf_record import GxfMeta
+from gxfgenie.gxf_filter import GxfFilter
+from gxfgenie.gxf_attr_pool import GxfAttrPool
+from gxfgenie.gxf_parse_stats import (STAGE_READ, STAGE_FILTER, STAGE_META, STAGE_COLUMNS,
+                                      STAGE_ATTRS, STAGE_RECORD)
 from gxfgenie import fileops
 
 _ignored_line_re = re.compile(r"(^[ ]*$)|(^[ ]*#.*$)")  # spaces or comment line
 
+# size of blocks read from the file
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
 class GxfParser(ABC):
     """
     Common code shared between GTF and GFF3 parser.  This just does basic
@@ -18,30 +28,125 @@ class GxfParser(ABC):
     create_record() to create a record derived from GxfRecord.
 
     This object is used as an iterator to parse a file.
+
+    Args:
+        gxf_file (str): Path to the GxF file, used in error messages if gxf_fh is specified.
+        gxf_fh: Optional open file object to read instead of opening gxf_file.
+        block_size (int): Size of blocks read from the file.
+        lazy_attrs (bool): Don't parse the attribute column when the record
+            is read.  The column is parsed on first access of the attrs field,
+            records that are never accessed are formatted with the original text.
+        use_mmap (bool): Read an uncompressed gxf_file by memory-mapping it.
+            Comment lines and lines rejected by a filter are skipped
+            without being decoded.  If None, mmap is used for uncompressed
+            regular files.  Ignored if gxf_fh is specified.
+        attr_pool (GxfAttrPool): Pool used to share GxfAttr objects between
+            records.  A pool may be shared by multiple parsers to share
+            attributes between files and to bound the memory used by all of
+            them.  If None, a pool with no size limit is created for this
+            parser.
+        stats (GxfParseStats): If specified, counters and time spent in each
+            stage of parsing are collected in this object.  A separate,
+            instrumented, parse loop is used, so there is no cost when
+            stats are not collected.
+        error_sink (GxfErrorSink): If specified, records that fail to parse
+            are passed to this object and skipped, rather than raising an
+            error.  Good records are parsed with no additional cost.
     """
 
-    def __init__(self, gxf_file=None, gxf_fh=None):
+    def __init__(self, gxf_file=None, gxf_fh=None, *, block_size=DEFAULT_BLOCK_SIZE, lazy_attrs=False,
+                 use_mmap=None, attr_pool=None, stats=None, error_sink=None):
         assert (gxf_file is not None) or (gxf_fh is not None)
         self.gxf_file = gxf_file if gxf_file is not None else "<unknown>"
         self.opened_file = (gxf_fh is None)
-        self.fh = fileops.opengz(gxf_file) if gxf_fh is None else gxf_fh
+        if (gxf_fh is None) and use_mmap is None:
+            use_mmap = (not fileops.is_compressed(gxf_file)) and os.path.isfile(gxf_file)
+        self.mm = None
+        self.fh = None
+        if gxf_fh is not None:
+            self.fh = gxf_fh
+        elif use_mmap:
+            self.mm = fileops.open_mmap(gxf_file)
+        else:
+            self.fh = fileops.opengz(gxf_file)
+        self.block_size = block_size
+        self.lazy_attrs = lazy_attrs
         self.line_number = 0
-        self.attrs_cache = {}
+        self.attrs_cache = attr_pool if attr_pool is not None else GxfAttrPool()
+        self.gxf_filter = GxfFilter()
+        self._accept_line = None  # None if not filtering lines
+        self.stats = stats
+        self.error_sink = error_sink
 
-    def _advance_line(self):
-        """Advance to the next line. Sets object state and returns None or line"""
-        line = self.fh.readline()
-        if len(line) == 0:
-            return None
-        else:
+    def _read_lines(self):
+        """Generator over lines of the file, without newlines.  The file is
+        read in large blocks that are split into lines in bulk.  The line
+        number is advanced as each line is returned."""
+        read = self.fh.read
+        block_size = self.block_size
+        partial = ""
+        while len(block := read(block_size)) > 0:
+            lines = (partial + block).split("\n")
+            partial = lines.pop()
+            for line in lines:
+                self.line_number += 1
+                yield line
+        if len(partial) > 0:
+            self.line_number += 1
+            yield partial
+
+    def _read_mmap_blocks(self):
+        """Generator over lines of a memory-mapped file, without newlines.
+        Blocks ending at a newline are decoded and split in bulk, which is
+        faster than scanning each line when most lines are kept."""
+        mm = self.mm
+        size = len(mm)
+        pos = 0
+        while pos < size:
+            nl = mm.find(b"\n", min(pos + self.block_size, size) - 1)
+            end = size if nl < 0 else nl + 1
+            block = str(mm[pos:end], "utf-8")
+            if "\r" in block:
+                block = block.replace("\r\n", "\n")
+            lines = block.split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            for line in lines:
+                self.line_number += 1
+                yield line
+            pos = end
+
+    def _read_mmap_lines(self, accept_bytes_line):
+        """Generator over lines of a memory-mapped file, without newlines.
+        Comment lines that are not metadata and lines rejected by
+        accept_bytes_line are skipped without being decoded.  The line
+        number is advanced for all lines."""
+        mm = self.mm
+        find = mm.find
+        size = len(mm)
+        pos = 0
+        while pos < size:
+            nl = find(b"\n", pos)
+            if nl < 0:
+                nl = size
+            end = nl if (nl == pos) or (mm[nl - 1] != 13) else nl - 1  # drop `\r'
             self.line_number += 1
-            return line.rstrip("\n")
+            if end > pos:
+                if mm[pos] == 35:  # `#'
+                    if (end > pos + 1) and (mm[pos + 1] == 35):
+                        yield str(mm[pos:end], "utf-8")
+                elif (accept_bytes_line is None) or accept_bytes_line(mm[pos:end]):
+                    yield str(mm[pos:end], "utf-8")
+            pos = nl + 1
 
     def close(self):
         """close GxF file if it was opened by __init__"""
         if (self.fh is not None) and self.opened_file:
             self.fh.close()
         self.fh = None
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.mm = None
 
     def _ignored(self, line):
         """Check if a line should be ignored (empty or comment)."""
@@ -122,50 +227,213 @@ class GxfParser(ABC):
             raise GxfGenieFormatError(f"Invalid `phase', expected `0', `1', `2', or `.', got `{value}'")
         return phase
 
-    def _parse_record(self, row):
-        """parse on record line of the GTF"""
+    @staticmethod
+    def _split_row(line):
+        "split a record line into columns, checking the number of columns"
+        gxf_num_cols = 9
+        row = line.split("\t")
+        if len(row) != gxf_num_cols:
+            raise GxfGenieFormatError(f"Wrong number of columns, expected {gxf_num_cols}, got {len(row)}: `{line}'")
+        return row
+
+    def _parse_columns(self, row):
+        """parse the columns before the attributes, returning a tuple of
+        seqname, source, feature, start, end, score, strand, and phase"""
         start = self._parse_pos_column('start', row[3])
         end = self._parse_pos_column('end', row[4])
         if start > end:
             raise GxfGenieFormatError(f"'start' column must be less-than or equal to end, got `{start} > {end}'")
+        return (self._parse_no_space_column('seqname', row[0]),
+                self._parse_no_empty_column('source', row[1]),
+                self._parse_no_empty_column('feature', row[2]),
+                start, end,
+                self._parse_score(row[5]),
+                self._parse_strand(row[6]),
+                self._parse_phase(row[7]))
+
+    def _parse_attrs_column(self, attrs_str):
+        return attrs_str if self.lazy_attrs else self.parse_attrs(attrs_str)
 
-        return self.create_record(self._parse_no_space_column('seqname', row[0]),
-                                  self._parse_no_empty_column('source', row[1]),
-                                  self._parse_no_empty_column('feature', row[2]),
-                                  start, end,
-                                  self._parse_score(row[5]),
-                                  self._parse_strand(row[6]),
-                                  self._parse_phase(row[7]),
-                                  self.parse_attrs(row[8]),
+    def _parse_record(self, row):
+        """parse on record line of the GTF"""
+        return self.create_record(*self._parse_columns(row),
+                                  self._parse_attrs_column(row[8]),
                                   file_name=self.gxf_file,
                                   line_number=self.line_number)
 
     def _parse_line(self, line):
-        gxf_num_cols = 9
-        row = line.split("\t")
         try:
-            if len(row) != gxf_num_cols:
-                raise GxfGenieFormatError(f"Wrong number of columns, expected {gxf_num_cols}, got {len(row)}: `{line}'")
-            return self._parse_record(row)
+            return self._parse_record(self._split_row(line))
         except Exception as ex:
-            raise GxfGenieParseError(self.gxf_file, self.line_number,
-                                     f"error parsing GxF record: `{line}'") from ex
+            return self._bad_line(line, ex)
+
+    def _bad_line(self, line, ex):
+        """Handle a line that failed to parse.  Raise an error, or if there is
+        an error sink, add the error to it and return None"""
+        error = GxfGenieParseError(self.gxf_file, self.line_number, f"error parsing GxF record: `{line}'")
+        if self.error_sink is None:
+            raise error from ex
+        error.__cause__ = ex
+        self.error_sink.add(error, line)
+        return None
 
     def _process_line(self, line):
         "None is return if line is not used"
-        if line.startswith("##"):
-            return self._parse_meta(line)
-        elif self._ignored(line):
+        # cheap first character checks, with the regular expression only used
+        # for lines starting with a space
+        if len(line) == 0:
+            return None
+        elif line[0] == '#':
+            if line.startswith("##"):
+                return self._parse_meta(line)
+            return None
+        elif (line[0] == ' ') and self._ignored(line):
+            return None
+        elif (self._accept_line is not None) and not self._accept_line(line):
             return None
         else:
             return self._parse_line(line)
 
-    def parse(self):
-        "parse generator of records or metadata"
+    def parse(self, *, features=None, seqnames=None, region=None, attr_names=None, gxf_filter=None):
+        """parse generator of records or metadata.
+
+        Records can be selected by the arguments, which are tested using
+        partial splitting of the line, before any other parsing is done.
+        Metadata is always returned.
+
+        Args:
+            features (set of str): feature types to return.
+            seqnames (set of str): sequence names to return.
+            region ((seqname, start, end)): return only records overlapping
+                this one-based, closed range.
+            attr_names (set of str): only keep these attributes, others are
+                not parsed.  Ignored if lazy_attrs is specified.
+            gxf_filter (GxfFilter): filter object to use instead of the above
+                arguments.
+        """
+        if gxf_filter is None:
+            gxf_filter = GxfFilter(features=features, seqnames=seqnames, region=region, attr_names=attr_names)
+        self.gxf_filter = gxf_filter
+        if (self.mm is not None) and gxf_filter.filters_lines:
+            # filtering is done on the undecoded lines
+            lines = self._read_mmap_lines(gxf_filter.accept_bytes_line)
+            self._accept_line = None
+        elif self.mm is not None:
+            lines = self._read_mmap_blocks()
+            self._accept_line = None
+        else:
+            lines = self._read_lines()
+            self._accept_line = gxf_filter.accept_line if gxf_filter.filters_lines else None
         try:
-            while (line := self._advance_line()) is not None:
-                rec = self._process_line(line)
-                if rec is not None:
-                    yield rec
+            if self.stats is not None:
+                yield from self._parse_lines_stats(lines)
+            else:
+                for line in lines:
+                    rec = self._process_line(line)
+                    if rec is not None:
+                        yield rec
         finally:
             self.close()
+
+    def aparse_batches(self, *, batch_size=None, max_batches=None, **parse_args):
+        """Async generator of lists of records or metadata for use with
+        asyncio.  The file is parsed by parse() in a background thread, so
+        the event loop is not blocked.  At most max_batches batches are
+        read ahead of the consumer.  Closing the generator or cancelling the
+        task stops the thread and closes the file.
+
+        Args:
+            batch_size (int): number of records in each batch, defaults to
+                gxf_async.DEFAULT_BATCH_SIZE.
+            max_batches (int): number of batches that are read ahead,
+                defaults to gxf_async.DEFAULT_MAX_BATCHES.
+            parse_args: other keyword arguments are passed to parse().
+        """
+        from gxfgenie.gxf_async import gxf_aparse_batches
+        return gxf_aparse_batches(self, batch_size=batch_size, max_batches=max_batches, **parse_args)
+
+    def aparse(self, *, batch_size=None, max_batches=None, **parse_args):
+        """Async generator of records or metadata for use with asyncio,
+        as in `async for rec in parser.aparse()'.  Records are passed from
+        the background thread in batches, see aparse_batches()."""
+        from gxfgenie.gxf_async import gxf_aparse
+        return gxf_aparse(self, batch_size=batch_size, max_batches=max_batches, **parse_args)
+
+    def _parse_lines_stats(self, lines):
+        """Parse loop that collects statistics, equivalent to calling
+        _process_line() on each line"""
+        stats = self.stats
+        nsecs = stats.nsecs
+        clock = time.perf_counter_ns
+        start_line_number = self.line_number
+        lines = iter(lines)
+        seen = 0
+        try:
+            while True:
+                t0 = clock()
+                line = next(lines, None)
+                t1 = clock()
+                nsecs[STAGE_READ] += t1 - t0
+                if line is None:
+                    break
+                seen += 1
+                if (len(line) == 0) or ((line[0] == '#') and not line.startswith("##")) or ((line[0] == ' ') and self._ignored(line)):
+                    stats.ignored += 1
+                elif line[0] == '#':
+                    meta = self._parse_meta(line)
+                    nsecs[STAGE_META] += clock() - t1
+                    if meta is not None:
+                        stats.metas += 1
+                        yield meta
+                    else:
+                        stats.ignored += 1
+                elif (self._accept_line is not None) and not self._accept_line(line):
+                    nsecs[STAGE_FILTER] += clock() - t1
+                    stats.filtered += 1
+                else:
+                    if self._accept_line is not None:
+                        t2 = clock()
+                        nsecs[STAGE_FILTER] += t2 - t1
+                        t1 = t2
+                    rec = self._parse_line_stats(line, t1)
+                    if rec is not None:
+                        stats.records += 1
+                        stats.check_callback()
+                        yield rec
+        finally:
+            lines_read = self.line_number - start_line_number
+            stats.lines += lines_read
+            stats.filtered += lines_read - seen  # skipped by the reader
+            stats.finish()
+
+    def _parse_line_stats(self, line, t0):
+        """parse a record line, collecting statistics, t0 is the time
+        parsing started"""
+        stats = self.stats
+        clock = time.perf_counter_ns
+        try:
+            row = self._split_row(line)
+            columns = self._parse_columns(row)
+            t1 = clock()
+            attrs = self._parse_attrs_column(row[8])
+            t2 = clock()
+            rec = self.create_record(*columns, attrs,
+                                     file_name=self.gxf_file,
+                                     line_number=self.line_number)
+            t3 = clock()
+        except Exception as ex:
+            if self.error_sink is not None:
+                stats.errors += 1
+            return self._bad_line(line, ex)
+        feature_stats = stats.feature_stats(row[2])
+        feature_stats.records += 1
+        if not self.lazy_attrs:
+            feature_stats.attrs += len(attrs)
+        fnsecs, nsecs = feature_stats.nsecs, stats.nsecs
+        fnsecs[STAGE_COLUMNS] += t1 - t0
+        fnsecs[STAGE_ATTRS] += t2 - t1
+        fnsecs[STAGE_RECORD] += t3 - t2
+        nsecs[STAGE_COLUMNS] += t1 - t0
+        nsecs[STAGE_ATTRS] += t2 - t1
+        nsecs[STAGE_RECORD] += t3 - t2
+        return rec
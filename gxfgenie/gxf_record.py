@@ -4,7 +4,7 @@ GxfRecord parsed from either GTF or GFF3 file.
 # Copyright 2025-2025 Mark Diekhans
 from abc import ABC, abstractmethod
 from collections.abc import Iterable, Hashable
-from gxfgenie.errors import GxfGenieError
+from gxfgenie.errors import GxfGenieError, GxfGenieParseError
 
 def _is_immutable(value):
     if isinstance(value, tuple):
@@ -56,6 +56,16 @@ class GxfAttr:
         object.__setattr__(self, "name", name)
         object.__setattr__(self, "value", value)
 
+    @classmethod
+    def from_parsed(cls, name, value):
+        """Create a GxfAttr without validating or normalizing the value, for
+        use by parsers.  The value must be a str or a tuple of two or more
+        str."""
+        attr = object.__new__(cls)
+        object.__setattr__(attr, "name", name)
+        object.__setattr__(attr, "value", value)
+        return attr
+
     def __setattr__(self, key, value):
         raise AttributeError(f"{self.__class__.__name__} is immutable")
 
@@ -65,6 +75,16 @@ class GxfAttr:
     def __hash__(self):
         return hash((self.name, self.value))
 
+    def __eq__(self, other):
+        if not isinstance(other, GxfAttr):
+            return NotImplemented
+        return (self.name == other.name) and (self.value == other.value)
+
+    def __reduce__(self):
+        # __setattr__ is blocked, so pickle by from_parsed() arguments, the
+        # value was validated when the object was created
+        return (self.__class__.from_parsed, (self.name, self.value))
+
     def __len__(self):
         return len(self.value) if isinstance(self.value, tuple) else 1
 
@@ -101,7 +121,7 @@ class GxfAttrs(dict, ABC):
     def get_attr(self, name):
         "Get an GxfAttr or error if it does not exist"
         attr = self.find_attr(name)
-        if name is not None:
+        if attr is None:
             raise GxfGenieError(f"attribute `{name}' not found")
         return attr
 
@@ -136,7 +156,8 @@ class GxfAttrs(dict, ABC):
         return attr.value
 
 
-def _merge_attr_values(old_value, new_value):
+def gxf_attr_merge_values(old_value, new_value):
+    "combine the values of two attributes into a tuple"
     new_value = _normalize_value(new_value)
     if not isinstance(old_value, tuple):
         old_value = (old_value,)
@@ -162,7 +183,7 @@ def gxf_attr_add(attrs, attr_cache, name, value):
     if attr is None:
         attr = GxfAttr(name, value)
     else:
-        attr = GxfAttr(name, _merge_attr_values(attr.value, value))
+        attr = GxfAttr(name, gxf_attr_merge_values(attr.value, value))
     if attr_cache is not None:
         cached = attr_cache.get(attr)
         if cached is None:
@@ -172,6 +193,25 @@ def gxf_attr_add(attrs, attr_cache, name, value):
     attrs[name] = attr
     return attr
 
+def gxf_attr_add_parsed(attrs, attrs_cache, name, value):
+    """Add a parsed attribute to attrs, merging with an existing attribute of
+    the same name.  This is the fast path used by the parsers, value must
+    be a str or tuple of str.  GxfAttr objects are shared through the
+    attrs_cache GxfAttrPool, which is keyed by (name, value).  If attrs_cache
+    is None, attributes are not shared.
+    """
+    prev = attrs.get(name)
+    if prev is not None:
+        value = gxf_attr_merge_values(prev.value, value)
+    if attrs_cache is None:
+        attrs[name] = GxfAttr.from_parsed(name, value)
+        return
+    key = (name, value)
+    attr = attrs_cache.get(key)
+    if attr is None:
+        attr = attrs_cache.add(key)
+    attrs[name] = attr
+
 
 class GxfRecord(ABC):
     """
@@ -187,7 +227,8 @@ class GxfRecord(ABC):
         score (int,float,None): score if present
         strand (str): strand of feature, one of '+', '-', or None if not specfied.
         phase (int,None): phase of CDS exon, 0, 1, 2, or None
-        attrs (GxfAttrs): Attributes
+        attrs (GxfAttrs): Attributes.  If the record was created with the
+            unparsed attribute column, it is parsed on first access.
         parent (GxfRecord):  Pointer to the parent object, or None if no parent.
         children ([GxfRecord]): list of children of this record
         file_name (str or None): Name of file the record was parsed from, if available
@@ -195,13 +236,13 @@ class GxfRecord(ABC):
         start0 (int): zero-based start.
     """
     __slots__ = ("seqname", "source", "feature", "start", "end", "score",
-                 "strand", "phase", "attrs", "parent", "children",
+                 "strand", "phase", "_attrs", "parent", "children",
                  "file_name", "line_number")
 
     def __init__(self, seqname, source, feature, start, end, score, strand, phase, attrs, *,
                  file_name=None, line_number=None):
         assert seqname is not None
-        assert isinstance(attrs, GxfAttrs)
+        assert isinstance(attrs, (GxfAttrs, str))
         self.seqname = seqname
         self.source = source
         self.feature = feature
@@ -210,7 +251,8 @@ class GxfRecord(ABC):
         self.score = score
         self.strand = strand
         self.phase = phase
-        self.attrs = attrs
+        # GxfAttrs or str of column 9 to parse on demand
+        self._attrs = attrs
         self.parent = None
         self.children = []
         self.file_name = file_name
@@ -220,6 +262,49 @@ class GxfRecord(ABC):
     def start0(self):
         return self.start - 1
 
+    @property
+    def attrs(self):
+        if isinstance(self._attrs, str):
+            self._attrs = self._parse_lazy_attrs(self._attrs)
+        return self._attrs
+
+    @attrs.setter
+    def attrs(self, attrs):
+        if not isinstance(attrs, GxfAttrs):
+            raise TypeError(f"attrs must be of type `GxfAttrs', got `{type(attrs)}'")
+        self._attrs = attrs
+
+    @property
+    def attrs_parsed(self):
+        "has the attribute column been parsed?"
+        return not isinstance(self._attrs, str)
+
+    @property
+    def attrs_str(self):
+        "the unparsed attribute column, or None if it has been parsed"
+        return self._attrs if isinstance(self._attrs, str) else None
+
+    def peek_attrs(self):
+        """Get the attributes without saving the result of parsing an
+        unparsed attribute column, so the record keeps the column as read."""
+        if isinstance(self._attrs, str):
+            return self._parse_lazy_attrs(self._attrs)
+        return self._attrs
+
+    def _parse_lazy_attrs(self, attrs_str):
+        try:
+            return self.parse_attrs_str(attrs_str)
+        except Exception as ex:
+            raise GxfGenieParseError(self.file_name, self.line_number,
+                                     f"error parsing GxF attributes: `{attrs_str}'") from ex
+
+    @staticmethod
+    @abstractmethod
+    def parse_attrs_str(attrs_str):
+        """parse an attribute column into the GxfAttrs derived object for this
+        type of record"""
+        pass
+
     @abstractmethod
     def __str__(self):
         """convert to tab-separate line"""
@@ -0,0 +1,224 @@
+"""
+Sorting of GxF files by sequence name and start position, for files larger
+than memory.  Records are formatted and collected in memory until a memory
+limit is reached, then sorted and written to a temporary file as a run.  The
+runs are merged to produce the sorted output.  The output is suitable for
+indexing with gxf_index_build().
+"""
+# Copyright 2025-2025 Mark Diekhans
+import os
+import heapq
+import tempfile
+from operator import itemgetter
+from gxfgenie import gxf_parser_factory, fileops
+from gxfgenie.defs import GENE_FEATURES, TRANSCRIPT_FEATURES
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfMeta
+from gxfgenie.gxf_writer import GxfFormatter
+from gxfgenie.bgzf import open_bgzf_writer
+
+# approximate limit on memory used for records before they are written to a run
+DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+
+# estimate of memory used per record in addition to the formatted line
+_RECORD_OVERHEAD = 300
+
+# maximum number of runs that are merged at once, more runs are merged in
+# multiple passes
+MAX_MERGE_RUNS = 128
+
+# buffer size used writing runs and reading runs when merging
+_RUN_BUFFER_SIZE = 1024 * 1024
+_MERGE_BUFFER_SIZE = 128 * 1024
+
+# default rank of features starting at the same position, so that parents
+# come before children, features not listed come after these.
+DEFAULT_FEATURE_RANKS = {**dict.fromkeys(GENE_FEATURES, 0),
+                         **dict.fromkeys(TRANSCRIPT_FEATURES, 1)}
+
+
+class _LineKey:
+    "compute the sort key of a formatted line"
+
+    def __init__(self, feature_ranks):
+        self.feature_ranks = feature_ranks
+        self.other_rank = max(feature_ranks.values(), default=-1) + 1
+
+    def __call__(self, line):
+        row = line.split("\t", 4)
+        return (row[0], int(row[3]), self.feature_ranks.get(row[2], self.other_rank))
+
+
+class GxfSorter:
+    """
+    Sort GTF or GFF3 records by sequence name and start position, using
+    temporary files for files that do not fit in memory.  Records starting
+    at the same position are ordered by feature rank, so genes come before
+    transcripts, which come before other features.  The order of records
+    that are otherwise equal is preserved.  Sequence names are sorted
+    lexically.
+
+    Metadata is output before all records, in the order it was added,
+    except for GFF3 `###' directives, which are dropped, as they are not
+    valid after sorting.
+
+    Use as a context manager or call close() to remove temporary files.
+
+    Args:
+        memory_limit (int): approximate number of bytes of records kept in
+            memory before writing a run to a temporary file.
+        tmp_dir (str): directory for temporary files, default is the system
+            temporary directory.
+        feature_ranks (dict): rank of each feature type, used to order
+            records with the same start position.  Features not in the
+            dict have a rank greater than all of those listed.  Use an empty
+            dict to sort only by position.  Defaults to DEFAULT_FEATURE_RANKS.
+    """
+
+    def __init__(self, *, memory_limit=DEFAULT_MEMORY_LIMIT, tmp_dir=None, feature_ranks=None):
+        self.memory_limit = memory_limit
+        self.tmp_dir = tmp_dir
+        self.feature_ranks = feature_ranks if feature_ranks is not None else DEFAULT_FEATURE_RANKS
+        self._line_key = _LineKey(self.feature_ranks)
+        self._formatter = GxfFormatter()
+        self._metas = []
+        self._entries = []   # (key, line)
+        self._entries_size = 0
+        self._run_files = []
+        self.num_records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        "remove temporary files"
+        for run_file in self._run_files:
+            if os.path.exists(run_file):
+                os.unlink(run_file)
+        self._run_files = []
+        self._entries = []
+
+    @property
+    def num_runs(self):
+        "number of runs written to temporary files"
+        return len(self._run_files)
+
+    def add(self, rec):
+        "add a GxfRecord or GxfMeta"
+        self.add_all((rec,))
+
+    def add_all(self, recs):
+        "add an iterable of GxfRecord or GxfMeta objects"
+        format = self._formatter.format
+        line_key = self._line_key
+        entries = self._entries
+        for rec in recs:
+            if isinstance(rec, GxfMeta):
+                if rec.value != "#":
+                    self._metas.append(str(rec) + "\n")
+                continue
+            # key is computed from the line, as it is when merging runs
+            line = format(rec) + "\n"
+            entries.append((line_key(line), line))
+            self._entries_size += len(line) + _RECORD_OVERHEAD
+            if self._entries_size >= self.memory_limit:
+                self._write_run()
+                entries = self._entries
+            self.num_records += 1
+
+    def _new_run_file(self):
+        fd, run_file = tempfile.mkstemp(prefix="gxfsort.", suffix=".run", dir=self.tmp_dir)
+        os.close(fd)
+        self._run_files.append(run_file)
+        return run_file
+
+    def _write_run(self):
+        self._entries.sort(key=itemgetter(0))
+        with open(self._new_run_file(), "w", buffering=_RUN_BUFFER_SIZE) as fh:
+            fh.writelines([entry[1] for entry in self._entries])
+        self._entries = []
+        self._entries_size = 0
+
+    def _merge_runs(self, run_files, fh):
+        run_fhs = [open(run_file, buffering=_MERGE_BUFFER_SIZE) for run_file in run_files]
+        try:
+            fh.writelines(heapq.merge(*run_fhs, key=self._line_key))
+        finally:
+            for run_fh in run_fhs:
+                run_fh.close()
+
+    def _reduce_runs(self):
+        """merge runs in passes until there are no more than MAX_MERGE_RUNS,
+        keeping the runs in order so the sort is stable"""
+        while len(self._run_files) > MAX_MERGE_RUNS:
+            run_files = self._run_files[0:MAX_MERGE_RUNS]
+            merged_file = self._new_run_file()
+            with open(merged_file, "w", buffering=_RUN_BUFFER_SIZE) as fh:
+                self._merge_runs(run_files, fh)
+            for run_file in run_files:
+                os.unlink(run_file)
+            self._run_files = [merged_file] + self._run_files[MAX_MERGE_RUNS:-1]
+
+    def iter_lines(self):
+        """Generator of the sorted lines, with newlines, metadata first.
+        This may only be called once, after all records are added."""
+        yield from self._metas
+        if len(self._run_files) == 0:
+            self._entries.sort(key=itemgetter(0))
+            for entry in self._entries:
+                yield entry[1]
+            self._entries = []
+        else:
+            if len(self._entries) > 0:
+                self._write_run()
+            self._reduce_runs()
+            run_fhs = [open(run_file, buffering=_MERGE_BUFFER_SIZE) for run_file in self._run_files]
+            try:
+                yield from heapq.merge(*run_fhs, key=self._line_key)
+            finally:
+                for run_fh in run_fhs:
+                    run_fh.close()
+
+    def write(self, out_gxf, *, bgzf=True):
+        """Write the sorted records to a file.  If out_gxf ends in `.gz' and
+        bgzf is True, the output is BGZF compressed so it can be indexed,
+        otherwise fileops.opengz() is used with in-process compression."""
+        if bgzf and str(out_gxf).endswith(".gz"):
+            fh = open_bgzf_writer(out_gxf)
+        else:
+            fh = fileops.opengz(out_gxf, "w", inprocess=(True if fileops.is_compressed(out_gxf) else None))
+        with fh:
+            fh.writelines(self.iter_lines())
+
+
+def gxf_sort(in_gxf, out_gxf, *, memory_limit=DEFAULT_MEMORY_LIMIT, tmp_dir=None, feature_ranks=None,
+             bgzf=True, parser_opts=None, **parse_args):
+    """
+    Sort a GTF or GFF3 file by sequence name and start position, see
+    GxfSorter.  The output format must be the same as the input format.
+
+    Args:
+        in_gxf (str): GTF or GFF3 file to sort, which may be compressed.
+        out_gxf (str): output file, if it ends in `.gz' it is compressed.
+        memory_limit, tmp_dir, feature_ranks: see GxfSorter.
+        bgzf (bool): BGZF compress `.gz' output.
+        parser_opts (dict): keyword arguments passed to the parser constructor.
+        parse_args: Other keyword arguments are passed to parse() to select records.
+
+    Returns:
+        the number of records written
+    """
+    in_ext = os.path.splitext(str(fileops.compress_base_name(in_gxf)))[1]
+    out_ext = os.path.splitext(str(fileops.compress_base_name(out_gxf)))[1]
+    if in_ext != out_ext:
+        raise GxfGenieError(f"sort output file must be the same format as the input, `{in_gxf}' and `{out_gxf}'")
+    parser_opts = dict(parser_opts) if parser_opts is not None else {}
+    parser_opts.setdefault("lazy_attrs", True)  # attributes are written as read
+    parser = gxf_parser_factory(in_gxf, **parser_opts)
+    with GxfSorter(memory_limit=memory_limit, tmp_dir=tmp_dir, feature_ranks=feature_ranks) as sorter:
+        sorter.add_all(parser.parse(**parse_args))
+        sorter.write(out_gxf, bgzf=bgzf)
+        return sorter.num_records
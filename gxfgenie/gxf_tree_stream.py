@@ -0,0 +1,240 @@
+"""
+Base class for streaming assembly of feature trees.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import heapq
+from abc import ABC, abstractmethod
+from collections import deque
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.gxf_dataset import GxfRecListDict
+
+
+class _TreeGroup:
+    """Records that are linked together, forming one or more trees.  When
+    a record links two groups, they are merged into the one created first,
+    with merged set in the other.
+
+    Attributes:
+        order (int): order in which the group was created.
+        end (int): maximum end of the records in the group.
+        roots (list): root records of the group.
+        keys (list): link target keys of records in the group.
+        unresolved (int): number of links to parents not yet added.
+        heap_end (int): end in the latest heap entry, or None if not in the heap.
+        merged (_TreeGroup): group this group was merged into.
+        complete (bool): no more records will be added to the group.
+    """
+    __slots__ = ("order", "end", "roots", "keys", "unresolved", "heap_end", "merged", "complete")
+
+    def __init__(self, order, end):
+        self.order = order
+        self.end = end
+        self.roots = []
+        self.keys = []
+        self.unresolved = 0
+        self.heap_end = None
+        self.merged = None
+        self.complete = False
+
+
+def _find_group(group):
+    while group.merged is not None:
+        group = group.merged
+    return group
+
+def _line_number_key(rec):
+    return rec.line_number if rec.line_number is not None else 0
+
+
+class GxfTreeStream(ABC):
+    """Assemble feature trees from a stream of records, returning each tree
+    as soon as it is complete.  Records are linked using the GxfRecord parent
+    and children fields, as with GxfDataSet, however completed trees are
+    then forgotten, so memory is bounded by the largest locus rather than the
+    size of the file.
+
+    Trees are complete when all records have been added with finish().
+    With sorted_input, the records are expected to be grouped by sequence
+    and sorted by start position, or grouped by locus, as in GENCODE files.
+    A tree is then also complete when a record on another sequence is
+    added, or a record that starts after the end of all of the records in
+    the tree.
+
+    Trees are returned in the order of the first record of the tree in the
+    input.  Derived classes implement _link_record() to link records based
+    on the file format.
+    """
+
+    def __init__(self, *, sorted_input=True):
+        self.sorted_input = sorted_input
+        self._metas = []
+        self._seqname = None
+        self._next_order = 0
+        # open groups, in order created
+        self._groups = deque()
+        # heap of (end, order, group) of groups that will be complete when
+        # a record starts after end
+        self._ends = []
+        # record and group to link children to, by a key defined by the derived class
+        self._link_targets = {}
+        # children added before their parent, as (rec, group), by the parent's key
+        self._pending = GxfRecListDict()
+        # roots of complete trees, not yet returned
+        self._complete = deque()
+
+    @property
+    def metas(self):
+        "list of metadata (GxfMeta) added"
+        return self._metas
+
+    def iter_trees(self, parser, **parse_args):
+        """Generator of root records of complete trees from the records
+        returned by a parser.  Metadata are saved in metas.  Additional
+        keyword arguments are passed to parser.parse()."""
+        complete = self._complete
+        for rec in parser.parse(**parse_args):
+            if isinstance(rec, GxfRecord):
+                self.add_record(rec)
+            else:
+                self.add_meta(rec)
+            while len(complete) > 0:
+                yield complete.popleft()
+        self.finish()
+        yield from self.pop_trees()
+
+    def pop_trees(self):
+        "generator of root records of trees completed by the records added so far"
+        complete = self._complete
+        while len(complete) > 0:
+            yield complete.popleft()
+
+    def add_meta(self, meta):
+        self._metas.append(meta)
+
+    def add_record(self, rec):
+        if self.sorted_input and (rec.seqname != self._seqname):
+            self._finish_groups()
+            self._seqname = rec.seqname
+        new_group = _TreeGroup(self._next_order, rec.end)
+        self._next_order += 1
+        group = self._link_record(rec, new_group)
+        if group is new_group:
+            self._groups.append(group)
+        if self.sorted_input:
+            if group.end != group.heap_end:
+                group.heap_end = group.end
+                heapq.heappush(self._ends, (group.end, group.order, group))
+            self._complete_before(rec.start)
+
+    def finish(self):
+        "complete all trees after all records have been added"
+        self._finish_groups()
+
+    @abstractmethod
+    def _link_record(self, rec, group):
+        """link a record into the trees, rec is in group, returning the group
+        rec is in after linking"""
+        pass
+
+    def _link_child(self, parent, child):
+        if child.parent is None:
+            child.parent = parent
+        parent.children.append(child)
+
+    def _add_root(self, rec, group):
+        _find_group(group).roots.append(rec)
+
+    def _merge_groups(self, group1, group2):
+        "merge two groups, returning the resulting group"
+        group1 = _find_group(group1)
+        group2 = _find_group(group2)
+        if group1 is group2:
+            return group1
+        if group2.order < group1.order:
+            group1, group2 = group2, group1
+        group1.end = max(group1.end, group2.end)
+        if len(group2.roots) > 0:
+            group1.roots.extend(group2.roots)
+            group1.roots.sort(key=_line_number_key)
+        group1.keys.extend(group2.keys)
+        group1.unresolved += group2.unresolved
+        group1.complete = False
+        group2.merged = group1
+        return group1
+
+    def _set_link_target(self, key, rec, group):
+        """make rec the record that children with key will be linked to,
+        returning the group rec is in"""
+        self._link_targets[key] = (rec, group)
+        _find_group(group).keys.append(key)
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            for child, child_group in pending:
+                self._link_child(rec, child)
+                _find_group(child_group).unresolved -= 1
+                group = self._merge_groups(group, child_group)
+        return group
+
+    def _link_to_parent(self, key, rec, group):
+        """link rec to a parent, or save it until the parent is added,
+        returning the group rec is in"""
+        target = self._link_targets.get(key)
+        if target is None:
+            self._pending.append(key, (rec, group))
+            _find_group(group).unresolved += 1
+            return group
+        parent, parent_group = target
+        self._link_child(parent, rec)
+        return self._merge_groups(group, parent_group)
+
+    def _unresolved_parents(self, pending):
+        """Called when trees are completed with a dict of parent keys to
+        lists of (child, group) whose parents were never added."""
+        for children in pending.values():
+            for child, group in children:
+                if child.parent is None:
+                    self._add_root(child, group)
+
+    def _complete_before(self, start):
+        "complete groups ending before start"
+        ends = self._ends
+        while (len(ends) > 0) and (ends[0][0] < start):
+            end, _, group = heapq.heappop(ends)
+            if (group.merged is None) and (group.heap_end == end):
+                group.heap_end = None
+                if group.unresolved == 0:
+                    group.complete = True
+        self._pop_complete_groups()
+
+    def _pop_complete_groups(self):
+        "move roots of completed groups at the start of the queue to the complete queue"
+        groups = self._groups
+        while (len(groups) > 0) and ((groups[0].merged is not None) or groups[0].complete):
+            group = groups.popleft()
+            if group.merged is None:
+                self._complete.extend(self._group_roots(group))
+                self._release_group(group)
+
+    def _group_roots(self, group):
+        "get the roots of the trees of a completed group"
+        return group.roots
+
+    def _release_group(self, group):
+        "remove links targets of a completed group"
+        link_targets = self._link_targets
+        for key in group.keys:
+            target = link_targets.get(key)
+            if (target is not None) and (_find_group(target[1]) is group):
+                del link_targets[key]
+
+    def _finish_groups(self):
+        "complete all groups"
+        if len(self._pending) > 0:
+            pending = self._pending
+            self._pending = GxfRecListDict()
+            self._unresolved_parents(pending)
+        for group in self._groups:
+            group.complete = True
+        self._pop_complete_groups()
+        self._link_targets = {}
+        self._ends = []
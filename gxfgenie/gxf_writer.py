@@ -0,0 +1,236 @@
+"""
+Bulk writing of GTF and GFF3 files.
+"""
+# Copyright 2025-2025 Mark Diekhans
+from abc import ABC, abstractmethod
+from gxfgenie import fileops
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfRecord, GxfMeta
+from gxfgenie.gtf_parser import GtfRecord, gtf_format_attr
+from gxfgenie.gff3_parser import Gff3Record, gff3_format_attr, gff3_quote_seqname, gff3_quote_other
+
+# size of blocks written to the file
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# maximum number of formatted attributes that are cached
+DEFAULT_ATTR_CACHE_SIZE = 1024 * 1024
+
+# maximum number of formatted column values that are cached
+_COLUMN_CACHE_SIZE = 64 * 1024
+
+
+class _Formatter(ABC):
+    """Format records of one type.  Formatted strings for column values and
+    GxfAttr objects are cached, so each distinct value is checked for quoting
+    and formatted only once.  Attributes are cached by object id, as parsers
+    share GxfAttr objects between records.  References to the cached objects
+    are kept so the ids can't be reused."""
+
+    attr_sep = None
+
+    def __init__(self, attr_cache_size):
+        self.attr_cache_size = attr_cache_size
+        self._attr_cache = {}
+        self._attr_refs = []
+        self._seqname_cache = {}
+        self._other_cache = {}
+
+    @staticmethod
+    def _quote_seqname(value):
+        return value
+
+    @staticmethod
+    def _quote_other(value):
+        return value
+
+    @staticmethod
+    @abstractmethod
+    def _format_attr(attr):
+        "format a GxfAttr"
+        pass
+
+    @staticmethod
+    def _add_column(cache, quote, value):
+        if len(cache) >= _COLUMN_CACHE_SIZE:
+            cache.clear()
+        formatted = cache[value] = quote(value)
+        return formatted
+
+    def _add_attr(self, attr):
+        if len(self._attr_cache) >= self.attr_cache_size:
+            self._attr_cache.clear()
+            self._attr_refs.clear()
+        formatted = self._attr_cache[id(attr)] = self._format_attr(attr)
+        self._attr_refs.append(attr)
+        return formatted
+
+    def format_attrs(self, rec):
+        attrs_str = rec.attrs_str
+        if attrs_str is not None:
+            return attrs_str  # lazy attributes that were never parsed
+        attr_cache = self._attr_cache
+        formatted = []
+        for attr in rec.attrs.values():
+            attr_str = attr_cache.get(id(attr))
+            formatted.append(attr_str if attr_str is not None else self._add_attr(attr))
+        return self.attr_sep.join(formatted)
+
+    def format(self, rec):
+        "format a record as a line, without the newline"
+        seqname = self._seqname_cache.get(rec.seqname)
+        if seqname is None:
+            seqname = self._add_column(self._seqname_cache, self._quote_seqname, rec.seqname)
+        other_cache = self._other_cache
+        source = other_cache.get(rec.source)
+        if source is None:
+            source = self._add_column(other_cache, self._quote_other, rec.source)
+        feature = other_cache.get(rec.feature)
+        if feature is None:
+            feature = self._add_column(other_cache, self._quote_other, rec.feature)
+        score, strand, phase = rec.score, rec.strand, rec.phase
+        return "\t".join([seqname, source, feature,
+                          str(rec.start),
+                          str(rec.end),
+                          "." if score is None else str(score),
+                          "." if strand is None else strand,
+                          "." if phase is None else str(phase),
+                          self.format_attrs(rec)])
+
+
+class _GtfFormatter(_Formatter):
+    attr_sep = " "
+
+    @staticmethod
+    def _format_attr(attr):
+        return gtf_format_attr(attr)
+
+
+class _Gff3Formatter(_Formatter):
+    attr_sep = ";"
+
+    @staticmethod
+    def _quote_seqname(value):
+        return gff3_quote_seqname(value)
+
+    @staticmethod
+    def _quote_other(value):
+        return gff3_quote_other(value)
+
+    @staticmethod
+    def _format_attr(attr):
+        return gff3_format_attr(attr)
+
+
+_formatter_classes = ((Gff3Record, _Gff3Formatter),
+                      (GtfRecord, _GtfFormatter))
+
+
+class GxfFormatter:
+    """
+    Format GxfRecord and GxfMeta objects as lines, without newlines.  The
+    format is determined by the class of each record, GtfRecord or
+    Gff3Record, and is the same as str() of the record.  Formatted column
+    values and attributes are cached, see GxfWriter.
+
+    Args:
+        attr_cache_size (int): maximum number of formatted attributes to cache.
+    """
+
+    def __init__(self, attr_cache_size=DEFAULT_ATTR_CACHE_SIZE):
+        self.attr_cache_size = attr_cache_size
+        self._formatters = {}
+
+    def _get_formatter(self, record_class):
+        for base_class, formatter_class in _formatter_classes:
+            if issubclass(record_class, base_class):
+                formatter = self._formatters[record_class] = formatter_class(self.attr_cache_size)
+                return formatter
+        raise GxfGenieError(f"don't know how to write records of {record_class}")
+
+    def format(self, rec):
+        "format a GxfRecord or GxfMeta as a line"
+        formatter = self._formatters.get(type(rec))
+        if formatter is not None:
+            return formatter.format(rec)
+        elif isinstance(rec, GxfMeta):
+            return str(rec)
+        elif isinstance(rec, GxfRecord):
+            return self._get_formatter(type(rec)).format(rec)
+        else:
+            raise GxfGenieError(f"can only write GxfRecord or GxfMeta objects, got {type(rec)}")
+
+
+class GxfWriter:
+    """
+    Write GTF or GFF3 records and metadata to a file.  Output is collected
+    into large blocks before being written.  The output format is determined
+    by the class of each record, GtfRecord or Gff3Record, so records should
+    not be mixed.  The output is the same as writing str() of each record.
+
+    Compressed output is written using in-process compression by default.
+    Use as a context manager or call close().
+
+    Args:
+        gxf_file (str): Path to the file to write, used in error messages if gxf_fh is specified.
+        gxf_fh: Optional open file object to write instead of opening gxf_file.
+        buffer_size (int): number of characters collected before writing.
+        attr_cache_size (int): maximum number of formatted attributes to cache.
+        inprocess (bool): passed to fileops.opengz().
+    """
+
+    def __init__(self, gxf_file=None, gxf_fh=None, *, buffer_size=DEFAULT_BUFFER_SIZE,
+                 attr_cache_size=DEFAULT_ATTR_CACHE_SIZE, inprocess=True):
+        assert (gxf_file is not None) or (gxf_fh is not None)
+        self.gxf_file = gxf_file if gxf_file is not None else "<unknown>"
+        self.opened_file = (gxf_fh is None)
+        if gxf_fh is not None:
+            self.fh = gxf_fh
+        else:
+            self.fh = fileops.opengz(gxf_file, "w", inprocess=(inprocess if fileops.is_compressed(gxf_file) else None))
+        self.buffer_size = buffer_size
+        self.formatter = GxfFormatter(attr_cache_size)
+        self._lines = []
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, rec):
+        "write a GxfRecord or GxfMeta"
+        self.write_all((rec,))
+
+    def write_all(self, recs):
+        "write an iterable of GxfRecord or GxfMeta objects"
+        lines = self._lines
+        formatters = self.formatter._formatters
+        format = self.formatter.format
+        buffered = self._buffered
+        for rec in recs:
+            formatter = formatters.get(type(rec))
+            line = formatter.format(rec) if formatter is not None else format(rec)
+            lines.append(line)
+            buffered += len(line) + 1
+            if buffered >= self.buffer_size:
+                self.flush()
+                buffered = 0
+        self._buffered = buffered
+
+    def flush(self):
+        "write buffered lines to the file"
+        if len(self._lines) > 0:
+            self._lines.append("")
+            self.fh.write("\n".join(self._lines))
+            self._lines.clear()
+            self._buffered = 0
+        self.fh.flush()
+
+    def close(self):
+        """write buffered lines and close file if it was opened by __init__"""
+        if self.fh is not None:
+            self.flush()
+            if self.opened_file:
+                self.fh.close()
+            self.fh = None
@@ -1,19 +1,156 @@
 """
 Range index of gxf_record objects
 """
-from collections import defaultdict
-from intervaltree import IntervalTree
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class _LengthClassRanges:
+    """Ranges of similar length, stored as arrays sorted by start.
+    Coordinates are 0-based, 1/2 open."""
+    __slots__ = ("starts", "ends", "rec_idxs", "max_length")
+
+    def __init__(self, records, rec_idxs):
+        rec_idxs.sort(key=lambda i: records[i].start)
+        self.rec_idxs = array('q', rec_idxs)
+        self.starts = array('q', (records[i].start0 for i in rec_idxs))
+        self.ends = array('q', (records[i].end for i in rec_idxs))
+        self.max_length = max(e - s for s, e in zip(self.starts, self.ends))
+
+    def overlapping(self, start0, end, rec_idxs_out):
+        # only ranges starting in [lo, hi) can overlap
+        lo = bisect_right(self.starts, start0 - self.max_length)
+        hi = bisect_left(self.starts, end)
+        ends, rec_idxs = self.ends, self.rec_idxs
+        rec_idxs_out.extend([rec_idxs[i] for i in range(lo, hi) if ends[i] > start0])
+
+
+class _SeqRanges:
+    """Ranges on one sequence.  These are partitioned into classes by the
+    power-of-two of their length, so that the window of starts searched in
+    each class is bounded by the longest range in the class, rather than the
+    longest range on the sequence."""
+    __slots__ = ("classes",)
+
+    def __init__(self, records, rec_idxs):
+        rec_idxs_by_class = {}
+        for irec in rec_idxs:
+            rec = records[irec]
+            length_class = (rec.end - rec.start0).bit_length()
+            class_idxs = rec_idxs_by_class.get(length_class)
+            if class_idxs is None:
+                class_idxs = rec_idxs_by_class[length_class] = []
+            class_idxs.append(irec)
+        self.classes = tuple(_LengthClassRanges(records, class_idxs)
+                             for _, class_idxs in sorted(rec_idxs_by_class.items()))
+
+    def overlapping(self, start0, end):
+        "list of record indices overlapping the range, in index order"
+        rec_idxs = []
+        for class_ranges in self.classes:
+            class_ranges.overlapping(start0, end, rec_idxs)
+        if len(self.classes) > 1:
+            rec_idxs.sort()
+        return rec_idxs
+
 
 class RangeIndex:
-    """Ranges index by chromosome and 0-based, 1/2 open coordinates"""
-    def __init__(self):
-        self._by_chrom = defaultdict(IntervalTree)
+    """Static index of records by sequence and range.
+
+    Records are added with add_record() or passed to the constructor.  The
+    index is built in bulk, into compact arrays, on the first query after
+    records are added.  Records are identified by their index in the
+    records list, in the order they were added.
+
+    Queries use one-based, closed coordinates, as in the records.
+    """
+
+    def __init__(self, records=()):
+        self._records = list(records)
+        self._by_seq = None
+        self._joiner = None
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def records(self):
+        "list of records, indexed by record index"
+        return self._records
 
     def add_record(self, rec):
-        self._by_chrom[rec.seqname].add(rec.start0, rec.end, rec)
+        self._records.append(rec)
+        self._by_seq = self._joiner = None
+
+    def _build(self):
+        rec_idxs_by_seq = {}
+        for irec, rec in enumerate(self._records):
+            rec_idxs = rec_idxs_by_seq.get(rec.seqname)
+            if rec_idxs is None:
+                rec_idxs = rec_idxs_by_seq[rec.seqname] = []
+            rec_idxs.append(irec)
+        self._by_seq = {seqname: _SeqRanges(self._records, rec_idxs)
+                        for seqname, rec_idxs in rec_idxs_by_seq.items()}
+
+    def _strand_filter(self, rec_idxs, strand):
+        records = self._records
+        return [i for i in rec_idxs if records[i].strand == strand]
+
+    def overlapping_indices(self, seqname, start, end, *, strand=None):
+        """List of indices of overlapping records, in the order they were
+        added, optionally filtering for strand"""
+        if self._by_seq is None:
+            self._build()
+        seq_ranges = self._by_seq.get(seqname)
+        if seq_ranges is None:
+            return []
+        rec_idxs = seq_ranges.overlapping(start - 1, end)
+        return rec_idxs if strand is None else self._strand_filter(rec_idxs, strand)
 
     def iter_overlapping(self, seqname, start, end, *, strand=None):
         """Generator of of overlapping records, optionally filtering for strand"""
-        for it in self._by_chrom[seqname].overlap(start - 1, end):
-            if (strand is None) or (it.data.strand == strand):
-                yield it.data
+        records = self._records
+        for irec in self.overlapping_indices(seqname, start, end, strand=strand):
+            yield records[irec]
+
+    def overlapping_indices_batch(self, regions):
+        """Query many regions in one call.  Regions is an iterable of
+        (seqname, start, end) or (seqname, start, end, strand) tuples, with
+        a strand of None matching all records.  Returns a list, parallel to
+        regions, of lists of the indices of overlapping records."""
+        if self._by_seq is None:
+            self._build()
+        by_seq = self._by_seq
+        results = []
+        for region in regions:
+            seq_ranges = by_seq.get(region[0])
+            if seq_ranges is None:
+                results.append([])
+                continue
+            rec_idxs = seq_ranges.overlapping(region[1] - 1, region[2])
+            if (len(region) > 3) and (region[3] is not None):
+                rec_idxs = self._strand_filter(rec_idxs, region[3])
+            results.append(rec_idxs)
+        return results
+
+    def overlap_join(self, seqnames, starts, ends, strands=None):
+        """Vectorized join of arrays of queries against the index, which is
+        much faster than querying one range at a time.  This requires numpy.
+
+        Args:
+            seqnames: array-like of query sequence names.
+            starts, ends: array-like of integer query one-based, closed ranges.
+            strands: optional array-like of query strands, with None or `.'
+                matching all records.
+
+        Returns:
+            (query_idxs, rec_idxs): pair of parallel np.ndarray of int64, one
+            entry for each overlap of a query and a record, sorted by query
+            index.
+        """
+        if self._joiner is None:
+            from gxfgenie.range_join import RangeJoiner
+            if self._by_seq is None:
+                self._build()
+            self._joiner = RangeJoiner(self, self._by_seq)
+        return self._joiner.join(seqnames, starts, ends, strands)
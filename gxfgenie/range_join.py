@@ -0,0 +1,126 @@
+"""
+Vectorized overlap join of many query ranges against a RangeIndex, using
+NumPy arrays.  Use RangeIndex.overlap_join() rather than using this module
+directly.
+
+This module requires numpy, which is an optional dependency.
+"""
+# Copyright 2025-2025 Mark Diekhans
+import numpy as np
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_columns import STRAND_NONE, STRAND_PLUS, STRAND_MINUS
+
+def _strand_codes(strands):
+    strands = np.asarray(strands, dtype=object)
+    codes = np.full(len(strands), STRAND_NONE, dtype=np.int8)
+    codes[strands == '+'] = STRAND_PLUS
+    codes[strands == '-'] = STRAND_MINUS
+    return codes
+
+def _as_int64(values, name):
+    values = np.asarray(values)
+    if values.dtype.kind not in "iu":
+        raise GxfGenieError(f"query {name} must be an integer array, got `{values.dtype}'")
+    return values.astype(np.int64, copy=False)
+
+
+class _ClassArrays:
+    "NumPy views of a _LengthClassRanges"
+    __slots__ = ("starts", "ends", "rec_idxs", "max_length")
+
+    def __init__(self, class_ranges):
+        self.starts = np.frombuffer(class_ranges.starts, dtype=np.int64)
+        self.ends = np.frombuffer(class_ranges.ends, dtype=np.int64)
+        self.rec_idxs = np.frombuffer(class_ranges.rec_idxs, dtype=np.int64)
+        self.max_length = class_ranges.max_length
+
+    def join(self, qidxs, qstarts0, qends):
+        """Find pairs of (query index, record index) for queries against this
+        class.  For each query, the candidate ranges are a contiguous run of
+        the sorted starts, found by searching the queries, in start order,
+        against the starts.  The runs are expanded into pairs and then filtered on end."""
+        lo = np.searchsorted(self.starts, qstarts0 - self.max_length, side="right")
+        hi = np.searchsorted(self.starts, qends, side="left")
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if total == 0:
+            return qidxs[0:0], self.rec_idxs[0:0]
+        # position in class of each candidate: lo of its query plus offset in the run
+        run_starts = np.cumsum(counts) - counts
+        pos = np.arange(total, dtype=np.int64) + np.repeat(lo - run_starts, counts)
+        cand_qidxs = np.repeat(qidxs, counts)
+        keep = self.ends[pos] > np.repeat(qstarts0, counts)
+        return cand_qidxs[keep], self.rec_idxs[pos[keep]]
+
+
+class RangeJoiner:
+    """NumPy views of a built RangeIndex used to join arrays of queries.
+    The arrays share memory with the index."""
+
+    def __init__(self, range_index, by_seq):
+        self._by_seq = {seqname: [_ClassArrays(c) for c in seq_ranges.classes]
+                        for seqname, seq_ranges in by_seq.items()}
+        self._rec_strands = _strand_codes([rec.strand for rec in range_index.records])
+
+    def join(self, seqnames, starts, ends, strands=None):
+        """Join arrays of queries; see RangeIndex.overlap_join()"""
+        seqnames = np.asarray(seqnames)
+        starts0 = _as_int64(starts, "starts") - 1
+        ends = _as_int64(ends, "ends")
+        if not (len(seqnames) == len(starts0) == len(ends)):
+            raise GxfGenieError("query seqnames, starts, and ends arrays must be the same length")
+        query_seqnames, seq_query_idxs = np.unique(seqnames, return_inverse=True)
+        order = np.argsort(seq_query_idxs)
+        bounds = np.searchsorted(seq_query_idxs[order], np.arange(len(query_seqnames) + 1))
+
+        query_strands = None
+        if strands is not None:
+            query_strands = _strand_codes(strands)
+            if len(query_strands) != len(starts0):
+                raise GxfGenieError("query strands array must be the same length as starts")
+
+        parts = []
+        for iseq, seqname in enumerate(query_seqnames.tolist()):
+            seq_classes = self._by_seq.get(seqname)
+            if seq_classes is None:
+                continue
+            # sweep the queries in start order, which makes searching much faster
+            qidxs = order[bounds[iseq]:bounds[iseq + 1]]
+            qidxs = qidxs[np.argsort(starts0[qidxs])]
+            qstarts0, qends = starts0[qidxs], ends[qidxs]
+            for class_arrays in seq_classes:
+                query_idxs, rec_idxs = class_arrays.join(qidxs, qstarts0, qends)
+                if query_strands is not None:
+                    query_idxs, rec_idxs = self._strand_filter(query_idxs, rec_idxs, query_strands)
+                if len(query_idxs) > 0:
+                    parts.append((query_idxs, rec_idxs))
+        return _merge_by_query(parts, len(starts0))
+
+    def _strand_filter(self, query_idxs, rec_idxs, query_strands):
+        want = query_strands[query_idxs]
+        keep = (want == STRAND_NONE) | (self._rec_strands[rec_idxs] == want)
+        return query_idxs[keep], rec_idxs[keep]
+
+
+def _merge_by_query(parts, num_queries):
+    """Merge parts, each a pair of arrays (query_idxs, rec_idxs) with the
+    pairs for a query adjacent, into a pair of arrays sorted by query index.
+    A single part is also reordered, as its queries are in start order.  Rather than
+    sorting, the position of each pair in the output is computed from the
+    count of pairs for each query."""
+    if len(parts) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    counts = np.bincount(np.concatenate([p[0] for p in parts]), minlength=num_queries)
+    next_pos = np.cumsum(counts) - counts  # next output position for each query
+    out_query_idxs = np.empty(int(counts.sum()), dtype=np.int64)
+    out_rec_idxs = np.empty(len(out_query_idxs), dtype=np.int64)
+    for query_idxs, rec_idxs in parts:
+        # rank of each pair within its query's run in this part
+        run_starts = np.flatnonzero(np.concatenate(([True], query_idxs[1:] != query_idxs[:-1])))
+        run_lens = np.diff(np.append(run_starts, len(query_idxs)))
+        ranks = np.arange(len(query_idxs)) - np.repeat(run_starts, run_lens)
+        out_pos = next_pos[query_idxs] + ranks
+        out_query_idxs[out_pos] = query_idxs
+        out_rec_idxs[out_pos] = rec_idxs
+        next_pos[query_idxs[run_starts]] += run_lens
+    return out_query_idxs, out_rec_idxs
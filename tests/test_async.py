@@ -0,0 +1,109 @@
+"""
+asyncio parsing tests
+"""
+import asyncio
+import threading
+import pytest
+from support import get_test_input_file, get_test_output_file
+from gxfgenie import gxf_parser_factory, fileops
+from gxfgenie.gxf_parse_stats import GxfParseStats
+from gxfgenie.errors import GxfGenieParseError
+
+
+def _aparse_threads():
+    return [t for t in threading.enumerate() if t.name == "gxf-aparse"]
+
+async def _collect(parser, **aparse_args):
+    return [rec async for rec in parser.aparse(**aparse_args)]
+
+@pytest.mark.parametrize("setname", ["gencode/set1.gtf", "gencode/v42.gff3"], ids=["set1_gtf", "v42_gff3"])
+@pytest.mark.parametrize("workers", [None, 2])
+def test_aparse(request, setname, workers):
+    in_gxf = get_test_input_file(request, setname)
+    expect = [str(r) for r in gxf_parser_factory(in_gxf).parse()]
+    recs = asyncio.run(_collect(gxf_parser_factory(in_gxf, workers=workers), batch_size=100))
+    assert [str(r) for r in recs] == expect
+    assert _aparse_threads() == []
+
+def test_compressed(request):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    gz_gtf = get_test_output_file(request, ".gtf.gz")
+    with open(in_gtf) as in_fh, fileops.opengz(gz_gtf, "w") as out_fh:
+        out_fh.write(in_fh.read())
+    expect = [str(r) for r in gxf_parser_factory(in_gtf).parse()]
+    recs = asyncio.run(_collect(gxf_parser_factory(gz_gtf)))
+    assert [str(r) for r in recs] == expect
+
+def test_batches_filter(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+
+    async def run():
+        return [batch async for batch in gxf_parser_factory(in_gff3).aparse_batches(batch_size=10, features={"exon"})]
+    batches = asyncio.run(run())
+    assert all(len(b) == 10 for b in batches[:-1])
+    recs = [r for b in batches for r in b]
+    assert {getattr(r, "feature", "exon") for r in recs} == {"exon"}
+    assert len(recs) == len(list(gxf_parser_factory(in_gff3).parse(features={"exon"})))
+
+def test_backpressure_cancel(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    stats = GxfParseStats()
+    parser = gxf_parser_factory(in_gff3, stats=stats)
+
+    async def run():
+        recs = parser.aparse(batch_size=10, max_batches=2)
+        first = await anext(recs)
+        await asyncio.sleep(0.2)
+        # reader is blocked by the full queue
+        assert stats.records <= 10 * 4
+        await recs.aclose()
+        return first
+    assert asyncio.run(run()) is not None
+    assert _aparse_threads() == []
+    assert (parser.fh is None) and (parser.mm is None)
+
+def test_task_cancel(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    parser = gxf_parser_factory(in_gff3)
+
+    async def consume(started):
+        async for _ in parser.aparse(batch_size=1, max_batches=1):
+            started.set()
+            await asyncio.sleep(10)
+
+    async def run():
+        started = asyncio.Event()
+        task = asyncio.create_task(consume(started))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(run())
+    assert _aparse_threads() == []
+    assert parser.mm is None
+
+def test_error(request):
+    in_gtf = get_test_input_file(request, "gtf_bad/bad-start.gtf")
+    with pytest.raises(GxfGenieParseError):
+        asyncio.run(_collect(gxf_parser_factory(in_gtf)))
+    assert _aparse_threads() == []
+
+def test_loop_not_blocked(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+
+    async def run():
+        ticks = 0
+        done = False
+
+        async def ticker():
+            nonlocal ticks
+            while not done:
+                ticks += 1
+                await asyncio.sleep(0)
+        task = asyncio.create_task(ticker())
+        async for _ in gxf_parser_factory(in_gff3).aparse_batches(batch_size=50):
+            pass
+        done = True
+        await task
+        return ticks
+    assert asyncio.run(run()) > 1
@@ -0,0 +1,70 @@
+"""
+GxfAttrPool tests
+"""
+import pickle
+import pytest
+from support import get_test_input_file
+from gxfgenie import gxf_parser_factory
+from gxfgenie.gxf_attr_pool import GxfAttrPool
+from gxfgenie.gxf_record import GxfAttr
+
+
+def _lookup(pool, name, value):
+    key = (name, value)
+    attr = pool.get(key)
+    return attr if attr is not None else pool.add(key)
+
+def test_sampling():
+    pool = GxfAttrPool(sample_size=10)
+    uniq = [_lookup(pool, "exon_id", f"E{i}") for i in range(20)]
+    reps = [_lookup(pool, "gene_type", "lncRNA") for i in range(20)]
+    assert pool.unpooled_names == {"exon_id"}
+    assert all(a is reps[0] for a in reps)
+    assert [a.value for a in uniq] == [f"E{i}" for i in range(20)]
+    # only the repeated attribute is kept
+    assert len(pool) == 1
+    assert _lookup(pool, "exon_id", "E1") is not uniq[1]
+
+def test_pool_all():
+    pool = GxfAttrPool(sample_size=0)
+    attrs = [_lookup(pool, "exon_id", f"E{i}") for i in range(20)]
+    assert len(pool) == 20
+    assert _lookup(pool, "exon_id", "E3") is attrs[3]
+
+def test_max_size():
+    pool = GxfAttrPool(max_size=10, sample_size=0)
+    keep = _lookup(pool, "tag", "basic")
+    for i in range(100):
+        _lookup(pool, "exon_id", f"E{i}")
+        # recently used attributes are kept
+        assert _lookup(pool, "tag", "basic") is keep
+        assert pool.size <= 10
+    assert pool.evictions > 0
+
+def test_intern_attrs():
+    pool = GxfAttrPool(sample_size=0)
+    attr = _lookup(pool, "gene_id", "G1")
+    attrs = {"gene_id": GxfAttr("gene_id", "G1"), "tag": GxfAttr("tag", "basic")}
+    pool.intern_attrs(attrs)
+    assert attrs["gene_id"] is attr
+    assert pool.get(("tag", "basic")) is attrs["tag"]
+
+def test_pickle():
+    pool = GxfAttrPool(100, sample_size=5, max_distinct_fraction=0.25)
+    _lookup(pool, "tag", "basic")
+    pool2 = pickle.loads(pickle.dumps(pool))
+    assert (len(pool2), pool2.max_size, pool2.sample_size, pool2.max_distinct_fraction) == (0, 100, 5, 0.25)
+
+def _attr_ids(recs, name):
+    return {id(rec.attrs[name]) for rec in recs if name in rec.attrs}
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_shared_parsers(request, workers):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    pool = GxfAttrPool(max_size=100000)
+    recs1 = [r for r in gxf_parser_factory(in_gtf, workers=workers, attr_pool=pool).parse() if hasattr(r, "attrs")]
+    recs2 = [r for r in gxf_parser_factory(in_gtf, workers=workers, attr_pool=pool).parse() if hasattr(r, "attrs")]
+    assert [str(r) for r in recs1] == [str(r) for r in recs2]
+    # attributes of both files are the same objects
+    assert _attr_ids(recs1, "gene_id") == _attr_ids(recs2, "gene_id")
+    assert len(_attr_ids(recs1, "gene_type")) == len({r.attrs["gene_type"].value for r in recs1})
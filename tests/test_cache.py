@@ -0,0 +1,116 @@
+"""
+Binary cache tests
+"""
+import os
+import shutil
+import pytest
+from support import get_test_input_file, get_test_output_file, safe_test_id
+from gxfgenie import gxf_parser_factory, gxf_dataset_load
+from gxfgenie.gxf_record import GxfRecord
+
+np = pytest.importorskip("numpy")
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_filter import GxfFilter
+from gxfgenie.gxf_columns import gxf_columns_load
+from gxfgenie.gxf_cache import (gxf_cache_path, gxf_cache_read_key, gxf_cache_load, gxf_cache_save,
+                                gxf_columns_load_cached, gxf_dataset_load_cached)
+
+
+def _copy_input(request, setname):
+    "copy so the cache is written to the output directory"
+    ext = os.path.splitext(setname)[1]
+    gxf_file = get_test_output_file(request, ext)
+    shutil.copyfile(get_test_input_file(request, setname), gxf_file)
+    cache_file = gxf_cache_path(gxf_file)
+    if os.path.exists(cache_file):
+        os.unlink(cache_file)
+    return gxf_file, cache_file
+
+def _parse_recs(in_gxf):
+    return [r for r in gxf_parser_factory(in_gxf).parse() if isinstance(r, GxfRecord)]
+
+@pytest.mark.parametrize("setname",
+                         ["gencode/set1.gtf", "gencode/v42.gff3", "gff3_good/ncbiProblems.gff3"],
+                         ids=safe_test_id)
+def test_round_trip(request, setname):
+    gxf_file, cache_file = _copy_input(request, setname)
+    columns = gxf_columns_load_cached(gxf_file)
+    assert os.path.exists(cache_file)
+    recs = _parse_recs(gxf_file)
+    assert len(columns) == len(recs)
+    for crec, rec in zip(columns.iter_records(), recs):
+        assert str(crec) == str(rec)
+        assert crec.line_number == rec.line_number
+    parsed = gxf_columns_load(gxf_parser_factory(gxf_file))
+    assert [str(m) for m in columns.metas] == [str(m) for m in parsed.metas]
+    for name in ("gene_id", "tag", "Parent"):
+        assert np.array_equal(columns.attr_mask(name), parsed.attr_mask(name))
+    assert np.array_equal(columns.attr_mask("tag", ["basic", "CCDS"]), parsed.attr_mask("tag", ["basic", "CCDS"]))
+    assert np.array_equal(columns.attr_mask("no_such_attr"), parsed.attr_mask("no_such_attr"))
+
+def test_stale(request):
+    gxf_file, cache_file = _copy_input(request, "gencode/set1.gtf")
+    columns = gxf_columns_load_cached(gxf_file)
+    num_recs = len(columns)
+    key = gxf_cache_read_key(cache_file)
+
+    # same key, not rebuilt
+    gxf_columns_load_cached(gxf_file)
+    assert gxf_cache_read_key(cache_file) == key
+
+    # options change key
+    columns = gxf_columns_load_cached(gxf_file, features=["gene"])
+    assert set(columns.features.names) == {"gene"}
+    assert gxf_cache_read_key(cache_file)["options"] == {"features": ["gene"]}
+
+    # file change rebuilds
+    with open(gxf_file) as fh:
+        lines = fh.readlines()
+    with open(gxf_file, "w") as fh:
+        fh.writelines(lines[:-1])
+    os.utime(gxf_file, ns=(key["mtime_ns"] + 10**9, key["mtime_ns"] + 10**9))
+    columns = gxf_columns_load_cached(gxf_file)
+    assert len(columns) == num_recs - 1
+
+def test_filter_key(request):
+    gxf_file, cache_file = _copy_input(request, "gencode/set1.gtf")
+    gxf_filter = GxfFilter(features=["transcript", "gene"], region=("chr1", 1, 1000000))
+    columns = gxf_columns_load_cached(gxf_file, gxf_filter=gxf_filter)
+    assert gxf_cache_read_key(cache_file)["options"] == {"features": ["gene", "transcript"],
+                                                         "region": ["chr1", 1, 1000000]}
+    assert len(columns) > 0
+    # same key as the equivalent arguments
+    mtime = os.stat(cache_file).st_mtime_ns
+    columns2 = gxf_columns_load_cached(gxf_file, features=["gene", "transcript"], region=("chr1", 1, 1000000))
+    assert os.stat(cache_file).st_mtime_ns == mtime
+    assert [str(r) for r in columns2.iter_records()] == [str(r) for r in columns.iter_records()]
+
+    class LineFilter(GxfFilter):
+        pass
+    with pytest.raises(GxfGenieError, match="can't cache results parsed with a LineFilter filter"):
+        gxf_columns_load_cached(gxf_file, gxf_filter=LineFilter(features=["gene"]))
+
+def test_save_cached(request):
+    gxf_file, cache_file = _copy_input(request, "gencode/set1.gff3")
+    columns = gxf_columns_load_cached(gxf_file)
+    # re-save columns loaded from a cache
+    cache_file2 = get_test_output_file(request, ".2.gxc")
+    gxf_cache_save(columns.select(columns.feature_mask(["gene", "transcript"])), cache_file2)
+    columns2 = gxf_cache_load(cache_file2)
+    assert set(columns2.features.names) >= {"gene", "transcript"}
+    assert [str(r) for r in columns2.iter_records()] == [str(r) for r in columns.iter_records()
+                                                         if r.feature in ("gene", "transcript")]
+
+def test_not_cache(request):
+    with pytest.raises(GxfGenieError, match="^not a GxfGenie cache file"):
+        gxf_cache_load(get_test_input_file(request, "gencode/set1.gtf"))
+
+@pytest.mark.parametrize("setname", ["gencode/set1.gtf", "gencode/v42.gff3"], ids=safe_test_id)
+def test_dataset(request, setname):
+    gxf_file, cache_file = _copy_input(request, setname)
+    for _ in range(2):
+        dataset = gxf_dataset_load_cached(gxf_file)
+        parsed = gxf_dataset_load(gxf_file)
+        assert [str(r) for r in dataset.iter_genes()] == [str(r) for r in parsed.iter_genes()]
+        assert ([[str(c) for c in t.children] for t in dataset.iter_transcripts()]
+                == [[str(c) for c in t.children] for t in parsed.iter_transcripts()])
@@ -0,0 +1,113 @@
+"""
+Command line interface tests
+"""
+import os
+import pytest
+from collections import Counter
+from support import get_test_input_file, get_test_output_file
+from gxfgenie import gxf_parser_factory
+from gxfgenie.cli import main
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.gxf_sort import gxf_sort
+from gxfgenie.gxf_index import gxf_index_path
+
+
+def _read_lines(gxf_file, records_only=False):
+    with open(gxf_file) as fh:
+        return [line.rstrip("\n") for line in fh
+                if not ((line == "\n") or (line.startswith("#") and (records_only or not line.startswith("##"))))]
+
+def _expected_lines(in_gxf, select):
+    "lines of records passing select, as read"
+    return [line for line in _read_lines(in_gxf, records_only=True) if select(line.split("\t"))]
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_filter_columns(request, ext):
+    in_gxf = get_test_input_file(request, "gencode/set1" + ext)
+    out_gxf = get_test_output_file(request, ext)
+    assert main(["filter", "--feature=exon", "--feature=CDS", "--seqname=chr1", "--region=chr1:60000-200000",
+                 in_gxf, out_gxf]) == 0
+    expect = _expected_lines(in_gxf, lambda row: ((row[2] in ("exon", "CDS")) and (row[0] == "chr1")
+                                                  and (int(row[3]) <= 200000) and (int(row[4]) >= 60000)))
+    assert len(expect) > 0
+    out_lines = _read_lines(out_gxf)
+    metas = [line for line in out_lines if line.startswith("##")]
+    assert len(metas) > 0
+    assert out_lines[len(metas):] == expect
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_filter_attrs(request, ext):
+    in_gxf = get_test_input_file(request, "gencode/set1" + ext)
+    out_gxf = get_test_output_file(request, ext + ".gz")
+    assert main(["filter", "--no-metas", "--attr=gene_name=OR4F5", "--attr-regex=transcript_type=^protein",
+                 "--threads=2", in_gxf, out_gxf]) == 0
+    recs = [rec for rec in gxf_parser_factory(out_gxf).parse()]
+    assert len(recs) > 0
+    assert all(isinstance(rec, GxfRecord) and (rec.attrs.get_attr_value1("gene_name") == "OR4F5")
+               and (rec.attrs.get_attr_value1("transcript_type") == "protein_coding") for rec in recs)
+    expect = [rec for rec in gxf_parser_factory(in_gxf).parse()
+              if isinstance(rec, GxfRecord) and (rec.attrs.find_attr_value("gene_name") == "OR4F5")
+              and (rec.attrs.find_attr_value("transcript_type") == "protein_coding")]
+    assert [str(r) for r in recs] == [str(r) for r in expect]
+
+def test_filter_indexed_region(request):
+    sorted_gtf = get_test_output_file(request, ".sorted.gtf")
+    gxf_sort(get_test_input_file(request, "gencode/set1.gtf"), sorted_gtf)
+    region_args = ["filter", "--region=chrX:66000000-160000000", "--feature=transcript", sorted_gtf]
+    scan_gtf = get_test_output_file(request, ".scan.gtf")
+    assert main(region_args + [scan_gtf]) == 0
+    assert main(["index", sorted_gtf]) == 0
+    assert os.path.exists(gxf_index_path(sorted_gtf))
+    indexed_gtf = get_test_output_file(request, ".indexed.gtf")
+    assert main(region_args + [indexed_gtf]) == 0
+    scan_lines = _read_lines(scan_gtf)
+    assert len([line for line in scan_lines if line.startswith("##")]) > 0
+    assert len([line for line in scan_lines if not line.startswith("##")]) > 0
+    assert _read_lines(indexed_gtf) == scan_lines
+
+def test_filter_stdout(request, capsys):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    assert main(["filter", "--no-metas", "--feature=gene", in_gtf]) == 0
+    assert capsys.readouterr().out.splitlines() == _expected_lines(in_gtf, lambda row: row[2] == "gene")
+
+def test_bad_region(request, capsys):
+    with pytest.raises(SystemExit):
+        main(["filter", "--region=chr1:10", get_test_input_file(request, "gencode/set1.gtf")])
+    assert "invalid region" in capsys.readouterr().err
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_stats(request, ext):
+    in_gxf = get_test_input_file(request, "gencode/set1" + ext)
+    out_tsv = get_test_output_file(request, ".tsv")
+    assert main(["stats", in_gxf, out_tsv]) == 0
+    with open(out_tsv) as fh:
+        rows = [line.rstrip("\n").split("\t") for line in fh]
+    assert rows[0] == ["category", "name", "count"]
+    counts = {}
+    for category, name, count in rows[1:]:
+        counts.setdefault(category, {})[name] = int(count)
+    recs = [rec for rec in gxf_parser_factory(in_gxf).parse() if isinstance(rec, GxfRecord)]
+    assert counts["feature"] == Counter(rec.feature for rec in recs)
+    assert counts["seqname"] == Counter(rec.seqname for rec in recs)
+    assert counts["gene_biotype"] == Counter(rec.attrs.get_attr_value1("gene_type") for rec in recs
+                                             if rec.feature == "gene")
+    assert sum(counts["transcript_biotype"].values()) == counts["feature"]["transcript"]
+
+def test_convert(request):
+    in_gff3 = get_test_input_file(request, "gencode/set1.gff3")
+    out_gtf = get_test_output_file(request, ".gtf")
+    assert main(["convert", "--rename-attr=gene_name=name", "--rename-feature=stop_codon_redefined_as_selenocysteine=Selenocysteine",
+                 in_gff3, out_gtf]) == 0
+    recs = [rec for rec in gxf_parser_factory(out_gtf).parse() if isinstance(rec, GxfRecord)]
+    assert {rec.feature for rec in recs} == {"gene", "transcript", "exon", "CDS", "UTR", "start_codon", "stop_codon"}
+    assert all(rec.attrs.find_attr("gene_name") is None for rec in recs)
+    assert all(rec.attrs.find_attr("name") is not None for rec in recs)
+
+def test_convert_error(request, capsys):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    assert main(["convert", in_gtf, get_test_output_file(request, ".gtf")]) == 1
+    assert capsys.readouterr().err.startswith("gxfgenie convert: convert output file must be a different format")
+
+def test_os_error(request, capsys):
+    assert main(["stats", get_test_output_file(request, ".none.gtf")]) == 1
+    assert capsys.readouterr().err.startswith("gxfgenie stats: [Errno 2] No such file or directory")
@@ -0,0 +1,44 @@
+"""
+Columnar storage tests
+"""
+import pytest
+from support import get_test_input_file
+from gxfgenie import gxf_parser_factory
+from gxfgenie.gxf_record import GxfRecord
+
+np = pytest.importorskip("numpy")
+from gxfgenie.gxf_columns import gxf_columns_load
+
+
+def _parse_recs(in_gxf):
+    return [r for r in gxf_parser_factory(in_gxf).parse() if isinstance(r, GxfRecord)]
+
+@pytest.mark.parametrize("setname",
+                         ["gencode/set1.gtf", "gencode/v42.gff3", "gff3_good/ncbiProblems.gff3"])
+def test_materialize(setname, request):
+    in_gxf = get_test_input_file(request, setname)
+    columns = gxf_columns_load(gxf_parser_factory(in_gxf))
+    recs = _parse_recs(in_gxf)
+    assert len(columns) == len(recs)
+    for crec, rec in zip(columns.iter_records(), recs):
+        assert str(crec) == str(rec)
+        assert crec.line_number == rec.line_number
+    assert len(columns.metas) > 0
+
+def test_masks(request):
+    in_gxf = get_test_input_file(request, "gencode/set1.gtf")
+    columns = gxf_columns_load(gxf_parser_factory(in_gxf))
+    recs = _parse_recs(in_gxf)
+
+    mask = (columns.feature_mask({"CDS", "exon"}) & columns.strand_mask('-')
+            & columns.region_mask("chr1", 100000, 1000000))
+    expect = [str(r) for r in recs if (r.feature in ("CDS", "exon")) and (r.strand == '-')
+              and (r.seqname == "chr1") and (r.start <= 1000000) and (r.end >= 100000)]
+    assert len(expect) > 0
+    assert [str(r) for r in columns.select(mask).iter_records()] == expect
+
+    mask = columns.attr_mask("tag", {"CCDS"}) & columns.seqname_mask({"chr1", "chrX"})
+    expect = [str(r) for r in recs if ("CCDS" in (r.attrs.find_attr("tag") or ()))
+              and (r.seqname in ("chr1", "chrX"))]
+    assert len(expect) > 0
+    assert [str(r) for r in columns.select(np.flatnonzero(mask)).iter_records()] == expect
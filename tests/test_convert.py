@@ -0,0 +1,113 @@
+"""
+GTF and GFF3 conversion tests
+"""
+import io
+import gzip
+import pytest
+from support import get_test_input_file, get_test_output_file
+from gxfgenie import gxf_parser_factory, gxf_dataset_load
+from gxfgenie.gxf_convert import gxf_convert, GtfToGff3Converter, Gff3ToGtfConverter
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.gxf_writer import GxfWriter
+from gxfgenie.gtf_parser import GtfParser
+from gxfgenie.gtf_tree_stream import GtfTreeStream
+from gxfgenie.gff3_parser import Gff3Parser
+from gxfgenie.gff3_tree_stream import Gff3TreeStream
+from gxfgenie.errors import GxfGenieError
+
+
+def _written_lines(in_gxf):
+    "records as written by GxfWriter"
+    fh = io.StringIO()
+    with GxfWriter("test", gxf_fh=fh) as writer:
+        writer.write_all(r for r in gxf_parser_factory(in_gxf).parse() if isinstance(r, GxfRecord))
+    return fh.getvalue().splitlines()
+
+def _record_lines(gxf_file):
+    with open(gxf_file) as fh:
+        return [line.rstrip("\n") for line in fh if not line.startswith("#")]
+
+@pytest.mark.parametrize("setname", ["gencode/set1.gtf", "gencode/v27.par.gtf", "gtf_good/ensembl_grch37.head.gtf"],
+                         ids=["set1", "v27_par", "ensembl"])
+def test_gtf_round_trip(request, setname):
+    in_gtf = get_test_input_file(request, setname)
+    out_gff3 = get_test_output_file(request, ".gff3")
+    out_gtf = get_test_output_file(request, ".gtf")
+    assert gxf_convert(in_gtf, out_gff3) == len(_written_lines(in_gtf))
+    gtf_dataset = gxf_dataset_load(in_gtf)
+    gff3_dataset = gxf_dataset_load(out_gff3)
+    assert [r.feature for r in gff3_dataset.iter_roots()] == [r.feature for r in gtf_dataset.iter_roots()]
+    gxf_convert(out_gff3, out_gtf)
+    assert _record_lines(out_gtf) == _written_lines(in_gtf)
+
+def test_gtf_to_gff3(request):
+    out_gff3 = get_test_output_file(request, ".gff3")
+    gxf_convert(get_test_input_file(request, "gencode/set1.gtf"), out_gff3)
+    with open(out_gff3) as fh:
+        assert fh.readline() == "##gff-version 3\n"
+    dataset = gxf_dataset_load(out_gff3)
+    trans, = dataset.get_records_by_id("ENST00000641515.2")
+    assert trans.parent.attrs.get_attr_value1("ID") == "ENSG00000186092.7"
+    assert {(c.feature, c.attrs.get_attr_value1("ID")) for c in trans.children} == {
+        ("exon", "exon:ENST00000641515.2:1"), ("exon", "exon:ENST00000641515.2:2"), ("exon", "exon:ENST00000641515.2:3"),
+        ("CDS", "CDS:ENST00000641515.2"), ("start_codon", "start_codon:ENST00000641515.2"),
+        ("stop_codon", "stop_codon:ENST00000641515.2"), ("five_prime_UTR", "five_prime_UTR:ENST00000641515.2"),
+        ("three_prime_UTR", "three_prime_UTR:ENST00000641515.2")}
+    cds_recs = [c for c in trans.children if c.feature == "CDS"]
+    utrs = [c for c in trans.children if c.feature.endswith("_UTR")]
+    assert all(u.end < cds_recs[0].start for u in utrs if u.feature == "five_prime_UTR")
+    assert all(u.start > cds_recs[-1].end for u in utrs if u.feature == "three_prime_UTR")
+
+def test_gtf_to_gff3_synthesize():
+    gtf_text = ('chr1\tt\texon\t10\t20\t.\t-\t.\tgene_id "G1"; transcript_id "T1"; gene_name "A";\n'
+                'chr1\tt\tCDS\t15\t20\t.\t-\t0\tgene_id "G1"; transcript_id "T1"; gene_name "A";\n'
+                'chr1\tt\tUTR\t10\t14\t.\t-\t.\tgene_id "G1"; transcript_id "T1"; gene_name "A";\n')
+    converter = GtfToGff3Converter(attr_renames={"gene_name": "Name"}, feature_renames={"transcript": "mRNA"})
+    recs = [rec for root in GtfTreeStream(synthesize=True).iter_trees(GtfParser("test.gtf", gxf_fh=io.StringIO(gtf_text)))
+            for rec in converter.convert_tree(root)]
+    assert [str(r) for r in recs] == [
+        "chr1\tt\tgene\t10\t20\t.\t-\t.\tID=G1;gene_id=G1;Name=A",
+        "chr1\tt\tmRNA\t10\t20\t.\t-\t.\tID=T1;Parent=G1;gene_id=G1;transcript_id=T1;Name=A",
+        "chr1\tt\texon\t10\t20\t.\t-\t.\tID=exon:T1:1;Parent=T1;gene_id=G1;transcript_id=T1;Name=A",
+        "chr1\tt\tCDS\t15\t20\t.\t-\t0\tID=CDS:T1;Parent=T1;gene_id=G1;transcript_id=T1;Name=A",
+        "chr1\tt\tthree_prime_UTR\t10\t14\t.\t-\t.\tID=three_prime_UTR:T1;Parent=T1;gene_id=G1;transcript_id=T1;Name=A"]
+
+def test_gff3_to_gtf(request):
+    in_gff3 = get_test_input_file(request, "gencode/set1.gff3")
+    out_gtf = get_test_output_file(request, ".gtf.gz")
+    num_recs = gxf_convert(in_gff3, out_gtf, workers=2)
+    with gzip.open(out_gtf, "rt") as fh:
+        lines = fh.readlines()
+    assert not any(line.startswith("##gff-version") or ("ID=" in line) for line in lines)
+    assert len([line for line in lines if not line.startswith("#")]) == num_recs
+    dataset = gxf_dataset_load(out_gtf)
+    gff3_dataset = gxf_dataset_load(in_gff3)
+    gene_ids = [g.attrs.get_attr_value1("gene_id") for g in dataset.iter_roots()]
+    assert gene_ids == [g.attrs.find_attr_value("gene_id", g.attrs.get_attr_value1("ID"))
+                        for g in gff3_dataset.iter_roots()]
+    for gene in dataset.iter_roots():
+        assert gene.feature == "gene"
+        for trans in gene.children:
+            assert trans.feature == "transcript"
+            assert {c.feature for c in trans.children} <= {"exon", "CDS", "UTR", "start_codon",
+                                                           "stop_codon", "Selenocysteine"}
+
+def test_gff3_to_gtf_multi_parent():
+    gff3_text = ("chr1\tt\tgene\t10\t90\t.\t+\t.\tID=G1;Name=A\n"
+                 "chr1\tt\tmRNA\t10\t90\t.\t+\t.\tID=T1;Parent=G1\n"
+                 "chr1\tt\tmRNA\t10\t50\t.\t+\t.\tID=T2;Parent=G1\n"
+                 "chr1\tt\texon\t10\t20\t.\t+\t.\tParent=T1,T2\n")
+    in_gff3 = io.StringIO(gff3_text)
+    converter = Gff3ToGtfConverter(attr_renames={"Name": "gene_name"})
+    recs = [rec for root in Gff3TreeStream().iter_trees(Gff3Parser("test.gff3", gxf_fh=in_gff3))
+            for rec in converter.convert_tree(root)]
+    assert [str(r) for r in recs] == [
+        'chr1\tt\tgene\t10\t90\t.\t+\t.\tgene_id "G1"; gene_name "A";',
+        'chr1\tt\ttranscript\t10\t90\t.\t+\t.\tgene_id "G1"; transcript_id "T1";',
+        'chr1\tt\texon\t10\t20\t.\t+\t.\tgene_id "G1"; transcript_id "T1";',
+        'chr1\tt\ttranscript\t10\t50\t.\t+\t.\tgene_id "G1"; transcript_id "T2";',
+        'chr1\tt\texon\t10\t20\t.\t+\t.\tgene_id "G1"; transcript_id "T2";']
+
+def test_format_mismatch(request):
+    with pytest.raises(GxfGenieError, match="different format"):
+        gxf_convert(get_test_input_file(request, "gencode/set1.gtf"), get_test_output_file(request, ".gtf"))
@@ -0,0 +1,106 @@
+"""
+Data set loading and hierarchy tests
+"""
+import io
+import pytest
+from support import get_test_input_file
+from gxfgenie import gxf_dataset_load
+from gxfgenie.errors import GxfGenieError, GxfGenieParseError
+from gxfgenie.gff3_parser import Gff3Parser
+from gxfgenie.gff3_dataset import Gff3DataSet
+
+
+def _count_tree(rec, seen):
+    if id(rec) not in seen:
+        seen.add(id(rec))
+        for child in rec.children:
+            assert child.parent is not None
+            _count_tree(child, seen)
+
+def _check_dataset(dataset):
+    # all records are reachable from a root, and links are consistent
+    seen = set()
+    for root in dataset.iter_roots():
+        assert root.parent is None
+        _count_tree(root, seen)
+    assert len(seen) == len(dataset.records)
+    for rec in dataset.records:
+        if rec.parent is not None:
+            assert rec in rec.parent.children
+
+
+_good_sets = ["gencode/set1.gff3", "gencode/set1.gtf", "gencode/v42.gff3", "gencode/v27.par.gtf",
+              "gencode/v19.gtf", "gff3_good/discontinuous.gff3", "gff3_good/ncbiSegments.gff3",
+              "gff3_good/noId.gff3", "gff3_good/transcriptOnly.gff3", "gtf_good/B16.stringtie.head.gtf",
+              "gtf_good/refseq.ucsc.small.gtf"]
+
+@pytest.mark.parametrize("setname", _good_sets, ids=[s.replace('/', '_') for s in _good_sets])
+def test_good(request, setname):
+    _check_dataset(gxf_dataset_load(get_test_input_file(request, setname)))
+
+@pytest.mark.parametrize("ext", [".gff3", ".gtf"])
+def test_gencode_ids(request, ext):
+    dataset = gxf_dataset_load(get_test_input_file(request, "gencode/set1" + ext))
+    for gene in dataset.iter_genes():
+        for trans in gene.children:
+            assert trans.feature == "transcript"
+    trans, = dataset.fetch_transcripts_by_id("ENST00000342066.8")
+    assert trans.parent.feature == "gene"
+    assert trans.parent.attrs.get_attr_value1("gene_id") == trans.attrs.get_attr_value1("gene_id")
+    assert {c.feature for c in trans.children} >= {"exon", "CDS"}
+    assert dataset.get_transcripts_by_id("ENSTnone") is None
+    with pytest.raises(GxfGenieError, match="^gene_id not found"):
+        dataset.fetch_genes_by_id("ENSGnone")
+
+def test_par_ids(request):
+    dataset = gxf_dataset_load(get_test_input_file(request, "gencode/v27.par.gff3"))
+    genes = dataset.fetch_genes_by_id("ENSG00000182378.13_PAR_Y")
+    assert [g.seqname for g in genes] == ["chrY"]
+    assert len(genes[0].children) > 0
+
+def test_overlapping(request):
+    dataset = gxf_dataset_load(get_test_input_file(request, "gencode/set1.gtf"))
+    for gene in dataset.iter_genes():
+        assert gene in dataset.get_overlapping_genes(gene.seqname, gene.start, gene.start)
+        assert gene not in dataset.get_overlapping_genes(gene.seqname, gene.start, gene.end,
+                                                         strand='-' if gene.strand == '+' else '+')
+    for trans in dataset.iter_transcripts():
+        assert trans in dataset.get_overlapping_transcripts(trans.seqname, trans.end, trans.end + 10)
+
+def test_discontinuous(request):
+    dataset = gxf_dataset_load(get_test_input_file(request, "gff3_good/discontinuous.gff3"))
+    cds_recs = dataset.get_records_by_id("apidb|cds_MAL13P1.103-1")
+    assert len(cds_recs) == 10
+    mrna = cds_recs[0].parent
+    assert mrna.feature == "mRNA"
+    assert all(c.parent is mrna for c in cds_recs)
+
+def test_dup_id_diff_parents(request):
+    dataset = gxf_dataset_load(get_test_input_file(request, "gff3_bad/dupIdDiffParents.gff3"))
+    transes = dataset.fetch_transcripts_by_id("XM_017030025.2")
+    assert [t.parent.attrs.get_attr_value1("ID") for t in transes] == ["TSPY10P", "TSPY10"]
+    for trans in transes:
+        assert all(c.start >= trans.start for c in trans.children)
+        assert len(trans.children) == 11
+
+def _parse_gff3(gff3_text):
+    return Gff3DataSet.load(Gff3Parser("test.gff3", gxf_fh=io.StringIO(gff3_text)))
+
+def test_out_of_order():
+    dataset = _parse_gff3("##gff-version 3\n"
+                          "chr1\tt\texon\t10\t20\t.\t+\t.\tParent=T1,T2\n"
+                          "chr1\tt\tmRNA\t10\t90\t.\t+\t.\tID=T1;Parent=G1\n"
+                          "chr1\tt\tgene\t10\t90\t.\t+\t.\tID=G1\n"
+                          "chr1\tt\tmRNA\t10\t50\t.\t+\t.\tID=T2;Parent=G1\n")
+    _check_dataset(dataset)
+    gene, = dataset.fetch_genes_by_id("G1")
+    assert [t.attrs.get_attr_value1("ID") for t in gene.children] == ["T1", "T2"]
+    exon = dataset.records[0]
+    assert exon.parent is dataset.fetch_transcripts_by_id("T1")[0]
+    assert exon in dataset.fetch_transcripts_by_id("T2")[0].children
+
+def test_missing_parent():
+    with pytest.raises(GxfGenieParseError, match="test.gff3:3: Parent `T2' not found for exon record"):
+        _parse_gff3("##gff-version 3\n"
+                    "chr1\tt\tmRNA\t10\t90\t.\t+\t.\tID=T1\n"
+                    "chr1\tt\texon\t10\t20\t.\t+\t.\tParent=T2\n")
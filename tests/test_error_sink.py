@@ -0,0 +1,98 @@
+"""
+Error sink tests
+"""
+import pytest
+from support import get_test_input_file, get_test_output_file
+from gxfgenie import gxf_parser_factory, fileops
+from gxfgenie.gtf_parser import GtfParser
+from gxfgenie.gxf_parallel import GxfParallelParser
+from gxfgenie.gxf_error_sink import GxfErrorSink
+from gxfgenie.gxf_parse_stats import GxfParseStats
+from gxfgenie.errors import GxfGenieParseError, GxfGenieFormatError
+
+_bad_gtf_lines = (
+    'chr1\tHAVANA\texon\tbogus\t70008\t.\t+\t.\tgene_id "G1"; transcript_id "T1";',
+    'chr1\tHAVANA\texon\t69091',
+    'chr1\tHAVANA\texon\t69091\t70008\t.\t%\t.\tgene_id "G1"; transcript_id "T1";',
+    'chr1\tHAVANA\texon\t70008\t69091\t.\t+\t.\tgene_id "G1"; transcript_id "T1";',
+)
+
+def _make_bad_gtf(request):
+    """insert bad lines into a GTF file, returning the file, good file, and
+    line numbers of the bad lines"""
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    bad_gtf = get_test_output_file(request, ".gtf")
+    with open(in_gtf) as fh:
+        lines = fh.read().splitlines()
+    bad_line_numbers = []
+    out_lines = []
+    for i, line in enumerate(lines):
+        if (i % 50) == 10:
+            out_lines.append(_bad_gtf_lines[len(bad_line_numbers) % len(_bad_gtf_lines)])
+            bad_line_numbers.append(len(out_lines))
+        out_lines.append(line)
+    with open(bad_gtf, "w") as fh:
+        fh.write("\n".join(out_lines) + "\n")
+    return bad_gtf, in_gtf, bad_line_numbers
+
+def _strs(recs):
+    return [str(r) for r in recs]
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_collect(request, workers):
+    bad_gtf, good_gtf, bad_line_numbers = _make_bad_gtf(request)
+    sink = GxfErrorSink()
+    if workers is None:
+        parser = gxf_parser_factory(bad_gtf, error_sink=sink)
+    else:
+        parser = GxfParallelParser(GtfParser, bad_gtf, workers=workers, chunk_size=20000,
+                                   parser_opts={"error_sink": sink})
+    recs = list(parser.parse())
+    assert _strs(recs) == _strs(gxf_parser_factory(good_gtf).parse())
+    assert sink.count == len(bad_line_numbers)
+    assert [e.line_number for e in sink.errors] == bad_line_numbers
+    assert all(e.gxf_file == bad_gtf for e in sink.errors)
+    assert all(isinstance(e.__cause__, Exception) for e in sink.errors)
+    assert isinstance(sink.errors[1].__cause__, GxfGenieFormatError)
+
+def test_callback_reject_file(request):
+    bad_gtf, _, bad_line_numbers = _make_bad_gtf(request)
+    reject_file = get_test_output_file(request, ".reject.gtf.gz")
+    called = []
+    with GxfErrorSink(keep=False, callback=lambda e, line: called.append((e.line_number, line)),
+                      reject_file=reject_file) as sink:
+        list(gxf_parser_factory(bad_gtf, error_sink=sink).parse())
+    assert sink.errors is None
+    assert [ln for ln, _ in called] == bad_line_numbers
+    with fileops.opengz(reject_file) as fh:
+        reject_lines = fh.read().splitlines()
+    assert reject_lines[1::2] == [line for _, line in called]
+    assert reject_lines[0].startswith(f"# {bad_gtf}:{bad_line_numbers[0]}: ")
+
+def test_max_errors(request):
+    bad_gtf, _, bad_line_numbers = _make_bad_gtf(request)
+    sink = GxfErrorSink(max_errors=2)
+    with pytest.raises(GxfGenieParseError, match=r"maximum number of errors exceeded \(2\)") as exinfo:
+        list(gxf_parser_factory(bad_gtf, error_sink=sink).parse())
+    assert exinfo.value.line_number == bad_line_numbers[2]
+    assert exinfo.value.__cause__ is sink.errors[-1]
+
+def test_stats(request):
+    bad_gtf, _, bad_line_numbers = _make_bad_gtf(request)
+    stats = GxfParseStats()
+    sink = GxfErrorSink()
+    recs = list(gxf_parser_factory(bad_gtf, error_sink=sink, stats=stats).parse())
+    assert stats.errors == len(bad_line_numbers)
+    assert stats.records == sum(1 for r in recs if hasattr(r, "feature"))
+    assert stats.lines == stats.records + stats.metas + stats.ignored + stats.filtered + stats.errors
+
+@pytest.mark.parametrize("setname", ["gff3_bad/errCases1.gff3", "gff3_bad/bogusQuotes.gff3",
+                                     "gtf_bad/bad-phase.gtf", "gtf_bad/short-line.gtf"])
+def test_bad_files(request, setname):
+    in_gxf = get_test_input_file(request, setname)
+    with pytest.raises(GxfGenieParseError) as exinfo:
+        list(gxf_parser_factory(in_gxf).parse())
+    sink = GxfErrorSink()
+    list(gxf_parser_factory(in_gxf, error_sink=sink).parse())
+    assert sink.errors[0].line_number == exinfo.value.line_number
+    assert str(sink.errors[0]) == str(exinfo.value)
@@ -0,0 +1,38 @@
+"""
+File operations tests
+"""
+import pytest
+from support import get_test_input_file, get_test_output_file, diff_results_expected
+from gxfgenie import fileops, gxf_parser_factory
+
+
+@pytest.mark.parametrize("ext", [".gz", ".bz2"])
+@pytest.mark.parametrize("write_inprocess", [True, False], ids=["write_inproc", "write_subproc"])
+@pytest.mark.parametrize("read_inprocess", [True, False], ids=["read_inproc", "read_subproc"])
+def test_compress_roundtrip(ext, write_inprocess, read_inprocess, request):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    out_gtf = get_test_output_file(request, ".gtf" + ext)
+    with open(in_gtf) as fh:
+        data = fh.read()
+    with fileops.opengz(out_gtf, "w", inprocess=write_inprocess) as fh:
+        fh.write(data)
+    with fileops.opengz(out_gtf, inprocess=read_inprocess) as fh:
+        assert fh.read() == data
+
+def test_parse_compressed(request):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    in_gz = get_test_output_file(request, ".in.gtf.gz")
+    out_gtf = get_test_output_file(request, ".gtf")
+    with open(in_gtf, "rb") as in_fh, fileops.opengz(in_gz, "wb", inprocess=True) as out_fh:
+        out_fh.write(in_fh.read())
+    with open(out_gtf, 'w') as fh:
+        for rec in gxf_parser_factory(in_gz).parse():
+            print(str(rec), file=fh)
+    diff_results_expected(request, ".gtf", basename="test_gtf_parse.py::test_good[gencode_set1]")
+
+def test_inprocess_unbuffered(request):
+    out_gz = get_test_output_file(request, ".bin.gz")
+    with fileops.opengz(out_gz, "wb", buffering=0, inprocess=True) as fh:
+        fh.write(b"chr1\n")
+    with fileops.opengz(out_gz, "rb", buffering=0, inprocess=True) as fh:
+        assert fh.read() == b"chr1\n"
@@ -6,6 +6,8 @@ from conftest import gxf_good_test_sets
 from support import (get_test_input_file, get_test_output_file, diff_results_expected, gff3_to_bed_compare, safe_test_id, get_expect_error_ids,
                      CheckRaisesCauses, gff3_ucsc_validate)
 from gxfgenie import gxf_parser_factory
+from gxfgenie.gff3_parser import Gff3Parser, Gff3Record
+from gxfgenie.gxf_parallel import GxfParallelParser
 from gxfgenie.errors import GxfGenieFormatError, GxfGenieParseError
 
 gff3_good_test_sets = [
@@ -47,6 +49,63 @@ def test_good(setname, request):
     if setname not in _skip_gff3ToGenePred_check:
         gff3_ucsc_validate(request, out_gff3)
 
+@pytest.mark.parametrize("setname",
+                         ["gencode/v42", "gff3_good/ncbiProblems"],
+                         ids=safe_test_id)
+def test_parallel(setname, request):
+    # small chunks to force multiple chunks
+    in_gff3 = get_test_input_file(request, setname + ".gff3")
+    out_gff3 = get_test_output_file(request, ".gff3")
+    parser = GxfParallelParser(Gff3Parser, in_gff3, workers=2, chunk_size=4096)
+    recs = list(parser.parse())
+    with open(out_gff3, 'w') as fh:
+        for rec in recs:
+            print(str(rec), file=fh)
+    diff_results_expected(request, ".gff3", basename=f"test_gff3_parse.py::test_good[{safe_test_id(setname)}]")
+    assert [r.line_number for r in recs] == [r.line_number for r in Gff3Parser(in_gff3).parse()]
+
+@pytest.mark.parametrize("lazy_attrs", [False, True])
+def test_parallel_metas(request, lazy_attrs):
+    # metadata between records of a chunk is returned in order
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    with open(in_gff3) as fh:
+        lines = fh.readlines()
+    out_gff3 = get_test_output_file(request, ".gff3")
+    with open(out_gff3, "w") as fh:
+        for i, line in enumerate(lines):
+            fh.write(line)
+            if (i % 97) == 50:
+                fh.write("##sequence-region chr1 1 1000000\n")
+    parser = GxfParallelParser(Gff3Parser, out_gff3, workers=2, chunk_size=4096,
+                               parser_opts={"lazy_attrs": lazy_attrs})
+    recs = list(parser.parse())
+    expect = list(Gff3Parser(out_gff3, lazy_attrs=lazy_attrs).parse())
+    assert [(type(r), r.line_number) for r in recs] == [(type(r), r.line_number) for r in expect]
+    assert [r.value for r in recs if not isinstance(r, Gff3Record)] == [r.value for r in expect
+                                                                        if not isinstance(r, Gff3Record)]
+    recs = [r for r in recs if isinstance(r, Gff3Record)]
+    expect = [r for r in expect if isinstance(r, Gff3Record)]
+    assert [r.attrs_parsed for r in recs] == [r.attrs_parsed for r in expect]
+    assert [str(r) for r in recs] == [str(r) for r in expect]
+    assert [r.attrs for r in recs] == [r.attrs for r in expect]
+
+def test_lazy_attrs(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    with open(in_gff3) as fh:
+        in_lines = fh.read().split("\n")
+    lazy_recs = [r for r in Gff3Parser(in_gff3, lazy_attrs=True).parse() if isinstance(r, Gff3Record)]
+    # never accessed are written unchanged
+    for rec in lazy_recs:
+        assert not rec.attrs_parsed
+        assert rec.attrs_str == in_lines[rec.line_number - 1].split("\t")[8]
+        assert str(rec) == in_lines[rec.line_number - 1]
+    recs = [r for r in Gff3Parser(in_gff3).parse() if isinstance(r, Gff3Record)]
+    for lazy_rec, rec in zip(lazy_recs, recs, strict=True):
+        assert lazy_rec.attrs == rec.attrs
+        assert lazy_rec.attrs_parsed
+        assert lazy_rec.attrs_str is None
+        assert str(lazy_rec) == str(rec)
+
 
 error_test_set = [
     ["gff3_bad/bogusQuotes", [
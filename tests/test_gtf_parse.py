@@ -1,16 +1,21 @@
 """
 GTF tests
 """
+import io
 import pytest
 from conftest import gxf_good_test_sets
 from support import get_test_input_file, get_test_output_file, diff_results_expected, gtf_to_bed_compare, safe_test_id, get_expect_error_ids, CheckRaisesCauses
 from gxfgenie import gxf_parser_factory
+from gxfgenie.gtf_parser import GtfParser, GtfRecord
+from gxfgenie.gxf_filter import GxfFilter
+from gxfgenie.gxf_parallel import GxfParallelParser
 from gxfgenie.errors import GxfGenieFormatError, GxfGenieParseError
 
 gtf_good_test_sets = [
     "gencode/v19",
     "gtf_good/B16.stringtie.head",
     "gtf_good/ensembl_grch37.head",
+    "gtf_good/quotedSeps",
     "gtf_good/refseq.ucsc.small",
 ]
 
@@ -27,8 +32,113 @@ def test_good(setname, request):
     diff_results_expected(request, ".gtf")
     gtf_to_bed_compare(request, in_gtf, out_gtf)
 
+def test_small_blocks(request):
+    # block size that doesn't align with lines
+    setname = "gencode/set1"
+    in_gtf = get_test_input_file(request, setname + ".gtf")
+    out_gtf = get_test_output_file(request, ".gtf")
+    parser = GtfParser(in_gtf, block_size=37)
+    with open(out_gtf, 'w') as fh:
+        for rec in parser.parse():
+            print(str(rec), file=fh)
+    diff_results_expected(request, ".gtf", basename=f"test_gtf_parse.py::test_good[{safe_test_id(setname)}]")
+    assert parser.line_number == 905
+
+def _parse_results(parser, **parse_args):
+    return [(str(r), r.line_number) for r in parser.parse(**parse_args)]
+
+@pytest.mark.parametrize("block_size", [37, 4096])
+def test_mmap(block_size, request):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    expect = _parse_results(GtfParser(in_gtf, use_mmap=False))
+    parser = GtfParser(in_gtf, use_mmap=True, block_size=block_size)
+    assert parser.mm is not None
+    assert _parse_results(parser) == expect
+    assert parser.line_number == 905
+    expect = _parse_results(GtfParser(in_gtf, use_mmap=False), features={"gene"})
+    assert _parse_results(GtfParser(in_gtf, use_mmap=True), features={"gene"}) == expect
+
+@pytest.mark.parametrize("newline", ["\r\n", "\n"], ids=["crlf", "lf"])
+def test_mmap_line_ends(newline, request):
+    # CR-LF line ends, no newline at the end of the file, and empty file
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    with open(in_gtf) as fh:
+        lines = fh.read().splitlines()
+    out_gtf = get_test_output_file(request, ".gtf")
+    with open(out_gtf, "w", newline="") as fh:
+        fh.write(newline.join(lines))
+    expect = _parse_results(GtfParser(in_gtf))
+    assert _parse_results(GtfParser(out_gtf, use_mmap=True)) == expect
+    assert _parse_results(GtfParser(out_gtf, use_mmap=True), features={"gene", "CDS"}) == \
+        [r for r in expect if r[0].startswith("#") or (r[0].split("\t")[2] in ("gene", "CDS"))]
+    with open(out_gtf, "w"):
+        pass
+    assert _parse_results(GtfParser(out_gtf, use_mmap=True)) == []
+
+@pytest.mark.parametrize("setname",
+                         ["gencode/set1", "gtf_good/refseq.ucsc.small"],
+                         ids=safe_test_id)
+def test_parallel(setname, request):
+    # small chunks to force multiple chunks
+    in_gtf = get_test_input_file(request, setname + ".gtf")
+    out_gtf = get_test_output_file(request, ".gtf")
+    parser = GxfParallelParser(GtfParser, in_gtf, workers=2, chunk_size=4096)
+    recs = list(parser.parse())
+    with open(out_gtf, 'w') as fh:
+        for rec in recs:
+            print(str(rec), file=fh)
+    diff_results_expected(request, ".gtf", basename=f"test_gtf_parse.py::test_good[{safe_test_id(setname)}]")
+    assert [r.line_number for r in recs] == [r.line_number for r in GtfParser(in_gtf).parse()]
+
+@pytest.mark.parametrize("filter_args",
+                         [dict(features={"CDS", "exon"}),
+                          dict(seqnames={"chr21"}, features={"CDS"}),
+                          dict(region=("chr1", 65000, 70000)),
+                          dict(region=("chr1", 65000, 70000), features={"gene"})],
+                         ids=["features", "seqnames", "region", "region_feature"])
+def test_filter(filter_args, request):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    gxf_filter = GxfFilter(**filter_args)
+    expect = [str(r) for r in GtfParser(in_gtf).parse()
+              if isinstance(r, GtfRecord) and gxf_filter.accept_record(r)]
+    assert len(expect) > 0
+    got = [str(r) for r in GtfParser(in_gtf).parse(**filter_args) if isinstance(r, GtfRecord)]
+    assert got == expect
+    got = [str(r) for r in GtfParser(in_gtf, use_mmap=False).parse(**filter_args) if isinstance(r, GtfRecord)]
+    assert got == expect
+    got = [str(r) for r in GxfParallelParser(GtfParser, in_gtf, workers=2, chunk_size=4096).parse(**filter_args)
+           if isinstance(r, GtfRecord)]
+    assert got == expect
+
+def test_filter_attrs(request):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    attr_names = {"gene_id", "transcript_id"}
+    for rec in GtfParser(in_gtf).parse(features={"exon"}, attr_names=attr_names):
+        if isinstance(rec, GtfRecord):
+            assert set(rec.attrs.keys()) == attr_names
+
+def test_embedded_quotes():
+    gtf_text = ('chr1\tt\tgene\t10\t20\t.\t+\t.\tgene_id "a"; note "x "y" z";\n'
+                'chr1\tt\tgene\t30\t40\t.\t+\t.\tgene_id "b"; product "5" UTR; "a"" ; level 2\n')
+    recs = list(GtfParser("test.gtf", gxf_fh=io.StringIO(gtf_text)).parse())
+    assert [(n, a.value) for n, a in recs[0].attrs.items()] == [("gene_id", "a"), ("note", 'x "y" z')]
+    assert [(n, a.value) for n, a in recs[1].attrs.items()] == [("gene_id", "b"), ("product", '5" UTR; "a"'),
+                                                                ("level", "2")]
+    assert [(n, a.value) for n, a in GtfRecord.parse_attrs_str('note ""x" y";').items()] == [("note", '"x" y')]
+
+@pytest.mark.parametrize("attrs_str", ['gene_id "a"; note "";', 'note ""', 'note "" ; level 2;'])
+def test_empty_value(attrs_str):
+    with pytest.raises(GxfGenieFormatError, match="^Can't parse attribute=value: `note \""):
+        GtfRecord.parse_attrs_str(attrs_str)
+
 
 error_test_set = [
+    ["gtf_bad/bad-attr", [
+        (GxfGenieParseError,
+         r""".*input/gtf_bad/bad-attr.gtf:2: error parsing GxF record.*"""),
+        (GxfGenieFormatError,
+         r"""Can't parse attribute=value: `level two'"""),]
+     ],
     ["gtf_bad/bad-end", [
         (GxfGenieParseError,
          r""".*input/gtf_bad/bad-end.gtf:3: error parsing GxF record.*"""),
@@ -100,3 +210,21 @@ def test_error(setname, expect_spec, request):
     with CheckRaisesCauses(setname, expect_spec):
         for _ in parser.parse():
             pass
+
+def test_parallel_error(request):
+    setname, expect_spec = error_test_set[1]
+    in_gtf = get_test_input_file(request, setname + ".gtf")
+    parser = GxfParallelParser(GtfParser, in_gtf, workers=2, chunk_size=64)
+    with CheckRaisesCauses(setname, expect_spec):
+        for _ in parser.parse():
+            pass
+
+def test_lazy_attrs_error(request):
+    setname, expect_spec = error_test_set[0]
+    in_gtf = get_test_input_file(request, setname + ".gtf")
+    recs = list(GtfParser(in_gtf, lazy_attrs=True).parse())
+    assert recs[0].attrs.find_attr_value1("gene_name") == "OR4F5"
+    expect_spec = [(GxfGenieParseError, r""".*input/gtf_bad/bad-attr.gtf:2: error parsing GxF attributes.*"""),
+                   expect_spec[1]]
+    with CheckRaisesCauses(setname, expect_spec):
+        recs[1].attrs
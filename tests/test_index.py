@@ -0,0 +1,62 @@
+"""
+Indexed access tests
+"""
+import gzip
+import pytest
+from support import get_test_input_file, get_test_output_file
+from gxfgenie import gxf_parser_factory
+from gxfgenie.errors import GxfGenieParseError
+from gxfgenie.gxf_record import GxfRecord, GxfMeta
+from gxfgenie.bgzf import open_bgzf_writer, is_bgzf
+from gxfgenie.gxf_index import GxfIndexedReader, gxf_index_build
+
+
+def _sort_lines(in_gxf):
+    with open(in_gxf) as fh:
+        lines = fh.readlines()
+    headers = [line for line in lines if line.startswith("#")]
+    recs = [line for line in lines if not (line.startswith("#") or (len(line.strip()) == 0))]
+    recs.sort(key=lambda line: (line.split("\t")[0], int(line.split("\t")[3])))
+    return headers + recs
+
+def _write_sorted(request, setname, ext, compress):
+    lines = _sort_lines(get_test_input_file(request, setname + ext))
+    sorted_gxf = get_test_output_file(request, ext + (".gz" if compress else ""))
+    with (open_bgzf_writer(sorted_gxf) if compress else open(sorted_gxf, "w")) as fh:
+        fh.writelines(lines)
+    return sorted_gxf
+
+
+_test_regions = [("chr1", 1, 10000000),
+                 ("chr1", 69000, 69100),
+                 ("chr1", 900000, 1500000),
+                 ("chr1", 2000000000, 2000000001),
+                 ("chrX", 1, 300000000),
+                 ("chrY", 10000000, 20000000),
+                 ("chrNone", 1, 1000)]
+
+@pytest.mark.parametrize("setname, ext", [("gencode/set1", ".gtf"), ("gencode/v42", ".gff3")],
+                         ids=["set1_gtf", "v42_gff3"])
+@pytest.mark.parametrize("compress", [False, True], ids=["plain", "bgzf"])
+def test_fetch(setname, ext, compress, request):
+    sorted_gxf = _write_sorted(request, setname, ext, compress)
+    if compress:
+        assert is_bgzf(sorted_gxf)
+        with gzip.open(sorted_gxf, "rt") as fh:
+            assert fh.readlines() == _sort_lines(get_test_input_file(request, setname + ext))
+    gxf_index_build(sorted_gxf)
+    recs = [r for r in gxf_parser_factory(sorted_gxf).parse() if isinstance(r, GxfRecord)]
+    metas = [m.value for m in gxf_parser_factory(sorted_gxf).parse() if isinstance(m, GxfMeta)]
+    with GxfIndexedReader(sorted_gxf) as reader:
+        assert len(metas) > 0
+        assert [m.value for m in reader.read_header_metas()] == metas
+        for seqname, start, end in _test_regions:
+            expect = [(r.line_number, str(r)) for r in recs
+                      if (r.seqname == seqname) and (r.start <= end) and (r.end >= start)]
+            got = [(r.line_number, str(r)) for r in reader.fetch(seqname, start, end)]
+            assert got == expect
+
+def test_unsorted(request):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    with pytest.raises(GxfGenieParseError, match="file is not sorted"):
+        gxf_index_build(in_gtf, get_test_output_file(request, ".gxi"))
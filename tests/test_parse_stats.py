@@ -0,0 +1,70 @@
+"""
+Parse statistics tests
+"""
+import json
+import pytest
+from support import get_test_input_file
+from gxfgenie import gxf_parser_factory
+from gxfgenie.gxf_parse_stats import GxfParseStats, PARSE_STAGES
+
+
+def _parse(gxf_file, stats, **parse_args):
+    return list(gxf_parser_factory(gxf_file, stats=stats, **parse_args).parse())
+
+def _check_counts(stats, recs):
+    metas = [r for r in recs if not hasattr(r, "feature")]
+    records = [r for r in recs if hasattr(r, "feature")]
+    assert stats.metas == len(metas)
+    assert stats.records == len(records)
+    assert {f: s.records for f, s in stats.features.items()} == {f: sum(1 for r in records if r.feature == f)
+                                                                 for f in {r.feature for r in records}}
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_stats(request, ext):
+    in_gxf = get_test_input_file(request, "gencode/set1" + ext)
+    stats = GxfParseStats()
+    recs = _parse(in_gxf, stats)
+    assert [str(r) for r in recs] == [str(r) for r in _parse(in_gxf, None)]
+    _check_counts(stats, recs)
+    assert stats.lines == stats.records + stats.metas + stats.ignored + stats.filtered
+    assert stats.features["exon"].attrs > stats.features["exon"].records
+    assert all(stats.nsecs[stage] >= 0 for stage in PARSE_STAGES)
+    assert stats.nsecs["attrs"] > 0
+    json.dumps(stats.to_dict())
+    assert "exon" in stats.format()
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_filtered(request, use_mmap):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    stats = GxfParseStats()
+    recs = list(gxf_parser_factory(in_gff3, stats=stats, use_mmap=use_mmap).parse(features={"gene"}))
+    _check_counts(stats, recs)
+    assert set(stats.features) == {"gene"}
+    assert stats.lines == stats.records + stats.metas + stats.ignored + stats.filtered
+
+def test_lazy_attrs(request):
+    stats = GxfParseStats()
+    _parse(get_test_input_file(request, "gencode/set1.gtf"), stats, lazy_attrs=True)
+    assert stats.features["exon"].attrs == 0
+
+def test_callback(request):
+    calls = []
+    stats = GxfParseStats(callback=lambda s: calls.append(s.records), callback_interval=100)
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    _parse(in_gtf, stats)
+    assert calls[:3] == [100, 200, 300]
+    assert calls[-1] == stats.records
+    # accumulates over files
+    num_records = stats.records
+    _parse(in_gtf, stats)
+    assert calls[-1] == stats.records == 2 * num_records
+
+def test_parallel(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    stats = GxfParseStats()
+    recs = list(gxf_parser_factory(in_gff3, stats=stats, workers=2).parse())
+    _check_counts(stats, recs)
+    serial_stats = GxfParseStats()
+    _parse(in_gff3, serial_stats)
+    assert stats.to_dict()["features"].keys() == serial_stats.to_dict()["features"].keys()
+    assert stats.lines == serial_stats.lines
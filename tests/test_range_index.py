@@ -0,0 +1,103 @@
+"""
+Range index tests
+"""
+import random
+import pytest
+from support import get_test_input_file
+from gxfgenie import gxf_parser_factory
+from gxfgenie.errors import GxfGenieError
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.gtf_parser import GtfRecord, GtfAttrs
+from gxfgenie.range_index import RangeIndex
+
+
+@pytest.fixture(scope="module")
+def set1_records(request):
+    parser = gxf_parser_factory(get_test_input_file(request, "gencode/set1.gtf"))
+    return [rec for rec in parser.parse() if isinstance(rec, GxfRecord)]
+
+def _brute_overlapping(records, seqname, start, end, strand=None):
+    return sorted(i for i, rec in enumerate(records)
+                  if ((rec.seqname == seqname) and (rec.start <= end) and (rec.end >= start)
+                      and ((strand is None) or (rec.strand == strand))))
+
+def _random_regions(records, count):
+    rand = random.Random(42)
+    regions = []
+    for _ in range(count):
+        rec = rand.choice(records)
+        start = max(1, rec.start + rand.randint(-50000, 50000))
+        regions.append((rec.seqname, start, start + rand.randint(0, 20000), rand.choice((None, '+', '-'))))
+    return regions + [("chrNone", 1, 1000000, None), (records[0].seqname, 1, 1, None)]
+
+def test_overlapping(set1_records):
+    range_index = RangeIndex(set1_records)
+    for seqname, start, end, strand in _random_regions(set1_records, 500):
+        rec_idxs = range_index.overlapping_indices(seqname, start, end, strand=strand)
+        assert sorted(rec_idxs) == _brute_overlapping(set1_records, seqname, start, end, strand)
+        assert list(range_index.iter_overlapping(seqname, start, end, strand=strand)) == [set1_records[i] for i in rec_idxs]
+
+def test_exact_bounds(set1_records):
+    range_index = RangeIndex(set1_records)
+    for irec, rec in enumerate(set1_records[:100]):
+        assert irec in range_index.overlapping_indices(rec.seqname, rec.end, rec.end)
+        assert irec in range_index.overlapping_indices(rec.seqname, rec.start, rec.start)
+        assert irec not in range_index.overlapping_indices(rec.seqname, rec.end + 1, rec.end + 10)
+        if rec.start > 1:
+            assert irec not in range_index.overlapping_indices(rec.seqname, 1, rec.start - 1)
+
+def test_batch(set1_records):
+    range_index = RangeIndex()
+    for rec in set1_records:
+        range_index.add_record(rec)
+    regions = _random_regions(set1_records, 500)
+    results = range_index.overlapping_indices_batch(regions)
+    assert len(results) == len(regions)
+    for region, rec_idxs in zip(regions, results):
+        assert sorted(rec_idxs) == _brute_overlapping(set1_records, *region)
+    assert range_index.overlapping_indices_batch([r[0:3] for r in regions[0:10]]) == \
+        [range_index.overlapping_indices(*r[0:3]) for r in regions[0:10]]
+
+def test_add_after_query(set1_records):
+    range_index = RangeIndex(set1_records[0:10])
+    rec = set1_records[20]
+    assert 10 not in range_index.overlapping_indices(rec.seqname, rec.start, rec.end)
+    range_index.add_record(rec)
+    assert 10 in range_index.overlapping_indices(rec.seqname, rec.start, rec.end)
+
+def _join_pairs(results):
+    return [(iq, irec) for iq, rec_idxs in enumerate(results) for irec in sorted(rec_idxs)]
+
+def test_overlap_join(set1_records):
+    np = pytest.importorskip("numpy")
+    range_index = RangeIndex(set1_records)
+    regions = _random_regions(set1_records, 2000)
+    seqnames, starts, ends, strands = zip(*regions)
+    query_idxs, rec_idxs = range_index.overlap_join(seqnames, np.array(starts), np.array(ends))
+    assert np.all(np.diff(query_idxs) >= 0)
+    pairs = sorted(zip(query_idxs.tolist(), rec_idxs.tolist()))
+    assert pairs == _join_pairs(range_index.overlapping_indices_batch([r[0:3] for r in regions]))
+
+    query_idxs, rec_idxs = range_index.overlap_join(seqnames, starts, ends, strands)
+    pairs = sorted(zip(query_idxs.tolist(), rec_idxs.tolist()))
+    assert pairs == _join_pairs(range_index.overlapping_indices_batch(regions))
+
+def test_overlap_join_query_order():
+    pytest.importorskip("numpy")
+    # one seqname and length class, with queries not in start order
+    records = [GtfRecord("chr1", "t", "exon", start, start, None, '+', None, GtfAttrs())
+               for start in (105, 205, 305)]
+    range_index = RangeIndex(records)
+    query_idxs, rec_idxs = range_index.overlap_join(["chr1"] * 3, [305, 205, 105], [305, 205, 105])
+    assert query_idxs.tolist() == [0, 1, 2]
+    assert rec_idxs.tolist() == [2, 1, 0]
+
+def test_overlap_join_empty(set1_records):
+    np = pytest.importorskip("numpy")
+    range_index = RangeIndex(set1_records)
+    query_idxs, rec_idxs = range_index.overlap_join(["chrNone"], [1], [1000000])
+    assert (len(query_idxs), len(rec_idxs)) == (0, 0)
+    query_idxs, rec_idxs = range_index.overlap_join(np.array([], dtype=str), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    assert len(query_idxs) == 0
+    with pytest.raises(GxfGenieError, match="same length"):
+        range_index.overlap_join(["chr1", "chr1"], [1], [10])
@@ -0,0 +1,88 @@
+"""
+External sort tests
+"""
+import os
+import gzip
+import pytest
+from support import get_test_input_file, get_test_output_file, get_test_output_dir
+from gxfgenie import gxf_parser_factory
+from gxfgenie import gxf_sort as gxf_sort_mod
+from gxfgenie.gxf_sort import GxfSorter, gxf_sort, DEFAULT_FEATURE_RANKS
+from gxfgenie.gxf_record import GxfRecord
+from gxfgenie.gxf_index import GxfIndexedReader, gxf_index_build
+from gxfgenie.bgzf import is_bgzf
+from gxfgenie.errors import GxfGenieError
+
+
+def _expected_lines(in_gxf, feature_ranks):
+    # sort writes the attributes as read
+    recs = list(gxf_parser_factory(in_gxf, lazy_attrs=True).parse())
+    metas = [str(r) + "\n" for r in recs if (not isinstance(r, GxfRecord)) and (r.value != "#")]
+    other_rank = max(feature_ranks.values(), default=-1) + 1
+    recs = sorted((r for r in recs if isinstance(r, GxfRecord)),
+                  key=lambda r: (r.seqname, r.start, feature_ranks.get(r.feature, other_rank)))
+    return metas + [str(r) + "\n" for r in recs]
+
+def _tmp_dir(request):
+    tmp_dir = os.path.join(get_test_output_dir(request), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return tmp_dir
+
+@pytest.mark.parametrize("setname, ext", [("gencode/set1", ".gtf"), ("gencode/v42", ".gff3"),
+                                          ("gff3_good/discontinuous", ".gff3")],
+                         ids=["set1_gtf", "v42_gff3", "discontinuous_gff3"])
+@pytest.mark.parametrize("memory_limit", [None, 4000], ids=["memory", "runs"])
+def test_sort(request, setname, ext, memory_limit):
+    in_gxf = get_test_input_file(request, setname + ext)
+    out_gxf = get_test_output_file(request, ext)
+    tmp_dir = _tmp_dir(request)
+    opts = {} if memory_limit is None else {"memory_limit": memory_limit}
+    with GxfSorter(tmp_dir=tmp_dir, **opts) as sorter:
+        sorter.add_all(gxf_parser_factory(in_gxf, lazy_attrs=True).parse())
+        assert (sorter.num_runs > 1) == (memory_limit is not None)
+        sorter.write(out_gxf)
+    assert os.listdir(tmp_dir) == []
+    with open(out_gxf) as fh:
+        assert fh.readlines() == _expected_lines(in_gxf, DEFAULT_FEATURE_RANKS)
+
+def test_multi_pass(request, monkeypatch):
+    monkeypatch.setattr(gxf_sort_mod, "MAX_MERGE_RUNS", 3)
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    out_gff3 = get_test_output_file(request, ".gff3")
+    tmp_dir = _tmp_dir(request)
+    assert gxf_sort(in_gff3, out_gff3, memory_limit=10000, tmp_dir=tmp_dir) == 2204
+    assert os.listdir(tmp_dir) == []
+    with open(out_gff3) as fh:
+        assert fh.readlines() == _expected_lines(in_gff3, DEFAULT_FEATURE_RANKS)
+
+def test_position_only(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    out_gff3 = get_test_output_file(request, ".gff3")
+    gxf_sort(in_gff3, out_gff3, memory_limit=20000, feature_ranks={})
+    with open(out_gff3) as fh:
+        assert fh.readlines() == _expected_lines(in_gff3, {})
+
+def test_parent_order(request):
+    in_gff3 = get_test_input_file(request, "gencode/v42.gff3")
+    out_gff3 = get_test_output_file(request, ".gff3")
+    gxf_sort(in_gff3, out_gff3, memory_limit=20000, feature_ranks={"exon": 0, "transcript": 1, "gene": 2})
+    recs = [r for r in gxf_parser_factory(out_gff3).parse() if isinstance(r, GxfRecord)]
+    for prev, rec in zip(recs[:-1], recs[1:]):
+        if (prev.seqname, prev.start) == (rec.seqname, rec.start):
+            assert not ((prev.feature == "gene") and (rec.feature in ("transcript", "exon")))
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_bgzf_index(request, ext):
+    in_gxf = get_test_input_file(request, "gencode/set1" + ext)
+    out_gxf = get_test_output_file(request, ext + ".gz")
+    gxf_sort(in_gxf, out_gxf, memory_limit=20000)
+    assert is_bgzf(out_gxf)
+    with gzip.open(out_gxf, "rt") as fh:
+        assert fh.readlines() == _expected_lines(in_gxf, DEFAULT_FEATURE_RANKS)
+    gxf_index_build(out_gxf)
+    with GxfIndexedReader(out_gxf) as reader:
+        assert len(list(reader.fetch("chr1", 1, 1000000))) > 0
+
+def test_format_mismatch(request):
+    with pytest.raises(GxfGenieError, match="same format"):
+        gxf_sort(get_test_input_file(request, "gencode/set1.gtf"), get_test_output_file(request, ".gff3"))
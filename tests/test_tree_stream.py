@@ -0,0 +1,186 @@
+"""
+Streaming feature tree assembly tests
+"""
+import io
+import os
+import pytest
+from support import get_test_input_file, get_test_output_dir
+from gxfgenie import gxf_parser_factory, gxf_dataset_load, gxf_tree_stream_class
+from gxfgenie.errors import GxfGenieError, GxfGenieParseError
+from gxfgenie.gff3_parser import Gff3Parser
+from gxfgenie.gtf_parser import GtfParser
+from gxfgenie.gff3_tree_stream import Gff3TreeStream
+from gxfgenie.gtf_tree_stream import GtfTreeStream
+
+
+def _dump_tree(rec, lines, depth=0):
+    lines.append(depth * "  " + str(rec))
+    for child in rec.children:
+        _dump_tree(child, lines, depth + 1)
+    return lines
+
+def _dump_trees(roots):
+    return [_dump_tree(root, []) for root in sorted(roots, key=lambda r: r.line_number)]
+
+def _stream_gff3(gff3_text, sorted_input=True):
+    stream = Gff3TreeStream(sorted_input=sorted_input)
+    return stream, list(stream.iter_trees(Gff3Parser("test.gff3", gxf_fh=io.StringIO(gff3_text))))
+
+
+_gff3_sets = ["gencode/set1.gff3", "gencode/v42.gff3", "gencode/v27.par.gff3", "gff3_good/discontinuous.gff3",
+              "gff3_good/hprc.gff3", "gff3_good/ncbiSegments.gff3", "gff3_good/noId.gff3",
+              "gff3_good/transcriptOnly.gff3", "gff3_bad/dupIdDiffParents.gff3"]
+
+@pytest.mark.parametrize("setname", _gff3_sets, ids=[s.replace('/', '_') for s in _gff3_sets])
+@pytest.mark.parametrize("sorted_input", [True, False], ids=["sorted", "unsorted"])
+def test_gff3_trees(request, setname, sorted_input):
+    in_gff3 = get_test_input_file(request, setname)
+    stream = Gff3TreeStream(sorted_input=sorted_input)
+    roots = list(stream.iter_trees(gxf_parser_factory(in_gff3)))
+    dataset = gxf_dataset_load(in_gff3)
+    assert _dump_trees(roots) == _dump_trees(dataset.iter_roots())
+    assert [str(m) for m in stream.metas] == [str(m) for m in dataset.metas if m.value != "#"]
+
+def test_gff3_incremental(request):
+    parser = gxf_parser_factory(get_test_input_file(request, "gencode/set1.gff3"))
+    line_numbers = []
+    for root in Gff3TreeStream().iter_trees(parser):
+        line_numbers.append(parser.line_number)
+        assert max(r.line_number for r in _iter_tree(root)) <= parser.line_number
+    assert len(set(line_numbers)) > len(line_numbers) // 2
+    assert line_numbers[0] < line_numbers[-1]
+
+def _iter_tree(rec):
+    yield rec
+    for child in rec.children:
+        yield from _iter_tree(child)
+
+def test_gff3_discontinuous(request):
+    roots = list(Gff3TreeStream().iter_trees(gxf_parser_factory(get_test_input_file(request, "gff3_good/discontinuous.gff3"))))
+    mrna, = roots[0].children
+    cds_recs = [c for c in mrna.children if c.feature == "CDS"]
+    assert len(cds_recs) == 10
+    assert all(c.parent is mrna for c in cds_recs)
+
+def test_gff3_dup_id_diff_parents(request):
+    roots = list(Gff3TreeStream().iter_trees(gxf_parser_factory(get_test_input_file(request, "gff3_bad/dupIdDiffParents.gff3"))))
+    assert [r.attrs.get_attr_value1("ID") for r in roots] == ["TSPY10P", "TSPY10"]
+    for gene in roots:
+        trans = gene.children[0]
+        assert trans.attrs.get_attr_value1("ID") == "XM_017030025.2"
+        assert len(trans.children) == 11
+        assert all(gene.start <= c.start <= gene.end for c in trans.children)
+
+
+_out_of_order_gff3 = ("##gff-version 3\n"
+                      "chr1\tt\texon\t10\t20\t.\t+\t.\tParent=T1,T2\n"
+                      "chr1\tt\tgene\t100\t190\t.\t+\t.\tID=G2\n"
+                      "chr1\tt\tmRNA\t10\t90\t.\t+\t.\tID=T1;Parent=G1\n"
+                      "chr1\tt\tgene\t10\t90\t.\t+\t.\tID=G1\n"
+                      "chr1\tt\tmRNA\t10\t50\t.\t+\t.\tID=T2;Parent=G1\n"
+                      "###\n"
+                      "chr1\tt\tgene\t500\t600\t.\t+\t.\tID=G3\n")
+
+def test_gff3_resolved_directive():
+    stream = Gff3TreeStream(sorted_input=False)
+    parser = Gff3Parser("test.gff3", gxf_fh=io.StringIO(_out_of_order_gff3))
+    trees = stream.iter_trees(parser)
+    gene1 = next(trees)
+    assert parser.line_number == 7
+    assert gene1.attrs.get_attr_value1("ID") == "G1"
+    assert [t.attrs.get_attr_value1("ID") for t in gene1.children] == ["T1", "T2"]
+    exon = gene1.children[0].children[0]
+    assert exon in gene1.children[1].children
+    assert [r.attrs.get_attr_value1("ID") for r in trees] == ["G2", "G3"]
+    assert [str(m) for m in stream.metas] == ["##gff-version 3"]
+
+def test_gff3_overlapping_loci():
+    _, roots = _stream_gff3("chr1\tt\tgene\t10\t900\t.\t+\t.\tID=G1\n"
+                            "chr1\tt\tgene\t100\t200\t.\t+\t.\tID=G2\n"
+                            "chr1\tt\tmRNA\t100\t200\t.\t+\t.\tID=T2;Parent=G2\n"
+                            "chr1\tt\tmRNA\t300\t900\t.\t+\t.\tID=T1;Parent=G1\n"
+                            "chr1\tt\tgene\t1000\t1100\t.\t+\t.\tID=G3\n"
+                            "chr2\tt\tmRNA\t10\t20\t.\t+\t.\tID=T4\n")
+    assert [r.attrs.get_attr_value1("ID") for r in roots] == ["G1", "G2", "G3", "T4"]
+    assert [len(r.children) for r in roots] == [1, 1, 0, 0]
+
+def test_gff3_missing_parent():
+    with pytest.raises(GxfGenieParseError, match="test.gff3:2: Parent `T2' not found for exon record"):
+        _stream_gff3("chr1\tt\tmRNA\t10\t90\t.\t+\t.\tID=T1\n"
+                     "chr1\tt\texon\t10\t20\t.\t+\t.\tParent=T2\n"
+                     "chr2\tt\tmRNA\t10\t90\t.\t+\t.\tID=T3\n")
+
+
+_gtf_sets = ["gencode/set1.gtf", "gencode/v27.par.gtf", "gtf_good/B16.stringtie.head.gtf",
+             "gtf_good/ensembl_grch37.head.gtf", "gtf_good/refseq.ucsc.small.gtf"]
+_gtf_opts = [{}, {"sorted_input": False}, {"sorted_input": False, "spill_records": 20, "spill_partitions": 3}]
+
+@pytest.mark.parametrize("setname", _gtf_sets, ids=[s.replace('/', '_') for s in _gtf_sets])
+@pytest.mark.parametrize("opts", _gtf_opts, ids=["sorted", "unsorted", "spill"])
+def test_gtf_trees(request, setname, opts):
+    in_gtf = get_test_input_file(request, setname)
+    tmp_dir = os.path.join(get_test_output_dir(request), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    with GtfTreeStream(tmp_dir=tmp_dir, **opts) as stream:
+        roots = list(stream.iter_trees(gxf_parser_factory(in_gtf)))
+        assert stream.spilled == ("spill_records" in opts)
+    assert _dump_trees(roots) == _dump_trees(gxf_dataset_load(in_gtf).iter_roots())
+    assert os.listdir(tmp_dir) == []
+
+def test_gtf_incremental(request):
+    parser = gxf_parser_factory(get_test_input_file(request, "gencode/set1.gtf"))
+    line_numbers = [parser.line_number for _ in GtfTreeStream().iter_trees(parser)]
+    assert len(set(line_numbers)) > len(line_numbers) // 2
+
+def _without_features(gtf_file, features):
+    with open(gtf_file) as fh:
+        return "".join(line for line in fh if line.split("\t")[2:3] not in [[f] for f in features])
+
+@pytest.mark.parametrize("sorted_input", [True, False], ids=["sorted", "unsorted"])
+def test_gtf_synthesize(request, sorted_input):
+    in_gtf = get_test_input_file(request, "gencode/set1.gtf")
+    expect = list(GtfTreeStream().iter_trees(gxf_parser_factory(in_gtf)))
+    gtf_text = _without_features(in_gtf, ("gene", "transcript"))
+    genes = list(GtfTreeStream(sorted_input=sorted_input, synthesize=True).iter_trees(
+        GtfParser("test.gtf", gxf_fh=io.StringIO(gtf_text))))
+    assert len(genes) == len(expect)
+    for gene, expect_gene in zip(genes, expect):
+        assert (gene.feature, gene.line_number) == ("gene", None)
+        assert (gene.seqname, gene.start, gene.end, gene.strand) == (expect_gene.seqname, expect_gene.start,
+                                                                     expect_gene.end, expect_gene.strand)
+        assert [(n, a.value) for n, a in gene.attrs.items()] == [(n, a.value) for n, a in expect_gene.attrs.items()
+                                                                 if (n == "gene_id") or n.startswith("gene_")]
+        assert [str(t) for t in gene.children] == [str(t) for t in expect_gene.children]
+        for trans, expect_trans in zip(gene.children, expect_gene.children):
+            assert trans.parent is gene
+            assert [str(c) for c in trans.children] == [str(c) for c in expect_trans.children]
+
+def test_gtf_synthesize_stringtie(request):
+    in_gtf = get_test_input_file(request, "gtf_good/B16.stringtie.head.gtf")
+    genes = list(GtfTreeStream(synthesize=True).iter_trees(gxf_parser_factory(in_gtf)))
+    assert {g.feature for g in genes} == {"gene"}
+    for gene in genes:
+        assert list(gene.attrs.keys()) == ["gene_id"]
+        assert gene.start == min(t.start for t in gene.children)
+        assert gene.end == max(t.end for t in gene.children)
+        assert all(t.line_number is not None for t in gene.children)
+
+def test_gtf_no_gene_id():
+    gtf_text = ('chr1\tt\texon\t10\t20\t.\t+\t.\ttranscript_id "T1";\n'
+                'chr1\tt\texon\t30\t40\t.\t+\t.\tnote "none";\n'
+                'chr1\tt\texon\t35\t60\t.\t+\t.\ttranscript_id "T1";\n')
+    # position sorted records, so the locus can't be determined from the positions
+    roots = list(GtfTreeStream(sorted_input=False, synthesize=True).iter_trees(
+        GtfParser("test.gtf", gxf_fh=io.StringIO(gtf_text))))
+    assert [(r.feature, r.start, r.end, len(r.children)) for r in roots] == [("transcript", 10, 60, 2),
+                                                                             ("exon", 30, 40, 0)]
+
+def test_gtf_spill_sorted():
+    with pytest.raises(GxfGenieError, match="unsorted input"):
+        GtfTreeStream(spill_records=10)
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_stream_class(request, ext):
+    in_gxf = get_test_input_file(request, "gencode/set1" + ext)
+    roots = list(gxf_tree_stream_class(in_gxf)().iter_trees(gxf_parser_factory(in_gxf)))
+    assert [r.feature for r in roots] == [r.feature for r in gxf_dataset_load(in_gxf).iter_roots()]
@@ -0,0 +1,60 @@
+"""
+GxfWriter tests
+"""
+import io
+import pytest
+from support import get_test_input_file, get_test_output_file, safe_test_id
+from gxfgenie import gxf_parser_factory, fileops
+from gxfgenie.gxf_writer import GxfWriter
+from gxfgenie.errors import GxfGenieError
+
+_test_sets = ["gencode/set1.gtf", "gencode/set1.gff3", "gencode/v42.gff3", "gencode/v27.par.gtf",
+              "gencode/tags.gff3", "gff3_good/ncbiProblems.gff3", "gff3_good/noId.gff3",
+              "gtf_good/refseq.ucsc.small.gtf"]
+
+def _parse(in_gxf, **parse_args):
+    return list(gxf_parser_factory(in_gxf, **parse_args).parse())
+
+def _str_lines(recs):
+    return "".join(str(rec) + "\n" for rec in recs)
+
+@pytest.mark.parametrize("setname", _test_sets, ids=safe_test_id)
+def test_same_as_str(request, setname):
+    recs = _parse(get_test_input_file(request, setname))
+    out_gxf = get_test_output_file(request, "." + setname.split('.')[-1])
+    with GxfWriter(out_gxf) as writer:
+        writer.write_all(recs)
+    with open(out_gxf) as fh:
+        assert fh.read() == _str_lines(recs)
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_lazy_attrs(request, ext):
+    in_gxf = get_test_input_file(request, "gencode/set1" + ext)
+    recs = _parse(in_gxf, lazy_attrs=True)
+    fh = io.StringIO()
+    with GxfWriter("test" + ext, gxf_fh=fh) as writer:
+        writer.write_all(recs)
+    # unparsed attributes are written as read
+    assert fh.getvalue() == _str_lines(recs)
+
+def test_small_buffer(request):
+    recs = _parse(get_test_input_file(request, "gencode/v42.gff3"))
+    fh = io.StringIO()
+    with GxfWriter("test.gff3", gxf_fh=fh, buffer_size=100, attr_cache_size=10) as writer:
+        for rec in recs:
+            writer.write(rec)
+    assert fh.getvalue() == _str_lines(recs)
+
+@pytest.mark.parametrize("ext", [".gtf", ".gff3"])
+def test_compressed(request, ext):
+    recs = _parse(get_test_input_file(request, "gencode/set1" + ext))
+    out_gxf = get_test_output_file(request, ext + ".gz")
+    with GxfWriter(out_gxf) as writer:
+        writer.write_all(recs)
+    with fileops.opengz(out_gxf) as fh:
+        assert fh.read() == _str_lines(recs)
+
+def test_bad_object():
+    with GxfWriter("test.gtf", gxf_fh=io.StringIO()) as writer:
+        with pytest.raises(GxfGenieError, match="can only write GxfRecord or GxfMeta objects"):
+            writer.write("chr1")